@@ -1,6 +1,7 @@
 """
 Calculator functions
 """
+from decimal import ROUND_HALF_UP, Decimal
 
 
 def add(x, y):
@@ -11,3 +12,28 @@ def add(x, y):
 def subtract(x, y):
     """Subtract y from x and return the diff"""
     return x - y
+
+
+def adjust(value, scale=1, offset=0, places=2):
+    """Scale value, add offset and round half up to the given places"""
+    exponent = Decimal(1).scaleb(-places)
+    result = Decimal(value) * Decimal(scale) + Decimal(offset)
+    return result.quantize(exponent, rounding=ROUND_HALF_UP)
+
+
+def preview_adjust(values, scale=1, offset=0, places=2, max_value=None):
+    """Adjust a mapping of key -> value, splitting off out of range results
+
+    Returns ({key: new value} for results within 0..max_value, [keys of
+    results outside it]).
+    """
+    adjusted = {}
+    out_of_range = []
+    for key, value in values.items():
+        new_value = adjust(value, scale, offset, places)
+        if new_value < 0 or (max_value is not None and new_value > max_value):
+            out_of_range.append(key)
+        else:
+            adjusted[key] = new_value
+
+    return adjusted, out_of_range
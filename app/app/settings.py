@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 import os
 
@@ -44,16 +45,21 @@ INSTALLED_APPS = [
     'drf_spectacular',
     'user',
     'recipe',
+    'job',
+    'batch',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.QueryContextMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -131,6 +137,15 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Uploaded media, served by core.media.serve_media
+
+MEDIA_URL = '/media/'
+
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', BASE_DIR / 'var' / 'media')
+
+# Media names are content hashes, so responses may be cached for a year.
+MEDIA_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -140,4 +155,216 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_THROTTLE_CLASSES': ['core.throttling.UserThrottle'],
+    'DEFAULT_THROTTLE_RATES': {
+        'user': '1200/min',
+        'anon': '300/min',
+        'login': '10/min',
+        'signup': '20/hour',
+    },
+    # Proxies in front of the app appending to X-Forwarded-For. Throttles
+    # key anonymous clients on the address the nearest proxy saw; with 0 it
+    # is REMOTE_ADDR, so clients cannot pick their own.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+# Throttling
+# Cache alias counting requests across workers; None throttles per process.
+
+THROTTLE_CACHE = os.environ.get('THROTTLE_CACHE') or None
+
+THROTTLE_MAX_BUCKETS = 100000
+
+# Background jobs
+# Task name -> dotted path of a callable taking the Job being run.
+
+JOB_TASKS = {
+    'delete_account': 'core.deletion.delete_account_task',
+    'recipe_thumbnails': 'recipe.images.thumbnails_task',
+    'build_similarity_index': 'recipe.similarity.build_index_task',
 }
+
+JOB_WORKER_PROCESSES = int(os.environ.get('JOB_WORKER_PROCESSES', 2))
+
+JOB_VISIBILITY_TIMEOUT = 300
+
+JOB_MAX_ATTEMPTS = 3
+
+JOB_RETRY_DELAY = 10
+
+# Batch API
+
+BATCH_MAX_REQUESTS = 20
+
+BATCH_MAX_RESPONSE_BYTES = 1024 * 1024
+
+BATCH_MAX_WORKERS = 4
+
+# API tokens
+# Tokens expire after going unused for TOKEN_TTL. Their last use is written
+# at most once per TOKEN_LAST_USED_INTERVAL.
+
+TOKEN_TTL = timedelta(days=30)
+
+TOKEN_LAST_USED_INTERVAL = timedelta(minutes=5)
+
+TOKEN_PURGE_BATCH_SIZE = 1000
+
+# Admin
+# Unfiltered changelists above this many rows show an estimated total.
+
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
+
+# Similar recipes
+# Built by manage.py build_similarity_index and memory-mapped by workers.
+
+SIMILARITY_INDEX_PATH = os.environ.get(
+    'SIMILARITY_INDEX_PATH',
+    BASE_DIR / 'var' / 'similarity.idx',
+)
+
+# Changes of a user since the build that make a query queue a rebuild, and
+# that it re-vectorizes at most before answering 503 until the rebuild.
+SIMILARITY_REBUILD_CHANGES = 100
+
+SIMILARITY_MAX_CHANGES = 1000
+
+# Slow query log
+# Queries slower than the threshold are logged to a rotating file per
+# process, and a sample of them with their EXPLAIN ANALYZE plan. At most
+# MAX_PROCESSES * MAX_BYTES * (BACKUPS + 1) bytes are kept.
+
+SLOW_QUERY_LOG_ENABLED = True
+
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+
+SLOW_QUERY_EXPLAIN_RATE = 0.01
+
+SLOW_QUERY_LOG_PATH = os.environ.get(
+    'SLOW_QUERY_LOG_PATH',
+    BASE_DIR / 'var' / 'slow_queries.log',
+)
+
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+
+SLOW_QUERY_LOG_BACKUPS = 3
+
+SLOW_QUERY_LOG_MAX_PROCESSES = 16
+
+# Recipe partitioning
+# Hash partitions created by manage.py partition_recipes on Postgres.
+
+RECIPE_PARTITIONS = 16
+
+# Sharding
+# Database aliases holding users' recipe data, in a fixed order: new shards
+# are appended. Aliases missing from DATABASES copy the default database
+# settings with the alias appended to the name. With DB_SQLITE_DIR set,
+# every database is a SQLite file in that directory instead, for local runs.
+
+SHARD_DATABASES = [
+    alias for alias in os.environ.get('SHARD_DATABASES', 'default').split(',')
+    if alias
+]
+
+if os.environ.get('DB_SQLITE_DIR'):
+    DATABASES = {
+        alias: {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(
+                os.environ['DB_SQLITE_DIR'],
+                f'{alias}.sqlite3',
+            ),
+        }
+        for alias in ['default', *SHARD_DATABASES]
+    }
+
+for alias in SHARD_DATABASES:
+    DATABASES.setdefault(alias, {
+        **DATABASES['default'],
+        'NAME': f'{DATABASES["default"]["NAME"]}_{alias}',
+    })
+
+DATABASE_ROUTERS = ['core.sharding.ShardRouter']
+
+TEST_RUNNER = 'app.test_runner.ShardTestRunner'
+
+# Time writes already under way get to finish on the source shard after a
+# user is frozen for a move (core.rebalance). Longer than a request can take.
+SHARD_MOVE_SETTLE_SECONDS = 30
+
+# Age a change must reach before the sync feed serves it (core.models.Change).
+# Longer than a write transaction can take, plus clock skew between servers.
+SYNC_COMMIT_LAG_SECONDS = int(os.environ.get('SYNC_COMMIT_LAG_SECONDS', 10))
+
+# Response compression
+# Levels per coding, and per view name overrides, e.g.
+# {'recipe:recipe-sync': {'gzip': 9}}. Smaller bodies are sent uncompressed.
+
+COMPRESSION_MIN_SIZE = 1024
+
+COMPRESSION_LEVELS = {'br': 4, 'zstd': 3, 'gzip': 6}
+
+COMPRESSION_ROUTE_LEVELS = {}
+
+# Recipe images
+# Uploads are streamed to disk and rejected once over RECIPE_IMAGE_MAX_BYTES.
+
+RECIPE_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+
+RECIPE_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+
+RECIPE_THUMBNAIL_SIZES = [160, 320, 640]
+
+# Single statement recipe writes
+# Recipe updates and deletes check ownership and write in one statement
+# instead of loading the recipe first (recipe.writes).
+
+RECIPE_SINGLE_STATEMENT_WRITES = False
+
+# Request profiling
+# Staff requests sent with X-Profile: 1 or ?profile=1 are profiled and saved
+# to PROFILE_DIR, which keeps the newest PROFILE_MAX_FILES profiles.
+
+PROFILING_ENABLED = True
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', BASE_DIR / 'var' / 'profiles')
+
+PROFILE_MAX_FILES = 200
+
+PROFILE_SAMPLE_INTERVAL_MS = 1
+
+# Webhooks
+# Outbox events are delivered by manage.py deliver_webhooks (core.webhooks).
+# Delays and timeouts are in seconds.
+
+WEBHOOK_DISPATCH_SIZE = 500
+
+WEBHOOK_CLAIM_SIZE = 1000
+
+WEBHOOK_CLAIM_TIMEOUT = 300
+
+WEBHOOK_BATCH_SIZE = 100
+
+WEBHOOK_CONCURRENCY = 8
+
+WEBHOOK_TIMEOUT = 10
+
+WEBHOOK_MAX_ATTEMPTS = 8
+
+WEBHOOK_RETRY_DELAY = 30
+
+# Autocomplete
+# Suggestions are cached per process for AUTOCOMPLETE_CACHE_TTL seconds
+# (recipe.autocomplete).
+
+AUTOCOMPLETE_CACHE_SIZE = 1024
+
+AUTOCOMPLETE_CACHE_TTL = 30
+
+# Recipe revisions
+# Every RECIPE_REVISION_SNAPSHOT_INTERVAL-th revision of a recipe is a full
+# snapshot and the rest are deltas (core.revisions), so rebuilding a version
+# reads at most that many rows.
+
+RECIPE_REVISION_SNAPSHOT_INTERVAL = 20
@@ -0,0 +1,64 @@
+"""
+Test runner for sharded configurations.
+"""
+from functools import wraps
+from unittest import TestSuite, mock
+
+from django.conf import settings
+from django.test import TransactionTestCase
+from django.test.runner import DiscoverRunner
+
+
+def iter_tests(suite):
+    for test in suite:
+        if isinstance(test, TestSuite):
+            yield from iter_tests(test)
+        else:
+            yield test
+
+
+def on_first_shard(run):
+    """Wrap TestCase.run to keep a test's users and queries on one shard."""
+    @wraps(run)
+    def run_on_shard(self, result=None):
+        from core.sharding import use_shard
+
+        alias = settings.SHARD_DATABASES[0]
+        with use_shard(alias), mock.patch(
+            'core.sharding.placement',
+            return_value=alias,
+        ):
+            return run(self, result)
+
+    return run_on_shard
+
+
+class ShardTestRunner(DiscoverRunner):
+    """Run database tests against the shards as well as the default.
+
+    With SHARD_DATABASES naming databases besides the default, sharded
+    models leave the default database. Tests declaring databases = '__all__'
+    are written for that and exercise placement across shards. Every other
+    database test may query the shards too and runs with its users placed
+    on, and its unscoped queries sent to, the first shard, as if it were the
+    only one.
+    """
+
+    def build_suite(self, *args, **kwargs):
+        suite = super().build_suite(*args, **kwargs)
+        if settings.SHARD_DATABASES == ['default']:
+            return suite
+
+        for test in iter_tests(suite):
+            cls = type(test)
+            if (
+                not isinstance(test, TransactionTestCase)
+                or cls.databases == '__all__'
+                or '_on_first_shard' in cls.__dict__
+            ):
+                continue
+            cls.databases = {*cls.databases, *settings.SHARD_DATABASES}
+            cls.run = on_first_shard(cls.run)
+            cls._on_first_shard = True
+
+        return suite
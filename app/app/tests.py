@@ -1,4 +1,7 @@
+from decimal import Decimal
+
 from django.test import SimpleTestCase
+from django.urls import get_resolver, reverse
 
 from app import calc
 
@@ -23,3 +26,46 @@ class CalcTests(SimpleTestCase):
         res = calc.subtract(x, y)
 
         self.assertEqual(res, 10)
+
+    def test_adjust(self):
+        """Test scaling, offsetting and rounding half up."""
+        res = calc.adjust(Decimal('5.25'), Decimal('1.05'))
+
+        self.assertEqual(res, Decimal('5.51'))
+        self.assertEqual(calc.adjust(Decimal('0.125'), 1), Decimal('0.13'))
+        self.assertEqual(calc.adjust(22, Decimal('0.5'), places=0), 11)
+
+    def test_preview_adjust(self):
+        """Test out of range results are split off."""
+        values = {1: Decimal('900.00'), 2: Decimal('10.00'), 3: Decimal('1')}
+
+        adjusted, out_of_range = calc.preview_adjust(
+            values,
+            Decimal('1.2'),
+            Decimal('-5'),
+            max_value=Decimal('999.99'),
+        )
+
+        self.assertEqual(adjusted, {2: Decimal('7.00')})
+        self.assertEqual(sorted(out_of_range), [1, 3])
+
+
+class WsgiTests(SimpleTestCase):
+    """Test the preload-friendly WSGI entry."""
+
+    def test_warm_up_populates_resolvers(self):
+        """Test warming up populates the root and included URL resolvers."""
+        from app import wsgi
+
+        wsgi.warm_up()
+
+        resolver = get_resolver()
+        self.assertTrue(resolver._populated)
+        self.assertIn('recipe', resolver.namespace_dict)
+        self.assertTrue(resolver.namespace_dict['recipe'][1]._populated)
+
+    def test_lazy_schema_view(self):
+        """Test the lazily imported schema view is served."""
+        res = self.client.get(reverse('api-schema'))
+
+        self.assertEqual(res.status_code, 200)
@@ -13,22 +13,52 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+
+from core.media import serve_media
+
+
+def lazy_view(view_path, **initkwargs):
+    """Import a class-based view on its first request."""
+    view = None
+
+    @csrf_exempt
+    def dispatch(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(view_path).as_view(**initkwargs)
+
+        return view(request, *args, **kwargs)
+
+    return dispatch
 
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
+    path(
+        'api/schema/',
+        lazy_view('drf_spectacular.views.SpectacularAPIView'),
+        name='api-schema',
+    ),
     path(
         'api/docs/',
-        SpectacularSwaggerView.as_view(url_name='api-schema'),
+        lazy_view(
+            'drf_spectacular.views.SpectacularSwaggerView',
+            url_name='api-schema',
+        ),
         name='api-docs',
     ),
     path('user/', include('user.urls')),
     path('recipe/', include('recipe.urls')),
+    path('job/', include('job.urls')),
+    path('batch/', include('batch.urls')),
+    path(
+        f'{settings.MEDIA_URL.lstrip("/")}<path:path>',
+        serve_media,
+        name='media',
+    ),
 ]
@@ -3,10 +3,15 @@ WSGI config for app project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
 
+Set ``DJANGO_WSGI_PRELOAD=1`` when the server imports this module before
+forking workers (e.g. ``gunicorn --preload``). URL resolvers, serializers and
+password hashers are then built once in the parent and shared copy-on-write.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 """
 
+import gc
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -14,3 +19,31 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+WARM_UP_SERIALIZERS = [
+    'recipe.serializers.RecipeSerializer',
+    'recipe.serializers.RecipeDetailSerializer',
+    'user.serializers.UserSerializer',
+    'user.serializers.AuthTokenSerializer',
+]
+
+
+def warm_up():
+    """Build lazily populated state that every first request would build."""
+    from django.contrib.auth.hashers import get_hashers
+    from django.urls import get_resolver
+    from django.utils.module_loading import import_string
+
+    # Populating the root resolver populates every included resolver too.
+    get_resolver().reverse_dict
+
+    for serializer_path in WARM_UP_SERIALIZERS:
+        import_string(serializer_path)().fields
+
+    get_hashers()
+
+
+if os.environ.get('DJANGO_WSGI_PRELOAD') == '1':
+    warm_up()
+    # Keep the collector from touching (and so copying) the preloaded objects.
+    gc.freeze()
@@ -0,0 +1,190 @@
+"""Tests for the batch API."""
+
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.authentication import issue_token
+from core.models import Recipe
+
+BATCH_URL = reverse('batch:batch')
+ME_URL = reverse('user:me')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PublicBatchAPITests(TestCase):
+    """Test public features of the batch API."""
+
+    def test_auth_required(self):
+        """Test auth is required to call API."""
+        res = APIClient().post(BATCH_URL, {'requests': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBatchApiTests(TestCase):
+    """Test private features of the batch API."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_batch_runs_requests_in_order(self):
+        """Test sub-requests run in order and return their responses."""
+        recipe = create_recipe(self.user)
+        payload = {'requests': [
+            {'method': 'GET', 'path': ME_URL},
+            {
+                'method': 'PATCH',
+                'path': detail_url(recipe.id),
+                'body': {'title': 'New title'},
+            },
+            {'method': 'GET', 'path': detail_url(recipe.id)},
+            {'method': 'GET', 'path': f'{RECIPES_URL}?unused=1'},
+        ]}
+
+        res = self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['status'] for r in res.data], [200, 200, 200, 200])
+        self.assertEqual(res.data[0]['body']['email'], self.user.email)
+        self.assertEqual(res.data[2]['body']['title'], 'New title')
+        self.assertEqual(len(res.data[3]['body']), 1)
+
+    def test_batch_sub_request_errors(self):
+        """Test errors are reported per sub-request."""
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        recipe = create_recipe(other_user)
+        payload = {'requests': [
+            {'method': 'GET', 'path': '/missing/'},
+            {'method': 'DELETE', 'path': detail_url(recipe.id)},
+            {'method': 'POST', 'path': RECIPES_URL, 'body': {}},
+            {'method': 'POST', 'path': BATCH_URL, 'body': {}},
+        ]}
+
+        res = self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual([r['status'] for r in res.data], [404, 404, 400, 400])
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_streaming_sub_request_rejected(self):
+        """Test a streamed file is refused without failing the batch."""
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        Path(media_root.name, 'photo.jpg').write_bytes(b'\xff\xd8' * 100)
+        payload = {'requests': [
+            {'method': 'GET', 'path': '/media/photo.jpg'},
+            {'method': 'GET', 'path': ME_URL},
+        ]}
+
+        with self.settings(MEDIA_ROOT=media_root.name):
+            res = self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['status'] for r in res.data], [400, 200])
+
+    def test_token_authenticated_once(self):
+        """Test sub-requests run as the batch's token user."""
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {issue_token(self.user).key}',
+        )
+        payload = {'requests': [
+            {'method': 'GET', 'path': ME_URL},
+            {'method': 'GET', 'path': ME_URL},
+        ]}
+
+        # Only the batch looks the token up.
+        with self.assertNumQueries(1):
+            res = client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(
+            [r['body']['email'] for r in res.data],
+            [self.user.email, self.user.email],
+        )
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_batch_request_limit(self):
+        """Test an error is returned for too many sub-requests."""
+        payload = {'requests': [{'method': 'GET', 'path': ME_URL}] * 3}
+
+        res = self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BATCH_MAX_RESPONSE_BYTES=10)
+    def test_batch_response_size_limit(self):
+        """Test sub-requests stop running once the size limit is exceeded."""
+        payload = {'requests': [
+            {'method': 'GET', 'path': ME_URL},
+            {
+                'method': 'POST',
+                'path': RECIPES_URL,
+                'body': {'title': 'T', 'time_minutes': 1, 'price': '1.00'},
+            },
+        ]}
+
+        res = self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual([r['status'] for r in res.data], [413, 413])
+        self.assertFalse(Recipe.objects.exists())
+
+
+class ParallelBatchApiTests(TransactionTestCase):
+    """Test reads running concurrently on the thread pool."""
+
+    def test_parallel_reads(self):
+        """Test parallel reads see committed data and keep their order."""
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        recipes = [create_recipe(user, title=f'R{i}') for i in range(4)]
+        client = APIClient()
+        client.force_authenticate(user=user)
+        payload = {
+            'parallel': True,
+            'requests': [
+                {'method': 'GET', 'path': detail_url(recipe.id)}
+                for recipe in recipes
+            ],
+        }
+
+        res = client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(
+            [r['body']['title'] for r in res.data],
+            ['R0', 'R1', 'R2', 'R3'],
+        )
@@ -0,0 +1,163 @@
+"""Views for the batch API."""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.http import Http404
+from django.urls import Resolver404, resolve, reverse
+
+from rest_framework import generics, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from batch.serializers import BatchSerializer
+from core.authentication import ExpiringTokenAuthentication
+
+SAFE_METHODS = ('GET',)
+
+
+def error_response(status_code, detail):
+    return {'status': status_code, 'body': {'detail': detail}}
+
+
+class BatchView(generics.GenericAPIView):
+    """Run several API requests in one round trip.
+
+    The batch is authenticated once and every sub-request runs as the same
+    user. Sub-requests run in order. With ``parallel`` set, consecutive
+    reads run concurrently on a thread pool. Once the responses exceed
+    BATCH_MAX_RESPONSE_BYTES the remaining sub-requests are not run.
+    """
+
+    serializer_class = BatchSerializer
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sub_requests = serializer.validated_data['requests']
+        parallel = serializer.validated_data['parallel']
+
+        responses = []
+        size = 0
+        for group in self.group_requests(sub_requests, parallel):
+            if size > settings.BATCH_MAX_RESPONSE_BYTES:
+                responses.extend(
+                    error_response(
+                        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        'Not run: batch response size limit exceeded.',
+                    )
+                    for _ in group
+                )
+                continue
+
+            if len(group) == 1:
+                results = [self.run(request, group[0])]
+            else:
+                results = self.run_parallel(request, group)
+
+            for response, content_size in results:
+                size += content_size
+                if size > settings.BATCH_MAX_RESPONSE_BYTES:
+                    response = error_response(
+                        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        'Batch response size limit exceeded.',
+                    )
+                responses.append(response)
+
+        return Response(responses)
+
+    def group_requests(self, sub_requests, parallel):
+        """Split requests into runs of reads that may run concurrently."""
+        groups = []
+        for sub_request in sub_requests:
+            if (
+                parallel
+                and groups
+                and sub_request['method'] in SAFE_METHODS
+                and groups[-1][-1]['method'] in SAFE_METHODS
+            ):
+                groups[-1].append(sub_request)
+            else:
+                groups.append([sub_request])
+
+        return groups
+
+    def run_parallel(self, request, group):
+        def run_in_thread(sub_request):
+            try:
+                return self.run(request, sub_request)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(settings.BATCH_MAX_WORKERS) as executor:
+            return list(executor.map(run_in_thread, group))
+
+    def run(self, request, sub_request):
+        """Run one sub-request, returning its response and content size."""
+        url = urlsplit(sub_request['path'])
+        if url.path == reverse('batch:batch'):
+            return error_response(
+                status.HTTP_400_BAD_REQUEST,
+                'Batches cannot be nested.',
+            ), 0
+
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            return error_response(status.HTTP_404_NOT_FOUND, 'Not found.'), 0
+
+        body = b''
+        if 'body' in sub_request:
+            body = json.dumps(sub_request['body']).encode()
+        environ = dict(
+            request.META,
+            REQUEST_METHOD=sub_request['method'],
+            PATH_INFO=url.path,
+            QUERY_STRING=url.query,
+            CONTENT_TYPE='application/json',
+            CONTENT_LENGTH=str(len(body)),
+            HTTP_ACCEPT='application/json',
+        )
+        environ['wsgi.input'] = BytesIO(body)
+        http_request = WSGIRequest(environ)
+        http_request.user = request.user
+        # Read by ExpiringTokenAuthentication in place of the token header.
+        http_request.batch_auth = (request.user, request.auth)
+
+        try:
+            response = match.func(http_request, *match.args, **match.kwargs)
+        except Http404:
+            return error_response(status.HTTP_404_NOT_FOUND, 'Not found.'), 0
+        except PermissionDenied:
+            return error_response(
+                status.HTTP_403_FORBIDDEN,
+                'Permission denied.',
+            ), 0
+
+        if response.streaming:
+            # Files are streamed and not meant to be inlined in JSON.
+            response.close()
+            return error_response(
+                status.HTTP_400_BAD_REQUEST,
+                'Streaming responses cannot be batched.',
+            ), 0
+
+        if hasattr(response, 'render'):
+            response.render()
+        content = response.content
+        if response.get('Content-Type', '').startswith('application/json'):
+            response_body = json.loads(content) if content else None
+        else:
+            response_body = content.decode(response.charset, 'replace')
+
+        result = {'status': response.status_code, 'body': response_body}
+
+        return result, len(content)
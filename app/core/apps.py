@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Connect the change feed, revision, slow query log and shard
+        # receivers.
+        from core import (  # noqa: F401
+            changes,
+            revisions,
+            sharding,
+            slow_queries,
+        )
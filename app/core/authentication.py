@@ -0,0 +1,109 @@
+"""
+Expiring API tokens.
+
+A token expires once it has gone unused for settings.TOKEN_TTL, so every use
+slides its expiry forward. To keep authenticated reads from turning into
+writes, the last use is only recorded when the stored value is more than
+settings.TOKEN_LAST_USED_INTERVAL old. Expiry is therefore exact to within
+that interval.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.models import TokenUsage
+
+
+def last_used(token):
+    """Return when the token was last used, or created if never."""
+    try:
+        return token.usage.last_used
+    except TokenUsage.DoesNotExist:
+        return token.created
+
+
+def is_expired(token, now=None):
+    now = now or timezone.now()
+    return last_used(token) < now - settings.TOKEN_TTL
+
+
+def expired_tokens(now=None):
+    """Return the tokens that have expired."""
+    cutoff = (now or timezone.now()) - settings.TOKEN_TTL
+    return Token.objects.filter(
+        Q(usage__last_used__lt=cutoff)
+        | Q(usage__isnull=True, created__lt=cutoff)
+    )
+
+
+def touch(token, now=None):
+    """Record a use of the token unless one was recorded recently."""
+    now = now or timezone.now()
+    if now - last_used(token) < settings.TOKEN_LAST_USED_INTERVAL:
+        return
+
+    updated = TokenUsage.objects.filter(
+        token=token,
+        last_used__lt=now - settings.TOKEN_LAST_USED_INTERVAL,
+    ).update(last_used=now)
+    if not updated:
+        TokenUsage.objects.get_or_create(
+            token=token,
+            defaults={'last_used': now},
+        )
+
+
+def issue_token(user):
+    """Return the user's live token, replacing it if it has expired."""
+    with transaction.atomic():
+        token, created = Token.objects.select_related('usage').get_or_create(
+            user=user,
+        )
+        if not created and is_expired(token):
+            token.delete()
+            token = Token.objects.create(user=user)
+
+        TokenUsage.objects.update_or_create(
+            token=token,
+            defaults={'last_used': timezone.now()},
+        )
+
+    return token
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    """Token authentication that rejects expired tokens.
+
+    Sub-requests of a batch carry the batch's user and token as
+    ``batch_auth`` on the request, so the token is not looked up again.
+    """
+
+    def authenticate(self, request):
+        batch_auth = getattr(request, 'batch_auth', None)
+        if batch_auth is not None:
+            return batch_auth
+
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        try:
+            token = Token.objects.select_related('user', 'usage').get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'),
+            )
+
+        now = timezone.now()
+        if is_expired(token, now):
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        touch(token, now)
+
+        return (token.user, token)
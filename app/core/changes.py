@@ -0,0 +1,61 @@
+"""
+Change feed for offline sync.
+
+Every write to a recipe or tag moves it to the head of its owner's change
+feed. Saves are recorded by post_save receivers. Deletes must be recorded
+explicitly with record_changes(..., deleted=True): a delete receiver would
+stop the ORM from fast-deleting, which bulk and chunked deletes rely on.
+
+Each recorded write also adds an OutboxEvent in the same transaction, for
+core.webhooks to deliver.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from core.models import Change, OutboxEvent, Recipe, Tag
+from core.sharding import shard_db
+
+
+def record_changes(
+    model,
+    user_id,
+    object_ids,
+    deleted=False,
+    using=None,
+    notify=True,
+):
+    """Move objects to the head of a user's change feed.
+
+    The feed is written on ``using``, by default the current shard. With
+    ``notify`` the writes are also queued for the user's webhooks.
+    """
+    label = model._meta.model_name
+    object_ids = list(object_ids)
+    using = using or shard_db()
+    changes = Change.objects.using(using)
+    # Part of the caller's transaction, if any, without a savepoint.
+    with transaction.atomic(using=using, savepoint=False):
+        changes.filter(model=label, object_id__in=object_ids).delete()
+        changes.bulk_create([
+            Change(
+                user_id=user_id,
+                model=label,
+                object_id=object_id,
+                deleted=deleted,
+            )
+            for object_id in object_ids
+        ])
+        if notify:
+            topic = f"{label}.{'deleted' if deleted else 'changed'}"
+            OutboxEvent.objects.using(using).bulk_create([
+                OutboxEvent(user_id=user_id, topic=topic, object_id=object_id)
+                for object_id in object_ids
+            ])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+def record_save(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        record_changes(sender, instance.user_id, [instance.id], using=using)
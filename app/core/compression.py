@@ -0,0 +1,153 @@
+"""
+Response compression negotiated from Accept-Encoding.
+
+gzip is always available. Brotli and zstd are offered when the brotli and
+zstandard packages are installed. Among the codings the client accepts
+with the highest quality, the first in CODINGS wins.
+
+Every coding compresses incrementally, so streaming responses are
+compressed chunk by chunk with memory bounded by the codec's window.
+"""
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content types worth compressing; images and archives are already packed.
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/x-ndjson',
+)
+COMPRESSIBLE_SUFFIXES = ('+json', '+xml')
+
+
+class GzipCompressor:
+    def __init__(self, level):
+        # wbits 16 + 15 writes a gzip header and trailer around deflate.
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+
+# In order of preference between codings of equal quality.
+CODINGS = {
+    'br': BrotliCompressor,
+    'zstd': ZstdCompressor,
+    'gzip': GzipCompressor,
+}
+
+
+def available_codings():
+    codings = []
+    for coding in CODINGS:
+        if coding == 'br' and brotli is None:
+            continue
+        if coding == 'zstd' and zstandard is None:
+            continue
+        codings.append(coding)
+
+    return codings
+
+
+def parse_accept_encoding(header):
+    """Return {coding: quality} from an Accept-Encoding header."""
+    qualities = {}
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+
+    return qualities
+
+
+def choose_coding(header, codings=None):
+    """Return the coding to use for an Accept-Encoding header, or None."""
+    qualities = parse_accept_encoding(header)
+    wildcard = qualities.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for coding in codings or available_codings():
+        quality = qualities.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+
+    return best
+
+
+def coding_level(coding, view_name=None):
+    """Return the compression level for a coding on a route."""
+    route = settings.COMPRESSION_ROUTE_LEVELS.get(view_name, {})
+
+    return route.get(coding, settings.COMPRESSION_LEVELS[coding])
+
+
+def is_compressible(content_type):
+    content_type = content_type.split(';')[0].strip().lower()
+
+    return (
+        content_type.startswith(COMPRESSIBLE_TYPES)
+        or content_type.endswith(COMPRESSIBLE_SUFFIXES)
+    )
+
+
+def compress(coding, level, data):
+    compressor = CODINGS[coding](level)
+
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(coding, level, chunks):
+    """Compress an iterable of byte chunks incrementally."""
+    compressor = CODINGS[coding](level)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    yield compressor.flush()
@@ -0,0 +1,108 @@
+"""
+Chunked account deletion.
+
+Deleting a user lets the ORM cascade through every recipe and tag in a single
+transaction. Here the related rows are removed in bounded chunks, each in its
+own short transaction, with progress saved after every chunk so an
+interrupted deletion can be resumed where it stopped. The user's rows are
+deleted on their shard, the user row itself on the default database.
+"""
+from django.contrib.auth import get_user_model
+from core import jobs
+from core.models import (
+    AccountDeletion,
+    Change,
+    Ingredient,
+    OutboxEvent,
+    Recipe,
+    RecipeStats,
+    Tag,
+)
+from core.sharding import shard_atomic, shard_for_user_id, use_shard
+
+CHUNK_SIZE = 1000
+
+# Deleted in this order before the user row itself.
+CHUNKED_MODELS = [
+    (Recipe, 'recipes_deleted'),
+    (Tag, 'tags_deleted'),
+]
+
+
+def request_account_deletion(user):
+    """Return the unfinished deletion for a user and whether it is new."""
+    deletion = AccountDeletion.objects.exclude(
+        status=AccountDeletion.DONE,
+    ).filter(user_id=user.id).first()
+    if deletion is not None:
+        return deletion, False
+
+    return AccountDeletion.objects.create(user_id=user.id), True
+
+
+def delete_in_chunks(queryset, chunk_size):
+    """Delete a queryset a chunk at a time, yielding each chunk's count."""
+    while True:
+        with shard_atomic():
+            ids = list(queryset.values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                return
+            # Models with cascades are collected first; reading only ids
+            # keeps that from loading whole rows.
+            queryset.model.objects.filter(id__in=ids).only('id').delete()
+
+        yield len(ids)
+
+
+def run_account_deletion(deletion, chunk_size=CHUNK_SIZE, progress=None):
+    """Delete a user's recipes and tags in chunks, then the user."""
+    deletion.status = AccountDeletion.RUNNING
+    deletion.save(update_fields=['status', 'updated_at'])
+
+    try:
+        shard = shard_for_user_id(deletion.user_id, for_write=True)
+        with use_shard(shard):
+            for model, counter in CHUNKED_MODELS:
+                queryset = model.objects.filter(user_id=deletion.user_id)
+                for count in delete_in_chunks(queryset, chunk_size):
+                    setattr(
+                        deletion, counter, getattr(deletion, counter) + count,
+                    )
+                    deletion.save(update_fields=[counter, 'updated_at'])
+                    if progress:
+                        progress(deletion)
+            for model in (Ingredient, Change, OutboxEvent, RecipeStats):
+                model.objects.filter(user_id=deletion.user_id).delete()
+
+        get_user_model().objects.filter(id=deletion.user_id).delete()
+    except Exception as error:
+        deletion.status = AccountDeletion.FAILED
+        deletion.error = str(error)
+        deletion.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+
+    deletion.status = AccountDeletion.DONE
+    deletion.save(update_fields=['status', 'updated_at'])
+
+    return deletion
+
+
+def start_account_deletion(deletion, user=None):
+    """Queue a background job that runs the deletion."""
+    return jobs.enqueue(
+        'delete_account',
+        {'deletion_id': deletion.id},
+        user=user,
+    )
+
+
+def delete_account_task(job):
+    """Job task running the AccountDeletion named in the payload."""
+    deletion = run_account_deletion(
+        AccountDeletion.objects.get(id=job.payload['deletion_id']),
+    )
+
+    return {
+        'recipes_deleted': deletion.recipes_deleted,
+        'tags_deleted': deletion.tags_deleted,
+    }
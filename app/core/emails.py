@@ -0,0 +1,51 @@
+"""
+Email normalization and validation for user accounts.
+"""
+from functools import lru_cache
+
+EMAIL_MAX_LENGTH = 254
+
+# Distinct domains are few compared to addresses, so results are memoized
+# per domain and only the local part is checked for every address.
+DOMAIN_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def check_domain(domain):
+    """Return an error message for an invalid domain, or None if valid."""
+    # email_validator is slow to import and only needed on signup.
+    from email_validator import EmailNotValidError
+    from email_validator.syntax import validate_email_domain_name
+
+    try:
+        validate_email_domain_name(domain)
+    except EmailNotValidError as error:
+        return str(error)
+
+    return None
+
+
+def normalize_email(email):
+    """Validate an email and return it normalized, or raise ValueError."""
+    from email_validator import EmailNotValidError
+    from email_validator.syntax import validate_email_local_part
+
+    local_part, at, domain = (email or '').rpartition('@')
+    if not at:
+        raise ValueError('The email address is not valid. It must have '
+                         'exactly one @-sign.')
+
+    try:
+        validate_email_local_part(local_part)
+    except EmailNotValidError as error:
+        raise ValueError(str(error))
+
+    error = check_domain(domain.lower())
+    if error:
+        raise ValueError(error)
+
+    email = f'{local_part}@{domain.lower()}'
+    if len(email.encode('utf8')) > EMAIL_MAX_LENGTH:
+        raise ValueError('The email address is too long.')
+
+    return email
@@ -0,0 +1,116 @@
+"""
+Content fingerprints for finding duplicate recipes.
+
+Exact duplicates share a content hash over the normalized title, link and
+description. Near duplicates are found with MinHash signatures bucketed by
+locality-sensitive hashing (LSH): a recipe is only compared with the first
+recipe seen in each of its band buckets, so a pass is linear in the number
+of recipes instead of comparing every pair.
+"""
+import hashlib
+import random
+import re
+import unicodedata
+
+WHITESPACE = re.compile(r'\s+')
+
+SHINGLE_SIZE = 3
+
+# 16 bands of 4 rows make recipes with about 50% similar text likely to
+# share a bucket, well below the default 0.8 reporting threshold.
+BANDS = 16
+ROWS = 4
+NUM_PERM = BANDS * ROWS
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+_random = random.Random(0)
+PERMUTATIONS = [
+    (_random.randrange(1, MERSENNE_PRIME), _random.randrange(MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+
+def normalize_text(value):
+    """Return text compared case, width and whitespace insensitively."""
+    value = unicodedata.normalize('NFKC', value or '').casefold()
+    return WHITESPACE.sub(' ', value).strip()
+
+
+def content_hash(title, link='', description=''):
+    """Return the hex SHA-256 of a recipe's normalized content."""
+    content = '\x1f'.join(
+        normalize_text(value) for value in (title, link, description)
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def shingles(text):
+    """Return the set of word n-grams of the normalized text."""
+    words = normalize_text(text).split(' ')
+    if len(words) <= SHINGLE_SIZE:
+        return {' '.join(words)}
+
+    return {
+        ' '.join(words[i:i + SHINGLE_SIZE])
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(text):
+    """Return the MinHash signature of the text's shingles."""
+    hashes = [
+        int.from_bytes(
+            hashlib.blake2b(shingle.encode(), digest_size=4).digest(),
+            'big',
+        )
+        for shingle in shingles(text)
+    ]
+
+    return tuple(
+        min((a * value + b) % MERSENNE_PRIME & MAX_HASH for value in hashes)
+        for a, b in PERMUTATIONS
+    )
+
+
+def similarity(signature, other):
+    """Estimate the Jaccard similarity of two signatures."""
+    same = sum(1 for a, b in zip(signature, other) if a == b)
+    return same / len(signature)
+
+
+def near_duplicate_clusters(items, threshold=0.8):
+    """Group (id, text) pairs whose estimated similarity reaches threshold.
+
+    Returns clusters of ids, each sorted and holding at least two ids.
+    """
+    parent = {}
+
+    def find(item_id):
+        while parent[item_id] != item_id:
+            parent[item_id] = parent[parent[item_id]]
+            item_id = parent[item_id]
+        return item_id
+
+    signatures = {}
+    buckets = {}
+    for item_id, text in items:
+        signature = minhash(text)
+        signatures[item_id] = signature
+        parent[item_id] = item_id
+        for band in range(BANDS):
+            key = (band, signature[band * ROWS:(band + 1) * ROWS])
+            first = buckets.setdefault(key, item_id)
+            if first == item_id:
+                continue
+            if similarity(signature, signatures[first]) >= threshold:
+                parent[find(item_id)] = find(first)
+
+    clusters = {}
+    for item_id in parent:
+        clusters.setdefault(find(item_id), []).append(item_id)
+
+    return sorted(
+        sorted(cluster) for cluster in clusters.values() if len(cluster) > 1
+    )
@@ -0,0 +1,187 @@
+"""
+Database-backed background jobs.
+
+Jobs are rows in the core Job table, so no broker is needed. Workers claim
+them with SELECT ... FOR UPDATE SKIP LOCKED where the database supports it,
+and every claim is a conditional UPDATE, so workers racing for the same row
+cannot both win it. A claimed job is invisible to other workers until its
+visibility timeout expires, and a heartbeat keeps pushing that back while
+the task runs. Once a worker stops renewing it, the job is reclaimed, so
+tasks must be safe to run again. A job whose final attempt is abandoned
+this way is marked failed instead.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import Job
+from core.slow_queries import query_context
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(name, payload=None, user=None, max_attempts=None):
+    """Queue a job for a task listed in settings.JOB_TASKS."""
+    if name not in settings.JOB_TASKS:
+        raise ValueError(f'Unknown job task: {name}')
+
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        user=user,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def fail_abandoned_jobs(now):
+    """Mark failed the expired running jobs that have no attempts left."""
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        locked_until__lt=now,
+        attempts__gte=F('max_attempts'),
+    ).update(
+        status=Job.FAILED,
+        error='Abandoned on its final attempt.',
+        locked_until=None,
+        updated_at=now,
+    )
+
+
+def claim_job(visibility_timeout=None):
+    """Claim the next runnable job, or return None if there is none."""
+    visibility_timeout = visibility_timeout or settings.JOB_VISIBILITY_TIMEOUT
+    now = timezone.now()
+    fail_abandoned_jobs(now)
+    runnable = Job.objects.filter(
+        Q(status=Job.QUEUED, run_after__lte=now)
+        | Q(
+            status=Job.RUNNING,
+            locked_until__lt=now,
+            attempts__lt=F('max_attempts'),
+        )
+    ).order_by('run_after', 'id')
+
+    # Without row locks (SQLite) a read-then-write transaction can only
+    # deadlock, so there the conditional UPDATE alone arbitrates the claim.
+    locking = connection.features.has_select_for_update
+    with transaction.atomic() if locking else nullcontext():
+        job = runnable.select_for_update(skip_locked=True).first()
+        if job is None:
+            return None
+
+        locked_until = now + timedelta(seconds=visibility_timeout)
+        claimed = Job.objects.filter(
+            id=job.id,
+            status=job.status,
+            attempts=job.attempts,
+        ).update(
+            status=Job.RUNNING,
+            attempts=job.attempts + 1,
+            locked_until=locked_until,
+            updated_at=now,
+        )
+        if not claimed:
+            return None
+
+    job.status = Job.RUNNING
+    job.attempts += 1
+    job.locked_until = locked_until
+
+    return job
+
+
+def extend_lease(job, visibility_timeout):
+    """Push back a running job's visibility timeout.
+
+    Returns False if the job has been reclaimed or finished meanwhile.
+    """
+    locked_until = timezone.now() + timedelta(seconds=visibility_timeout)
+    extended = Job.objects.filter(
+        id=job.id,
+        status=Job.RUNNING,
+        attempts=job.attempts,
+    ).update(locked_until=locked_until)
+
+    return bool(extended)
+
+
+@contextmanager
+def heartbeat(job, visibility_timeout):
+    """Renew a job's lease every third of its timeout while the block runs."""
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(visibility_timeout / 3):
+                if not extend_lease(job, visibility_timeout):
+                    return
+        finally:
+            # The thread's own connection, opened by extend_lease.
+            connection.close()
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def retry_delay(attempts):
+    """Return the backoff in seconds before retrying a failed attempt."""
+    return settings.JOB_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def run_job(job, visibility_timeout=None):
+    """Run a claimed job and record its result, retry or failure."""
+    visibility_timeout = visibility_timeout or settings.JOB_VISIBILITY_TIMEOUT
+    task = import_string(settings.JOB_TASKS[job.name])
+    try:
+        with heartbeat(job, visibility_timeout):
+            with query_context(f'job:{job.name}'):
+                result = task(job)
+    except Exception as error:
+        logger.exception('Job %s (%s) failed.', job.id, job.name)
+        job.error = str(error)
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(
+                seconds=retry_delay(job.attempts),
+            )
+        else:
+            job.status = Job.FAILED
+    else:
+        job.status = Job.DONE
+        job.result = result
+        job.error = ''
+
+    job.locked_until = None
+    job.save(update_fields=[
+        'status', 'result', 'error', 'run_after', 'locked_until',
+        'updated_at',
+    ])
+
+    return job
+
+
+def work(visibility_timeout=None, poll_interval=1.0, stop_when_idle=False):
+    """Claim and run jobs until interrupted, or until idle if requested."""
+    while True:
+        close_old_connections()
+        job = claim_job(visibility_timeout)
+        if job is not None:
+            run_job(job, visibility_timeout)
+            continue
+
+        if stop_when_idle:
+            return
+        time.sleep(poll_interval)
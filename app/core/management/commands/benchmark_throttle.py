@@ -0,0 +1,61 @@
+"""
+Django command to measure the per-request cost of throttling.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from rest_framework.request import Request
+
+from core.throttling import UserThrottle, reset_buckets
+
+
+class Command(BaseCommand):
+    """Django command to time UserThrottle.allow_request."""
+
+    help = 'Measure throttle overhead per request.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100000)
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=1000,
+            help='Distinct clients the requests are spread over.',
+        )
+        parser.add_argument(
+            '--shared',
+            action='store_true',
+            help='Also count requests in THROTTLE_CACHE, or the default '
+                 'cache if it is unset.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        http_request = RequestFactory().get('/recipe/recipes/')
+        requests = []
+        for user_id in range(1, options['users'] + 1):
+            request = Request(http_request)
+            request.user = get_user_model()(id=user_id)
+            requests.append(request)
+
+        shared = settings.THROTTLE_CACHE or 'default'
+        with override_settings(
+            THROTTLE_CACHE=shared if options['shared'] else None,
+        ):
+            reset_buckets()
+            throttle = UserThrottle()
+            count = options['requests']
+            start = time.perf_counter()
+            for i in range(count):
+                throttle.allow_request(requests[i % len(requests)], None)
+            elapsed = time.perf_counter() - start
+            reset_buckets()
+
+        mode = f'shared ({shared})' if options['shared'] else 'per process'
+        self.stdout.write(self.style.SUCCESS(
+            f'{mode}: {elapsed / count * 1e6:.2f} us/request '
+            f'over {count} requests'
+        ))
@@ -0,0 +1,62 @@
+"""
+Django command to delete user accounts in chunks.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.deletion import (
+    CHUNK_SIZE,
+    request_account_deletion,
+    run_account_deletion,
+)
+from core.models import AccountDeletion
+
+
+class Command(BaseCommand):
+    """Django command to delete accounts, or resume unfinished deletions."""
+
+    help = 'Delete user accounts with their recipes and tags in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('emails', nargs='*', help='Accounts to delete.')
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Resume every unfinished deletion.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        deletions = []
+        for email in options['emails']:
+            try:
+                user = get_user_model().objects.get(email=email)
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'No user with email {email}.')
+            deletion, _ = request_account_deletion(user)
+            deletions.append(deletion)
+
+        if options['resume']:
+            deletions.extend(AccountDeletion.objects.exclude(
+                status=AccountDeletion.DONE,
+            ).exclude(id__in=[deletion.id for deletion in deletions]))
+
+        for deletion in deletions:
+            run_account_deletion(
+                deletion,
+                chunk_size=options['chunk_size'],
+                progress=self.report_progress,
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Deleted user {deletion.user_id}: '
+                f'{deletion.recipes_deleted} recipes, '
+                f'{deletion.tags_deleted} tags.'
+            ))
+
+    def report_progress(self, deletion):
+        self.stdout.write(
+            f'User {deletion.user_id}: {deletion.recipes_deleted} recipes, '
+            f'{deletion.tags_deleted} tags deleted...'
+        )
@@ -0,0 +1,39 @@
+"""
+Django command to deliver webhook events from the outbox.
+"""
+
+from django.core.management.base import BaseCommand
+
+from core import webhooks
+from core.models import WebhookDelivery
+
+
+class Command(BaseCommand):
+    """Django command to run the webhook delivery worker."""
+
+    help = 'Dispatch outbox events and deliver them to webhook endpoints.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once nothing is left to deliver.',
+        )
+        parser.add_argument(
+            '--redeliver-dead',
+            action='store_true',
+            help='Queue every dead delivery again before starting.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        if options['redeliver_dead']:
+            count = webhooks.redeliver(WebhookDelivery.objects.all())
+            self.stdout.write(f'Queued {count} dead deliveries again.')
+
+        self.stdout.write('Delivering webhooks...')
+        webhooks.work(
+            poll_interval=options['poll_interval'],
+            stop_when_idle=options['once'],
+        )
@@ -0,0 +1,88 @@
+"""
+Django command to convert the recipe table to hash partitions online.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import partitioning
+
+
+class Command(BaseCommand):
+    """Django command running one step of the partitioning conversion.
+
+    Run the steps in order: prepare, copy, swap, and later drop-old. See
+    core.partitioning for what each step does.
+    """
+
+    help = 'Hash-partition the recipe table on user_id (Postgres only).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'step',
+            choices=['prepare', 'copy', 'verify', 'swap', 'drop-old'],
+        )
+        parser.add_argument(
+            '--partitions',
+            type=int,
+            default=settings.RECIPE_PARTITIONS,
+        )
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--start-id',
+            type=int,
+            default=0,
+            help='Resume copying after this recipe id.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to pause between copy batches.',
+        )
+        parser.add_argument(
+            '--skip-verify',
+            action='store_true',
+            help='Swap without comparing row counts first.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning needs PostgreSQL.')
+
+        step = options['step']
+        try:
+            if step == 'prepare':
+                partitioning.prepare(options['partitions'])
+                message = (
+                    f'Created {partitioning.NEW_TABLE} with '
+                    f'{options["partitions"]} partitions.'
+                )
+            elif step == 'copy':
+                copied = partitioning.copy_rows(
+                    options['batch_size'],
+                    start_id=options['start_id'],
+                    sleep=options['sleep'],
+                    progress=self.report_progress,
+                )
+                message = f'Copied {copied} recipes.'
+            elif step == 'verify':
+                count = partitioning.verify()
+                message = f'Both tables hold {count} recipes.'
+            elif step == 'swap':
+                partitioning.swap(check=not options['skip_verify'])
+                message = f'{partitioning.TABLE} is now partitioned.'
+            else:
+                partitioning.drop_old()
+                message = f'Dropped {partitioning.OLD_TABLE}.'
+        except partitioning.PartitioningError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def report_progress(self, last_id, max_id, copied):
+        self.stdout.write(
+            f'Copied up to id {last_id} of {max_id} ({copied} rows)...'
+        )
@@ -0,0 +1,72 @@
+"""
+Django command to summarize saved request profiles.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.profiling import read_profiles, summarize
+
+
+class Command(BaseCommand):
+    """Django command to list saved profiles and aggregate them by view."""
+
+    help = 'List saved request profiles and aggregate them by view.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='Only profiles of this view.')
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List every profile before the summary.',
+        )
+        parser.add_argument(
+            '--functions',
+            type=int,
+            default=5,
+            help='Number of functions with the most self time to show.',
+        )
+        parser.add_argument('--path', default=settings.PROFILE_DIR)
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        profiles = list(read_profiles(options['path']))
+        if options['view']:
+            profiles = [
+                (name, profile) for name, profile in profiles
+                if profile['request']['view'] == options['view']
+            ]
+
+        if options['list']:
+            for name, profile in profiles:
+                request = profile['request']
+                self.stdout.write(
+                    f"{request['time']}  {request['method']} "
+                    f"{request['path']}  {request['status']}  "
+                    f"{request['duration_ms']:.1f} ms  "
+                    f"{request['query_count']} queries "
+                    f"{request['sql_ms']:.1f} ms  {name}"
+                )
+            self.stdout.write('')
+
+        groups = summarize(profiles)
+        for group in groups:
+            count = group['count']
+            self.stdout.write(
+                f"{group['view']}: {count} x  "
+                f"avg {group['total_ms'] / count:.1f} ms  "
+                f"max {group['max_ms']:.1f} ms  "
+                f"avg SQL {group['sql_ms'] / count:.1f} ms in "
+                f"{group['query_count'] / count:.1f} queries"
+            )
+            self.stdout.write(f"    latest: {group['latest']}")
+            slowest = sorted(
+                group['self_times'].items(),
+                key=lambda item: -item[1],
+            )
+            for function, ms in slowest[:options['functions']]:
+                self.stdout.write(f'    {ms / count:10.1f} ms  {function}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(profiles)} profiles of {len(groups)} views.'
+        ))
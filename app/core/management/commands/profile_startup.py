@@ -0,0 +1,108 @@
+"""
+Django command to profile application startup.
+"""
+
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter so nothing is already imported. Every app
+# config gets its ready() wrapped with a timer before django.setup() runs.
+STARTUP_SCRIPT = """
+import json
+import time
+
+from django.apps.config import AppConfig
+
+timings = {}
+create = AppConfig.create.__func__
+
+
+def timed_create(cls, entry):
+    app_config = create(cls, entry)
+    ready = app_config.ready
+
+    def timed_ready():
+        start = time.perf_counter()
+        ready()
+        timings[app_config.label] = time.perf_counter() - start
+
+    app_config.ready = timed_ready
+    return app_config
+
+
+AppConfig.create = classmethod(timed_create)
+
+import django
+django.setup()
+
+from django.urls import get_resolver
+get_resolver().url_patterns
+
+print(json.dumps(timings))
+"""
+
+
+def parse_importtime(output):
+    """Return (module, self_us, cumulative_us) tuples from -X importtime."""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except (IndexError, ValueError):
+            # Column header line.
+            continue
+        imports.append((parts[2].strip(), self_us, cumulative_us))
+
+    return imports
+
+
+class Command(BaseCommand):
+    """Django command to report import and AppConfig.ready timings."""
+
+    help = 'Report import time per module and time per AppConfig.ready.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Number of slowest modules to list.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        imports = parse_importtime(result.stderr)
+        ready_timings = json.loads(result.stdout.strip().splitlines()[-1])
+
+        slowest = sorted(imports, key=lambda item: item[2], reverse=True)
+        self.stdout.write('Slowest imports (cumulative ms, self ms):')
+        for module, self_us, cumulative_us in slowest[:options['limit']]:
+            self.stdout.write(
+                f'{cumulative_us / 1000:10.1f} {self_us / 1000:10.1f}  '
+                f'{module}'
+            )
+
+        self.stdout.write('\nAppConfig.ready (ms):')
+        for label, seconds in sorted(
+            ready_timings.items(), key=lambda item: item[1], reverse=True
+        ):
+            self.stdout.write(f'{seconds * 1000:10.1f}  {label}')
+
+        total_us = sum(self_us for _, self_us, _ in imports)
+        self.stdout.write(self.style.SUCCESS(
+            f'\nTotal import time: {total_us / 1000:.1f} ms'
+        ))
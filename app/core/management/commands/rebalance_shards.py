@@ -0,0 +1,69 @@
+"""
+Django command to move users' recipe data between shards.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.rebalance import move_user, plan_moves, shard_loads
+
+
+class Command(BaseCommand):
+    """Django command to move named users, or even out the shards.
+
+    With emails and --to, moves those users to that shard. Without them,
+    plans moves from the fullest shards to the emptiest by recipe count.
+    """
+
+    help = 'Move users between the shards in settings.SHARD_DATABASES.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'emails',
+            nargs='*',
+            help='Users to move to --to.',
+        )
+        parser.add_argument('--to', help='Shard to move the users to.')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.1,
+            help='Accepted deviation of a shard from the mean recipe count.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the moves without making them.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        target = options['to']
+        if target is not None and target not in settings.SHARD_DATABASES:
+            raise CommandError(f'{target} is not in SHARD_DATABASES.')
+        if bool(options['emails']) != (target is not None):
+            raise CommandError('Give both users and --to, or neither.')
+
+        users = get_user_model().objects
+        if options['emails']:
+            moves = [
+                (user, target)
+                for user in users.filter(email__in=options['emails'])
+            ]
+        else:
+            planned = plan_moves(shard_loads(), options['tolerance'])
+            found = users.in_bulk([user_id for user_id, _, _ in planned])
+            moves = [
+                (found[user_id], to)
+                for user_id, _, to in planned if user_id in found
+            ]
+
+        moved = 0
+        for user, to in moves:
+            self.stdout.write(f'{user.email}: {user.shard or "-"} -> {to}')
+            if not options['dry_run']:
+                move_user(user, to)
+                moved += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} users.'))
@@ -0,0 +1,38 @@
+"""
+Django command to rebuild per-user recipe statistics.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.sharding import shard_for_user, use_shard
+from core.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    """Django command to recompute recipe stats from the recipe table."""
+
+    help = 'Rebuild per-user recipe statistics from their recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'emails',
+            nargs='*',
+            help='Users to rebuild. Defaults to every user.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        users = get_user_model().objects.order_by('id')
+        if options['emails']:
+            users = users.filter(email__in=options['emails'])
+
+        rebuilt = 0
+        for user in users.only('id', 'shard').iterator():
+            with use_shard(shard_for_user(user)):
+                rebuild_stats(user.id)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt recipe stats for {rebuilt} users.'
+        ))
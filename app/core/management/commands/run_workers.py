@@ -0,0 +1,64 @@
+"""
+Django command to run background job workers.
+"""
+
+import multiprocessing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    """Django command to run a pool of job worker processes."""
+
+    help = 'Run background job workers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=settings.JOB_WORKER_PROCESSES,
+        )
+        parser.add_argument(
+            '--visibility-timeout',
+            type=int,
+            default=settings.JOB_VISIBILITY_TIMEOUT,
+            help='Seconds a job stays hidden after its worker stops renewing.',
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no job is runnable.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        work_options = {
+            'visibility_timeout': options['visibility_timeout'],
+            'poll_interval': options['poll_interval'],
+            'stop_when_idle': options['once'],
+        }
+        self.stdout.write(f"Starting {options['processes']} workers...")
+
+        if options['processes'] <= 1:
+            jobs.work(**work_options)
+            return
+
+        # Children must open their own database connections.
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=jobs.work, kwargs=work_options)
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
@@ -0,0 +1,56 @@
+"""
+Django command to summarize the slow query log.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.slow_queries import read_entries, summarize
+
+
+class Command(BaseCommand):
+    """Django command to list the queries taking the most total time."""
+
+    help = 'Summarize the slow query log by query.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--view', help='Only queries run by this view.')
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Show the latest sampled plan of each query.',
+        )
+        parser.add_argument('--path', default=settings.SLOW_QUERY_LOG_PATH)
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        entries = read_entries(options['path'])
+        if options['view']:
+            entries = (
+                entry for entry in entries
+                if entry['view'] == options['view']
+            )
+        groups = summarize(entries)
+
+        for group in groups[:options['limit']]:
+            views = ', '.join(
+                f'{view} ({count})'
+                for view, count in sorted(
+                    group['views'].items(),
+                    key=lambda item: -item[1],
+                )
+            )
+            self.stdout.write(
+                f"{group['total_ms']:10.1f} ms total  {group['count']:6} x  "
+                f"max {group['max_ms']:.1f} ms  {group['sql_fingerprint']}"
+            )
+            self.stdout.write(f'    views: {views}')
+            self.stdout.write(f"    {group['sql']}")
+            if options['plans'] and group['plan']:
+                for line in group['plan'].splitlines():
+                    self.stdout.write(f'        {line}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(groups)} distinct slow queries.'
+        ))
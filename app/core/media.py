@@ -0,0 +1,118 @@
+"""
+Serving uploaded media with byte ranges and long-lived caching.
+
+Media files are named after their content, so a URL never changes meaning
+and responses can be cached as immutable. Single byte ranges are honoured
+so clients can resume downloads; multiple ranges get the whole file.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested range lies outside the file."""
+
+
+def parse_range(header, size):
+    """Return the inclusive (start, end) of a Range header, or None.
+
+    None means the header is absent or not one we honour, so the whole file
+    is served.
+    """
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # A suffix range: the last N bytes.
+        length = int(last)
+        if not length:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+
+    return start, end
+
+
+def read_range(file, length):
+    """Yield a file's next ``length`` bytes in chunks, then close it."""
+    try:
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a file from MEDIA_ROOT."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Not found.')
+    if not os.path.isfile(full_path):
+        raise Http404('Not found.')
+
+    stat = os.stat(full_path)
+    if not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'),
+        stat.st_mtime,
+    ):
+        return HttpResponseNotModified()
+
+    try:
+        byte_range = parse_range(
+            request.META.get('HTTP_RANGE', ''),
+            stat.st_size,
+        )
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    start, end = byte_range or (0, stat.st_size - 1)
+    file = open(full_path, 'rb')
+    file.seek(start)
+    content_type, _ = mimetypes.guess_type(full_path)
+    response = StreamingHttpResponse(
+        read_range(file, end - start + 1),
+        status=206 if byte_range else 200,
+        content_type=content_type or 'application/octet-stream',
+    )
+    response['Content-Length'] = str(end - start + 1)
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = (
+        f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable'
+    )
+
+    return response
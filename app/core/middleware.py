@@ -0,0 +1,117 @@
+"""
+Django middleware.
+"""
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+
+from core import compression, profiling
+from core.slow_queries import current_view
+
+
+class QueryContextMiddleware:
+    """Attribute the queries of a request to its view name."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_view.set(request.path)
+        try:
+            return self.get_response(request)
+        finally:
+            current_view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current_view.set(request.resolver_match.view_name)
+
+
+class CompressionMiddleware:
+    """Compress responses with the best coding the client accepts.
+
+    Bodies under settings.COMPRESSION_MIN_SIZE are sent as they are, and so
+    are compressed bodies that came out larger. Streaming bodies are always
+    compressed, a chunk at a time.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding'):
+            return response
+        if not compression.is_compressible(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and (
+            len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = compression.choose_coding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''),
+        )
+        if coding is None:
+            return response
+
+        match = request.resolver_match
+        level = compression.coding_level(
+            coding,
+            match.view_name if match else None,
+        )
+        if response.streaming:
+            response.streaming_content = compression.compress_stream(
+                coding,
+                level,
+                response.streaming_content,
+            )
+            del response['Content-Length']
+        else:
+            compressed = compression.compress(coding, level, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The representation changed, so a strong ETag no longer holds.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+
+        return response
+
+
+class ProfilingMiddleware:
+    """Profile the requests staff users flag (core.profiling)."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (
+            profiling.is_requested(request) and profiling.is_staff(request)
+        ):
+            return self.get_response(request)
+
+        with profiling.Profiler() as profiler:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        name = profiling.save_profile(profiler.speedscope(
+            f'{request.method} {request.path}',
+            {
+                'view': match.view_name if match else request.path,
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'time': timezone.now().isoformat(),
+            },
+        ))
+        response['X-Profile-Id'] = name
+
+        return response
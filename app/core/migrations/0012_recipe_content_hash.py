@@ -0,0 +1,50 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:25
+
+from django.db import migrations, models
+
+from core.fingerprints import content_hash
+
+
+def fill_content_hashes(apps, schema_editor):
+    """Hash existing recipes, leaving later duplicates unhashed."""
+    Recipe = apps.get_model('core', 'Recipe')
+    batch = []
+    seen = set()
+    user_id = None
+    recipes = Recipe.objects.order_by('user_id', 'id').only(
+        'user_id', 'title', 'link', 'description',
+    )
+    for recipe in recipes.iterator(chunk_size=2000):
+        if recipe.user_id != user_id:
+            user_id = recipe.user_id
+            seen = set()
+        value = content_hash(recipe.title, recipe.link, recipe.description)
+        if value in seen:
+            continue
+        seen.add(value)
+        recipe.content_hash = value
+        batch.append(recipe)
+        if len(batch) >= 2000:
+            Recipe.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    Recipe.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='content_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_content_hashes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='recipe',
+            constraint=models.UniqueConstraint(fields=('user', 'content_hash'), name='recipe_user_content_hash_unique'),
+        ),
+    ]
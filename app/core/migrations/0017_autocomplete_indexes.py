@@ -0,0 +1,60 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:52
+
+from django.db import migrations
+
+# Match the UPPER(column::text) that Django's case-insensitive lookups
+# compare on Postgres. btree_gin lets user_id join the trigram index.
+INDEXES = [
+    (
+        'tag_user_name_prefix_idx',
+        'core_tag',
+        'btree (user_id, (UPPER(name::text)) text_pattern_ops)',
+    ),
+    (
+        'tag_user_name_trgm_idx',
+        'core_tag',
+        'gin (user_id, (UPPER(name::text)) gin_trgm_ops)',
+    ),
+    (
+        'recipe_user_title_prefix_idx',
+        'core_recipe',
+        'btree (user_id, (UPPER(title::text)) text_pattern_ops)',
+    ),
+    (
+        'recipe_user_title_trgm_idx',
+        'core_recipe',
+        'gin (user_id, (UPPER(title::text)) gin_trgm_ops)',
+    ),
+]
+
+
+def create_indexes(apps, schema_editor):
+    """Create the autocomplete indexes, which only Postgres supports."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+    for name, table, definition in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING {definition}'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_webhooks'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_autocomplete_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('is_snapshot', models.BooleanField(default=False)),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='core.recipe')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='reciperevision',
+            constraint=models.UniqueConstraint(fields=('recipe', 'number'), name='recipe_revision_number_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_recipe_revisions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='shard_moving',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_recipe_ingredient_unconstrained'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reciperevision',
+            name='recipe',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='core.recipe'),
+        ),
+    ]
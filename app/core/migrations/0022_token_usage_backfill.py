@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:52
+
+from django.db import migrations
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def backfill_token_usage(apps, schema_editor):
+    """Record a use now for every token without one.
+
+    Tokens issued before uses were recorded would otherwise count as last
+    used when they were created and expire on their next request.
+    """
+    Token = apps.get_model('authtoken', 'Token')
+    TokenUsage = apps.get_model('core', 'TokenUsage')
+    db = schema_editor.connection.alias
+    now = timezone.now()
+    keys = Token.objects.using(db).filter(
+        usage__isnull=True,
+    ).values_list('key', flat=True)
+    batch = []
+    for key in keys.iterator(chunk_size=BATCH_SIZE):
+        batch.append(TokenUsage(token_id=key, last_used=now))
+        if len(batch) >= BATCH_SIZE:
+            TokenUsage.objects.using(db).bulk_create(
+                batch,
+                ignore_conflicts=True,
+            )
+            batch = []
+    TokenUsage.objects.using(db).bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authtoken', '0003_tokenproxy'),
+        ('core', '0021_recipe_revision_unconstrained'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_token_usage, migrations.RunPython.noop),
+    ]
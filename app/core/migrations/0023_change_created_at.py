@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:46
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_token_usage_backfill'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='change',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,26 +1,31 @@
 """
 Database models.
 """
-from email_validator import validate_email
-
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     PermissionsMixin,
     BaseUserManager,
 )
 
+from core import emails
+from core.fingerprints import content_hash, normalize_text
+
 
 class UserManager(BaseUserManager):
     """Manager for users."""
 
     def create_user(self, email, password=None, **extra_fields):
         """Create a new user."""
-        if not validate_email(email, check_deliverability=False):
-            raise ValueError
+        return self._create_user(
+            emails.normalize_email(email), password, **extra_fields
+        )
 
-        user = self.model(email=self.normalize_email(email), **extra_fields)
+    def _create_user(self, email, password, **extra_fields):
+        """Create a new user with an already normalized email."""
+        user = self.model(email=email, **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
 
@@ -36,6 +41,13 @@ class UserManager(BaseUserManager):
 
         return user
 
+    def bulk_create_users(self, users, batch_size=1000):
+        """Insert users with normalized emails and precomputed passwords."""
+        return self.bulk_create(
+            [self.model(**fields) for fields in users],
+            batch_size=batch_size,
+        )
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     """User in the system."""
@@ -44,31 +56,485 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Database alias holding the user's recipe data, set on first use.
+    shard = models.CharField(max_length=64, blank=True, default='')
+    # Set while rebalance_shards moves the data; writes are refused until
+    # the move is done.
+    shard_moving = models.BooleanField(default=False)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
 
+class RecipeQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Create recipes in bulk, filling in their content hashes."""
+        objs = list(objs)
+        for recipe in objs:
+            recipe.content_hash = recipe.compute_content_hash()
+
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Recipe(models.Model):
     """Recipe model."""
 
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Stored on the user's shard, away from the user table (core.sharding).
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+    )
     title = models.CharField(max_length=255)
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     description = models.TextField(blank=True)
     link = models.CharField(max_length=255, blank=True)
+    # Null only for duplicates that predate the hash, until they are merged.
+    content_hash = models.CharField(
+        max_length=64,
+        null=True,
+        editable=False,
+    )
+    # Stored under its content hash by recipe.images.
+    image = models.ImageField(null=True, blank=True, upload_to='recipes/')
+    # Thumbnail size in pixels -> stored name, filled by a background job.
+    thumbnails = models.JSONField(default=dict, blank=True)
+    ingredients = models.ManyToManyField(
+        'Ingredient',
+        through='RecipeIngredient',
+        related_name='recipes',
+    )
+
+    # The fields content_hash covers.
+    HASHED_FIELDS = ('title', 'link', 'description')
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'content_hash'],
+                name='recipe_user_content_hash_unique',
+            ),
+        ]
+        # Every list is per user, so filtered and sorted pages walk these.
+        indexes = [
+            models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+            models.Index(
+                fields=['user', 'time_minutes', 'id'],
+                name='recipe_user_time_idx',
+            ),
+            models.Index(
+                fields=['user', 'price', 'id'],
+                name='recipe_user_price_idx',
+            ),
+            # Serves the admin's case-sensitive title prefix search.
+            models.Index(
+                fields=['title'],
+                name='recipe_title_prefix_idx',
+                opclasses=['varchar_pattern_ops'],
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        recipe = super().from_db(db, field_names, values)
+        recipe._saved_content = recipe.hashed_content()
+        return recipe
+
+    def hashed_content(self):
+        """Return the loaded values of the fields the content hash covers."""
+        return tuple(self.__dict__.get(name) for name in self.HASHED_FIELDS)
+
+    def compute_content_hash(self):
+        return content_hash(self.title, self.link, self.description)
+
+    def save(self, *args, **kwargs):
+        """Save the recipe, rehashing its content if that is written.
+
+        Duplicates from before content hashes were enforced keep a NULL
+        hash until their text changes, so saving their other fields never
+        runs into the unique constraint.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            rehash = (
+                self._state.adding
+                or self.hashed_content() != getattr(
+                    self, '_saved_content', None,
+                )
+            )
+        else:
+            rehash = bool(
+                {*self.HASHED_FIELDS, 'content_hash'} & set(update_fields)
+            )
+        if rehash:
+            self.content_hash = self.compute_content_hash()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
+        self._saved_content = self.hashed_content()
+
 
 class Tag(models.Model):
     """Tag for filtering recipes."""
 
     name = models.CharField(max_length=255)
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['name'],
+                name='tag_name_prefix_idx',
+                opclasses=['varchar_pattern_ops'],
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class Ingredient(models.Model):
+    """Ingredient a user's recipes call for, one row per normalized name."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+    )
+    name = models.CharField(max_length=255)
+    normalized_name = models.CharField(max_length=255, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'normalized_name'],
+                name='ingredient_user_name_unique',
+            ),
+        ]
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_text(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'normalized_name'}
+        super().save(*args, **kwargs)
+
+
+class RecipeIngredient(models.Model):
+    """Quantity of an ingredient in a recipe."""
+
+    # Unconstrained, as the recipe id is not unique on its own once the
+    # table is partitioned (core.partitioning).
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='recipe_ingredients',
+        db_constraint=False,
+    )
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=9, decimal_places=3)
+    # Normalized, e.g. 'g' or 'tbsp'; blank for counted items.
+    unit = models.CharField(max_length=32, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'ingredient', 'unit'],
+                name='recipe_ingredient_unit_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.quantity} {self.unit} {self.ingredient}'.strip()
+
+
+class RecipeRevision(models.Model):
+    """Recorded version of a recipe, as a full snapshot or a delta."""
+
+    # Unconstrained, as the recipe id is not unique on its own once the
+    # table is partitioned (core.partitioning).
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='revisions',
+        db_constraint=False,
+    )
+    number = models.PositiveIntegerField()
+    is_snapshot = models.BooleanField(default=False)
+    # zlib-compressed JSON, written and read by core.revisions.
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'number'],
+                name='recipe_revision_number_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} #{self.number}'
+
+
+class AccountDeletion(models.Model):
+    """Progress of a chunked account deletion."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    # Not a foreign key: the record outlives the user it deletes.
+    user_id = models.BigIntegerField(db_index=True)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+    )
+    recipes_deleted = models.PositiveIntegerField(default=0)
+    tags_deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Deletion of user {self.user_id} ({self.status})'
+
+
+class Job(models.Model):
+    """Background job run by `manage.py run_workers`."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+
+class Change(models.Model):
+    """Latest write to a synced object, ordered by its change sequence.
+
+    The primary key is the change sequence. Each object keeps only its
+    latest row, so the feed grows with the number of objects rather than
+    the number of writes.
+
+    Sequence values are taken at insert but become visible at commit, so a
+    slow transaction can commit a change below one already served. The
+    feed therefore serves only changes older than SYNC_COMMIT_LAG_SECONDS,
+    by which time every change below them has committed.
+    """
+
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    MODEL_CHOICES = [
+        (RECIPE, 'Recipe'),
+        (TAG, 'Tag'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+    )
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['model', 'object_id'],
+                name='unique_change_per_object',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id} at {self.id}'
+
+
+class OutboxEvent(models.Model):
+    """Recipe or tag write waiting to be fanned out to webhooks.
+
+    Written in the transaction of the write itself, on the user's shard,
+    and deleted once core.webhooks has queued a delivery to each of the
+    user's endpoints.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+    )
+    # e.g. 'recipe.changed' or 'tag.deleted'.
+    topic = models.CharField(max_length=40)
+    object_id = models.BigIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.topic} {self.object_id}'
+
+
+class WebhookEndpoint(models.Model):
+    """URL a user's changes are posted to."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='webhook_endpoints',
+    )
+    url = models.URLField(max_length=500)
+    # Signs each request body with HMAC-SHA256.
+    secret = models.CharField(max_length=64)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.url
+
+
+class WebhookDelivery(models.Model):
+    """One outbox event to be posted to one endpoint."""
+
+    PENDING = 'pending'
+    DELIVERED = 'delivered'
+    DEAD = 'dead'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (DELIVERED, 'Delivered'),
+        (DEAD, 'Dead'),
+    ]
+
+    endpoint = models.ForeignKey(
+        WebhookEndpoint,
+        on_delete=models.CASCADE,
+        related_name='deliveries',
+    )
+    # The OutboxEvent id, unique across shards.
+    event_id = models.BigIntegerField()
+    topic = models.CharField(max_length=40)
+    object_id = models.BigIntegerField()
+    occurred_at = models.DateTimeField()
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['endpoint', 'event_id'],
+                name='webhook_delivery_event_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} {self.object_id} to {self.endpoint_id}'
+
+
+class RecipeStats(models.Model):
+    """Running aggregates over a user's recipes."""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='recipe_stats',
+        db_constraint=False,
+    )
+    recipe_count = models.PositiveIntegerField(default=0)
+    price_total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+    )
+    time_minutes_total = models.BigIntegerField(default=0)
+    # Number of recipes at each price, keyed by the price in cents.
+    price_counts = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f'Recipe stats for user {self.user_id}'
+
+
+class TokenUsage(models.Model):
+    """When an API token was last used.
+
+    Written at most once per settings.TOKEN_LAST_USED_INTERVAL per token.
+    """
+
+    token = models.OneToOneField(
+        'authtoken.Token',
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='usage',
+    )
+    last_used = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f'Token of user {self.token.user_id} used {self.last_used}'
@@ -0,0 +1,285 @@
+"""
+Online conversion of the recipe table to hash partitions on Postgres.
+
+Every recipe access path filters on user_id, so partitioning on it lets
+Postgres prune all but one partition, and vacuum and index maintenance work
+on partitions a fraction of the table's size. The conversion is opt-in and
+runs in steps, each safe to run while the API is serving traffic:
+
+1. prepare: create core_recipe_partitioned with the same columns, defaults,
+   indexes and constraints, split into RECIPE_PARTITIONS hash partitions,
+   and a trigger mirroring every write on core_recipe into it.
+2. copy: copy existing rows over in id ranges, one short transaction per
+   batch. Rows the trigger already mirrored are skipped.
+3. swap: check the row counts match, then in one brief ACCESS EXCLUSIVE
+   transaction drop the trigger and rename the new table, its indexes and
+   constraints into place. The old table is kept as
+   core_recipe_unpartitioned.
+4. drop-old: drop the old table once the new one has proven itself.
+
+A partitioned table's primary key must include the partition key, so the
+database key becomes (id, user_id). The model keeps ``id`` as its primary
+key: ids still come from the one sequence and stay unique, so the ORM and
+RecipeViewSet work unchanged. Lookups by id alone probe each partition's
+key index, while the per-user lookups the API makes touch one partition.
+"""
+import re
+import time
+
+from django.db import connection, transaction
+
+TABLE = 'core_recipe'
+NEW_TABLE = 'core_recipe_partitioned'
+OLD_TABLE = 'core_recipe_unpartitioned'
+TRIGGER = 'core_recipe_partition_sync'
+
+# Suffixes keeping copied index and constraint names apart until the swap.
+NEW_SUFFIX = '_p'
+OLD_SUFFIX = '_old'
+
+SYNC_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION {TRIGGER}() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM {NEW_TABLE} WHERE id = OLD.id AND user_id = OLD.user_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO {NEW_TABLE} SELECT NEW.* ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+class PartitioningError(Exception):
+    """The table is not in a state the requested step can run from."""
+
+
+def table_exists(name):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s)', [name])
+        return cursor.fetchone()[0] is not None
+
+
+def is_partitioned(name=TABLE):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table '
+            'WHERE partrelid = to_regclass(%s)',
+            [name],
+        )
+        return cursor.fetchone() is not None
+
+
+def constraints(table, types='pufc'):
+    """Return (name, definition) of a table's constraints of the types."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT conname, pg_get_constraintdef(oid), contype '
+            'FROM pg_constraint WHERE conrelid = %s::regclass '
+            'ORDER BY conname',
+            [table],
+        )
+        return [
+            (name, definition) for name, definition, kind in cursor.fetchall()
+            if kind in types
+        ]
+
+
+def plain_indexes(table):
+    """Return (name, definition) of indexes not backing a constraint."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT i.relname, pg_get_indexdef(i.oid) '
+            'FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid '
+            'WHERE x.indrelid = %s::regclass AND NOT EXISTS ('
+            '    SELECT 1 FROM pg_constraint c WHERE c.conindid = i.oid'
+            ') ORDER BY i.relname',
+            [table],
+        )
+        return cursor.fetchall()
+
+
+def referencing_foreign_keys():
+    """Return foreign keys from other tables to the recipe table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT conrelid::regclass::text, conname FROM pg_constraint '
+            'WHERE confrelid = %s::regclass AND contype = %s',
+            [TABLE, 'f'],
+        )
+        return cursor.fetchall()
+
+
+def partition_ddl(partitions):
+    """Return the statements creating the empty partitioned table."""
+    qn = connection.ops.quote_name
+    statements = [
+        f'CREATE TABLE {qn(NEW_TABLE)} (LIKE {qn(TABLE)} INCLUDING DEFAULTS)'
+        f' PARTITION BY HASH (user_id)',
+        f'ALTER TABLE {qn(NEW_TABLE)} ADD CONSTRAINT '
+        f'{qn(TABLE + "_pkey" + NEW_SUFFIX)} PRIMARY KEY (id, user_id)',
+    ]
+    statements += [
+        f'CREATE TABLE {qn(f"{TABLE}_p{remainder}")} PARTITION OF '
+        f'{qn(NEW_TABLE)} FOR VALUES WITH '
+        f'(MODULUS {partitions}, REMAINDER {remainder})'
+        for remainder in range(partitions)
+    ]
+
+    return statements
+
+
+def prepare(partitions):
+    """Create the partitioned copy of the table and the sync trigger."""
+    if is_partitioned():
+        raise PartitioningError(f'{TABLE} is already partitioned.')
+    if table_exists(NEW_TABLE):
+        raise PartitioningError(f'{NEW_TABLE} already exists.')
+    references = referencing_foreign_keys()
+    if references:
+        raise PartitioningError(
+            'Foreign keys reference the recipe id, which is not unique on '
+            'its own once partitioned: '
+            + ', '.join(f'{table}.{name}' for table, name in references)
+        )
+
+    qn = connection.ops.quote_name
+    statements = partition_ddl(partitions)
+    for name, definition in constraints(TABLE, types='ufc'):
+        if definition.startswith('UNIQUE') and 'user_id' not in definition:
+            raise PartitioningError(
+                f'Unique constraint {name} must include user_id.'
+            )
+        statements.append(
+            f'ALTER TABLE {qn(NEW_TABLE)} ADD CONSTRAINT '
+            f'{qn(name + NEW_SUFFIX)} {definition}'
+        )
+    for name, definition in plain_indexes(TABLE):
+        statements.append(re.sub(
+            r'^CREATE (UNIQUE )?INDEX \S+ ON \S+',
+            lambda match: (
+                f'CREATE {match.group(1) or ""}INDEX '
+                f'{qn(name + NEW_SUFFIX)} ON {qn(NEW_TABLE)}'
+            ),
+            definition,
+        ))
+    statements += [
+        SYNC_FUNCTION,
+        f'CREATE TRIGGER {TRIGGER} AFTER INSERT OR UPDATE OR DELETE '
+        f'ON {qn(TABLE)} FOR EACH ROW EXECUTE FUNCTION {TRIGGER}()',
+    ]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def copy_rows(batch_size, start_id=0, sleep=0, progress=None):
+    """Copy rows up to the current maximum id, one batch per transaction.
+
+    Returns the number of rows inserted.
+    """
+    if not table_exists(NEW_TABLE):
+        raise PartitioningError(f'Run prepare first: no {NEW_TABLE}.')
+
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT max(id) FROM {qn(TABLE)}')
+        max_id = cursor.fetchone()[0] or 0
+
+    copied = 0
+    last_id = start_id
+    while last_id < max_id:
+        # FOR SHARE makes writers to these rows wait for the batch, so their
+        # trigger sees the copied row instead of it being resurrected.
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {qn(NEW_TABLE)} SELECT * FROM {qn(TABLE)} '
+                f'WHERE id > %s AND id <= %s FOR SHARE ON CONFLICT DO NOTHING',
+                [last_id, last_id + batch_size],
+            )
+            copied += cursor.rowcount
+        last_id += batch_size
+        if progress:
+            progress(min(last_id, max_id), max_id, copied)
+        if sleep:
+            time.sleep(sleep)
+
+    return copied
+
+
+def verify():
+    """Check both tables hold the same rows, without locking them.
+
+    The trigger writes the copy in the same transaction as the original, so
+    one snapshot of both tables must match once the copy has finished.
+    """
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT (SELECT count(*) FROM {qn(TABLE)}), '
+            f'(SELECT count(*) FROM {qn(NEW_TABLE)})'
+        )
+        old_count, new_count = cursor.fetchone()
+    if old_count != new_count:
+        raise PartitioningError(
+            f'{NEW_TABLE} has {new_count} rows, {TABLE} has {old_count}. '
+            f'Run copy again.'
+        )
+
+    return new_count
+
+
+def swap(check=True):
+    """Put the partitioned table in place of the original."""
+    if not table_exists(NEW_TABLE):
+        raise PartitioningError(f'Run prepare first: no {NEW_TABLE}.')
+    if check:
+        verify()
+
+    qn = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {qn(TABLE)} IN ACCESS EXCLUSIVE MODE')
+        old_constraints = constraints(TABLE)
+        old_indexes = plain_indexes(TABLE)
+        new_constraints = constraints(NEW_TABLE)
+        new_indexes = plain_indexes(NEW_TABLE)
+
+        cursor.execute(f'DROP TRIGGER {TRIGGER} ON {qn(TABLE)}')
+        cursor.execute(f'DROP FUNCTION {TRIGGER}()')
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} RENAME TO {qn(OLD_TABLE)}')
+        for name, _ in old_constraints:
+            cursor.execute(
+                f'ALTER TABLE {qn(OLD_TABLE)} RENAME CONSTRAINT {qn(name)} '
+                f'TO {qn(name + OLD_SUFFIX)}'
+            )
+        for name, _ in old_indexes:
+            cursor.execute(
+                f'ALTER INDEX {qn(name)} RENAME TO {qn(name + OLD_SUFFIX)}'
+            )
+
+        cursor.execute(f'ALTER TABLE {qn(NEW_TABLE)} RENAME TO {qn(TABLE)}')
+        for name, _ in new_constraints:
+            cursor.execute(
+                f'ALTER TABLE {qn(TABLE)} RENAME CONSTRAINT {qn(name)} '
+                f'TO {qn(name[:-len(NEW_SUFFIX)])}'
+            )
+        for name, _ in new_indexes:
+            cursor.execute(
+                f'ALTER INDEX {qn(name)} RENAME TO '
+                f'{qn(name[:-len(NEW_SUFFIX)])}'
+            )
+        cursor.execute(
+            f'ALTER SEQUENCE {qn(TABLE + "_id_seq")} OWNED BY {qn(TABLE)}.id'
+        )
+
+
+def drop_old():
+    """Drop the original table after the swap."""
+    if not table_exists(OLD_TABLE):
+        raise PartitioningError(f'No {OLD_TABLE} to drop.')
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE {connection.ops.quote_name(OLD_TABLE)}')
@@ -0,0 +1,309 @@
+"""
+Opt-in profiling of single requests.
+
+A staff user adds ``X-Profile: 1`` or ``?profile=1`` to a request to have it
+profiled. A sampling thread records the request thread's stack every
+PROFILE_SAMPLE_INTERVAL_MS, and every query is timed with the stack that
+ran it. The result is saved as a speedscope file (https://speedscope.app)
+with two profiles, the sampled CPU time and the SQL time, in PROFILE_DIR,
+which keeps the newest PROFILE_MAX_FILES files.
+
+Requests without the flag are not touched beyond checking for it.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from rest_framework import exceptions
+
+from core.authentication import ExpiringTokenAuthentication
+from core.slow_queries import sql_fingerprint
+
+SPEEDSCOPE_SCHEMA = 'https://www.speedscope.app/file-format-schema.json'
+
+SQL_MAX_LENGTH = 200
+
+
+def is_on(value):
+    return value is not None and value.strip().lower() in ('1', 'true')
+
+
+def is_requested(request):
+    """Return whether the request asks to be profiled.
+
+    Only 1 or true turn the header or the query flag on.
+    """
+    if is_on(request.META.get('HTTP_X_PROFILE')):
+        return True
+
+    return (
+        'profile' in request.META.get('QUERY_STRING', '')
+        and is_on(request.GET.get('profile'))
+    )
+
+
+def is_staff(request):
+    """Return whether the request comes from a staff user.
+
+    The session user is known here; API clients send a token, which is
+    otherwise only read by the view.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+
+    try:
+        result = ExpiringTokenAuthentication().authenticate(request)
+    except exceptions.AuthenticationFailed:
+        return False
+
+    return result is not None and result[0].is_staff
+
+
+class Frames:
+    """Interns frames for the speedscope file's shared frame list.
+
+    The sampling thread and the profiled thread add frames concurrently.
+    """
+
+    def __init__(self):
+        self.frames = []
+        self.index = {}
+        self.lock = threading.Lock()
+
+    def add(self, name, file=None, line=None):
+        key = (name, file, line)
+        with self.lock:
+            if key not in self.index:
+                self.index[key] = len(self.frames)
+                frame = {'name': name}
+                if file:
+                    frame['file'] = file
+                    frame['line'] = line
+                self.frames.append(frame)
+
+            return self.index[key]
+
+    def stack(self, frame):
+        """Return frame indexes for a Python frame's stack, root first."""
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(self.add(
+                code.co_name,
+                code.co_filename,
+                code.co_firstlineno,
+            ))
+            frame = frame.f_back
+        stack.reverse()
+
+        return stack
+
+
+class Profiler:
+    """Samples one thread's stack and times the queries it runs."""
+
+    def __init__(self, interval=None):
+        self.interval = (
+            interval or settings.PROFILE_SAMPLE_INTERVAL_MS
+        ) / 1000
+        self.thread_id = threading.get_ident()
+        self.frames = Frames()
+        self.samples = []
+        self.weights = []
+        self.queries = []
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+        self.exit_stack = ExitStack()
+
+    def __enter__(self):
+        for connection in connections.all():
+            self.exit_stack.enter_context(
+                connection.execute_wrapper(self.time_query),
+            )
+        self.start = time.perf_counter()
+        self.sampler.start()
+
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.sampler.join()
+        self.duration = time.perf_counter() - self.start
+        self.exit_stack.close()
+
+    def sample(self):
+        last = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is not None:
+                self.samples.append(self.frames.stack(frame))
+                self.weights.append((now - last) * 1000)
+            last = now
+
+    def time_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # Drops this wrapper's own frame from the stack.
+            stack = self.frames.stack(sys._getframe(1))
+            self.queries.append({
+                'stack': stack,
+                'sql': sql,
+                'database': context['connection'].alias,
+                'duration_ms': (time.perf_counter() - start) * 1000,
+            })
+
+    def speedscope(self, name, metadata):
+        """Return the profile in speedscope's file format."""
+        duration_ms = self.duration * 1000
+        sql_samples = []
+        sql_weights = []
+        for query in self.queries:
+            leaf = self.frames.add(
+                f"SQL {query['database']}: {query['sql'][:SQL_MAX_LENGTH]}",
+            )
+            sql_samples.append([*query['stack'], leaf])
+            sql_weights.append(query['duration_ms'])
+
+        profiles = [
+            ('CPU', self.samples, self.weights),
+            ('SQL', sql_samples, sql_weights),
+        ]
+        return {
+            '$schema': SPEEDSCOPE_SCHEMA,
+            'name': name,
+            'exporter': 'recipe-app-api',
+            'activeProfileIndex': 0,
+            'shared': {'frames': self.frames.frames},
+            'profiles': [
+                {
+                    'type': 'sampled',
+                    'name': f'{name} {kind}',
+                    'unit': 'milliseconds',
+                    'startValue': 0,
+                    'endValue': max(duration_ms, sum(weights)),
+                    'samples': samples,
+                    'weights': [round(weight, 3) for weight in weights],
+                }
+                for kind, samples, weights in profiles
+            ],
+            # Read by profile_report; ignored by speedscope.
+            'request': {
+                **metadata,
+                'duration_ms': round(duration_ms, 3),
+                'sample_count': len(self.samples),
+                'query_count': len(self.queries),
+                'sql_ms': round(sum(sql_weights), 3),
+                'queries': [
+                    {
+                        'sql_fingerprint': sql_fingerprint(query['sql']),
+                        'sql': query['sql'][:SQL_MAX_LENGTH],
+                        'database': query['database'],
+                        'duration_ms': round(query['duration_ms'], 3),
+                    }
+                    for query in self.queries
+                ],
+            },
+        }
+
+
+def save_profile(profile, directory=None):
+    """Write a profile to the profile directory and return its file name.
+
+    The oldest files are removed to keep at most PROFILE_MAX_FILES.
+    """
+    directory = directory or settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = (
+        f"{timezone.now().strftime('%Y%m%dT%H%M%S%f')}-"
+        f'{uuid.uuid4().hex[:8]}.speedscope.json'
+    )
+    with open(os.path.join(directory, name), 'w', encoding='utf-8') as file:
+        json.dump(profile, file)
+
+    names = sorted(list_profiles(directory))
+    for old in names[:-settings.PROFILE_MAX_FILES]:
+        try:
+            os.remove(os.path.join(directory, old))
+        except FileNotFoundError:
+            # Removed by a concurrent request.
+            pass
+
+    return name
+
+
+def list_profiles(directory=None):
+    """Return the names of the saved profiles."""
+    directory = directory or settings.PROFILE_DIR
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+
+    return [name for name in names if name.endswith('.speedscope.json')]
+
+
+def read_profiles(directory=None):
+    """Yield (file name, profile) of the saved profiles, oldest first."""
+    directory = directory or settings.PROFILE_DIR
+    for name in sorted(list_profiles(directory)):
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as file:
+                profile = json.load(file)
+        except (OSError, ValueError):
+            continue
+        yield name, profile
+
+
+def self_times(profile):
+    """Return {frame name: ms} of time spent in each function itself."""
+    frames = profile['shared']['frames']
+    cpu = profile['profiles'][0]
+    times = {}
+    for stack, weight in zip(cpu['samples'], cpu['weights']):
+        if stack:
+            frame = frames[stack[-1]]
+            key = f"{frame['name']} ({frame.get('file')}:{frame.get('line')})"
+            times[key] = times.get(key, 0) + weight
+
+    return times
+
+
+def summarize(profiles):
+    """Group saved profiles by view, slowest average first."""
+    groups = {}
+    for name, profile in profiles:
+        request = profile['request']
+        group = groups.setdefault(request['view'], {
+            'view': request['view'],
+            'count': 0,
+            'total_ms': 0,
+            'max_ms': 0,
+            'sql_ms': 0,
+            'query_count': 0,
+            'self_times': {},
+            'latest': name,
+        })
+        group['count'] += 1
+        group['total_ms'] += request['duration_ms']
+        group['max_ms'] = max(group['max_ms'], request['duration_ms'])
+        group['sql_ms'] += request['sql_ms']
+        group['query_count'] += request['query_count']
+        group['latest'] = name
+        for key, ms in self_times(profile).items():
+            group['self_times'][key] = group['self_times'].get(key, 0) + ms
+
+    return sorted(
+        groups.values(),
+        key=lambda group: -group['total_ms'] / group['count'],
+    )
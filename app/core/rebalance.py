@@ -0,0 +1,259 @@
+"""
+Moving users' recipe data between shards.
+
+A move first freezes the user: User.shard_moving makes their API writes
+fail with 503 and their jobs retry later. Writes already under way get
+SHARD_MOVE_SETTLE_SECONDS to finish on the source. The move then copies
+the user's tags, ingredients and recipes to the target shard in batches,
+keeping their ids, and replays any writes the source's change feed shows
+after the copy started. It rebuilds the user's change feed and stats on the
+target and points User.shard at the target. A last replay picks up
+anything that outlived the settle time. Only then is the user unfrozen and
+the rows left on the source deleted. rebalance_shards moves the users with
+the most recipes first and reports each move.
+
+The rebuilt change feed has ids from the target's range, so sync clients
+holding a cursor from the source start over and fetch every recipe again.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Max
+
+from core.changes import record_changes
+from core.models import (
+    Change,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeRevision,
+    RecipeStats,
+    Tag,
+)
+from core.sharding import shard_for_user, use_shard
+from core.stats import rebuild_stats
+
+# Copied in this order, and deleted from the source in reverse. Recipe
+# ingredients and revisions are copied with their recipes and deleted by
+# cascade.
+MOVED_MODELS = [Tag, Ingredient, Recipe]
+
+# Rows belonging to a recipe, copied after it.
+RECIPE_MODELS = [RecipeIngredient, RecipeRevision]
+
+# Models with rows in the change feed.
+FEED_MODELS = [Tag, Recipe]
+
+# Keeps IN lists below SQLite's bound parameter limit.
+BATCH_SIZE = 500
+
+
+def copy_rows(model, source, target, queryset, batch_size=BATCH_SIZE):
+    """Copy a queryset's rows from source to target, replacing any there.
+
+    Returns the number of rows copied. The base manager skips hooks such as
+    content hashing, so rows arrive exactly as stored.
+    """
+    copied = 0
+    last_id = 0
+    rows = queryset.using(source).order_by('id')
+    while True:
+        batch = list(rows.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return copied
+
+        with transaction.atomic(using=target):
+            model._base_manager.using(target).filter(
+                id__in=[row.id for row in batch],
+            ).delete()
+            model._base_manager.using(target).bulk_create(batch)
+        last_id = batch[-1].id
+        copied += len(batch)
+
+
+def last_change_id(user_id, alias):
+    return Change.objects.using(alias).filter(
+        user_id=user_id,
+    ).aggregate(last=Max('id'))['last'] or 0
+
+
+def replay_changes(user_id, source, target, after_id):
+    """Bring rows written on the source after a change id to the target.
+
+    Returns the last change id replayed.
+    """
+    last_id = max(last_change_id(user_id, source), after_id)
+    changes = Change.objects.using(source).filter(
+        user_id=user_id,
+        id__gt=after_id,
+        id__lte=last_id,
+    )
+    # Ingredients are never changed once created, so only new ones, with
+    # higher ids, need copying.
+    copied = Ingredient._base_manager.using(target).filter(
+        user_id=user_id,
+    ).aggregate(last=Max('id'))['last'] or 0
+    copy_rows(
+        Ingredient,
+        source,
+        target,
+        Ingredient._base_manager.filter(user_id=user_id, id__gt=copied),
+    )
+    for model in FEED_MODELS:
+        ids = list(changes.filter(
+            model=model._meta.model_name,
+        ).values_list('object_id', flat=True))
+        for start in range(0, len(ids), BATCH_SIZE):
+            chunk = ids[start:start + BATCH_SIZE]
+            model._base_manager.using(target).filter(id__in=chunk).delete()
+            copy_rows(
+                model,
+                source,
+                target,
+                model._base_manager.filter(user_id=user_id, id__in=chunk),
+            )
+            if model is Recipe:
+                for related in RECIPE_MODELS:
+                    copy_rows(
+                        related,
+                        source,
+                        target,
+                        related._base_manager.filter(recipe_id__in=chunk),
+                    )
+
+    return last_id
+
+
+def rebuild_feed(user_id, source, target):
+    """Record every live object and tombstone of the user on the target."""
+    for model in FEED_MODELS:
+        ids = list(model._base_manager.using(target).filter(
+            user_id=user_id,
+        ).order_by('id').values_list('id', flat=True))
+        deleted = list(Change.objects.using(source).filter(
+            user_id=user_id,
+            model=model._meta.model_name,
+            deleted=True,
+        ).order_by('id').values_list('object_id', flat=True))
+        for object_ids, is_deleted in ((deleted, True), (ids, False)):
+            for start in range(0, len(object_ids), BATCH_SIZE):
+                record_changes(
+                    model,
+                    user_id,
+                    object_ids[start:start + BATCH_SIZE],
+                    deleted=is_deleted,
+                    using=target,
+                    notify=False,
+                )
+
+
+def delete_rows(user_id, alias):
+    """Delete a user's sharded rows from one shard, a batch at a time."""
+    for model in [*reversed(MOVED_MODELS), Change, RecipeStats]:
+        rows = model._base_manager.using(alias).filter(user_id=user_id)
+        while True:
+            ids = list(rows.values_list('id', flat=True)[:BATCH_SIZE])
+            if not ids:
+                break
+            model._base_manager.using(alias).filter(id__in=ids).delete()
+
+
+def move_user(user, target):
+    """Move a user's recipe data to the target shard.
+
+    Returns the number of recipes moved.
+    """
+    if target not in settings.SHARD_DATABASES:
+        raise ValueError(f'{target} is not a shard.')
+    source = shard_for_user(user)
+    if source == target:
+        return 0
+
+    users = get_user_model().objects.using(DEFAULT_DB_ALIAS).filter(
+        id=user.id,
+    )
+    users.update(shard_moving=True)
+    try:
+        time.sleep(settings.SHARD_MOVE_SETTLE_SECONDS)
+        # Writes from here on are replayed after the bulk copy.
+        last_change = last_change_id(user.id, source)
+
+        moved = {}
+        for model in MOVED_MODELS:
+            moved[model] = copy_rows(
+                model,
+                source,
+                target,
+                model._base_manager.filter(user_id=user.id),
+            )
+        for related in RECIPE_MODELS:
+            copy_rows(
+                related,
+                source,
+                target,
+                related._base_manager.filter(recipe__user_id=user.id),
+            )
+        last_change = replay_changes(user.id, source, target, last_change)
+        rebuild_feed(user.id, source, target)
+        with use_shard(target):
+            rebuild_stats(user.id)
+
+        users.update(shard=target)
+        user.shard = target
+        # Still frozen, so the target has no newer writes to overwrite.
+        if replay_changes(user.id, source, target, last_change) != last_change:
+            rebuild_feed(user.id, source, target)
+            with use_shard(target):
+                rebuild_stats(user.id)
+    finally:
+        users.update(shard_moving=False)
+
+    delete_rows(user.id, source)
+
+    return moved[Recipe]
+
+
+def shard_loads():
+    """Return {alias: {user id: recipe count}} for every shard."""
+    return {
+        alias: dict(
+            Recipe.objects.using(alias).order_by().values(
+                'user_id',
+            ).annotate(count=Count('id')).values_list('user_id', 'count')
+        )
+        for alias in settings.SHARD_DATABASES
+    }
+
+
+def plan_moves(loads, tolerance=0.1):
+    """Return (user id, source, target) moves evening out recipe counts.
+
+    Repeatedly moves the largest user that fits in half the gap between the
+    fullest and the emptiest shard, until every shard is within tolerance
+    of the mean or no user fits.
+    """
+    loads = {alias: dict(users) for alias, users in loads.items()}
+    totals = {alias: sum(users.values()) for alias, users in loads.items()}
+    mean = sum(totals.values()) / max(len(totals), 1)
+    moves = []
+    while True:
+        fullest = max(totals, key=totals.get)
+        emptiest = min(totals, key=totals.get)
+        gap = totals[fullest] - totals[emptiest]
+        if gap <= tolerance * mean * 2:
+            return moves
+
+        candidates = [
+            (count, user_id) for user_id, count in loads[fullest].items()
+            if count <= gap / 2
+        ]
+        if not candidates:
+            return moves
+
+        count, user_id = max(candidates)
+        moves.append((user_id, fullest, emptiest))
+        loads[emptiest][user_id] = loads[fullest].pop(user_id)
+        totals[fullest] -= count
+        totals[emptiest] += count
@@ -0,0 +1,226 @@
+"""
+Recipe revision history.
+
+Every write changing a recipe's tracked fields adds a RecipeRevision in the
+same transaction. Saves are recorded by a post_save receiver; writes that
+bypass save(), such as single-statement updates and bulk adjustments, call
+record_revisions themselves.
+
+A revision is stored as zlib-compressed JSON. Every
+RECIPE_REVISION_SNAPSHOT_INTERVAL revisions, and for a recipe's first, it
+is a full snapshot of the tracked fields. In between it is a delta against
+the previous revision: the fields replaced and, for long text fields, the
+lines changed. Rebuilding any version therefore reads at most one snapshot
+interval of rows, in a single query.
+
+Concurrent writes to a recipe are ordered by the lock on its row, taken by
+the UPDATE before the revision is numbered.
+"""
+import json
+import zlib
+from decimal import Decimal
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from core.models import Recipe, RecipeRevision
+from core.sharding import shard_db
+
+TRACKED_FIELDS = ['title', 'time_minutes', 'price', 'description', 'link']
+
+# Stored as line edits when that is smaller than the new value.
+DIFFED_FIELDS = {'description'}
+
+COMPRESSION_LEVEL = 6
+
+
+def recipe_state(recipe):
+    """Return the tracked fields of a recipe as JSON-ready values."""
+    state = {}
+    for name in TRACKED_FIELDS:
+        field = Recipe._meta.get_field(name)
+        value = field.to_python(getattr(recipe, name))
+        if isinstance(value, Decimal):
+            places = Decimal(1).scaleb(-field.decimal_places)
+            value = str(value.quantize(places))
+        state[name] = value
+
+    return state
+
+
+def diff_lines(old, new):
+    """Return [start, end, text] edits turning old's lines into new's."""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+
+    return [
+        [i1, i2, ''.join(new_lines[j1:j2])]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != 'equal'
+    ]
+
+
+def patch_lines(old, edits):
+    lines = old.splitlines(keepends=True)
+    for start, end, text in reversed(edits):
+        lines[start:end] = [text]
+
+    return ''.join(lines)
+
+
+def make_delta(old, new):
+    """Return the changes from one state to the next."""
+    delta = {'changed': [], 'set': {}, 'patch': {}}
+    for name in TRACKED_FIELDS:
+        if old[name] == new[name]:
+            continue
+        delta['changed'].append(name)
+        if name in DIFFED_FIELDS:
+            edits = diff_lines(old[name], new[name])
+            if len(json.dumps(edits)) < len(json.dumps(new[name])):
+                delta['patch'][name] = edits
+                continue
+        delta['set'][name] = new[name]
+
+    return delta
+
+
+def apply_delta(state, delta):
+    state = dict(state)
+    for name, edits in delta['patch'].items():
+        state[name] = patch_lines(state[name], edits)
+    state.update(delta['set'])
+
+    return state
+
+
+def encode(payload):
+    return zlib.compress(
+        json.dumps(payload, separators=(',', ':')).encode(),
+        COMPRESSION_LEVEL,
+    )
+
+
+def decode(data):
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+def rebuild(revisions):
+    """Return the state after revisions running from a snapshot."""
+    state = None
+    for revision in revisions:
+        payload = decode(revision.data)
+        if revision.is_snapshot:
+            state = payload['set']
+        else:
+            state = apply_delta(state, payload)
+
+    return state
+
+
+def latest_snapshot(**filters):
+    """Return a subquery of the number of a recipe's latest snapshot."""
+    return Subquery(RecipeRevision.objects.filter(
+        recipe_id=OuterRef('recipe_id'),
+        is_snapshot=True,
+        **filters,
+    ).order_by('-number').values('number')[:1])
+
+
+def current_states(recipe_ids, using):
+    """Return the latest revision of each recipe that has one.
+
+    Maps recipe ids to (number, number of its snapshot, state).
+    """
+    revisions = RecipeRevision.objects.using(using).filter(
+        recipe_id__in=recipe_ids,
+        number__gte=latest_snapshot(),
+    ).order_by('recipe_id', 'number')
+    by_recipe = {}
+    for revision in revisions:
+        by_recipe.setdefault(revision.recipe_id, []).append(revision)
+
+    return {
+        recipe_id: (chain[-1].number, chain[0].number, rebuild(chain))
+        for recipe_id, chain in by_recipe.items()
+    }
+
+
+def record_revisions(recipes, using=None):
+    """Add a revision for each recipe whose tracked fields changed.
+
+    Returns the number of revisions added. A recipe without revisions, such
+    as one created before they were tracked, starts with a snapshot of its
+    current state.
+    """
+    using = using or shard_db()
+    recipes = list(recipes)
+    interval = settings.RECIPE_REVISION_SNAPSHOT_INTERVAL
+    with transaction.atomic(using=using, savepoint=False):
+        current = current_states([recipe.id for recipe in recipes], using)
+        revisions = []
+        for recipe in recipes:
+            state = recipe_state(recipe)
+            number, snapshot, previous = current.get(recipe.id, (0, 0, None))
+            if previous == state:
+                continue
+
+            if previous is None:
+                payload = {'changed': TRACKED_FIELDS, 'set': state}
+            else:
+                payload = make_delta(previous, state)
+            is_snapshot = previous is None or number + 1 - snapshot >= interval
+            if is_snapshot:
+                payload = {'changed': payload['changed'], 'set': state}
+            revisions.append(RecipeRevision(
+                recipe_id=recipe.id,
+                number=number + 1,
+                is_snapshot=is_snapshot,
+                data=encode(payload),
+            ))
+        RecipeRevision.objects.using(using).bulk_create(revisions)
+
+    return len(revisions)
+
+
+def list_revisions(recipe):
+    """Return a recipe's revisions, newest first, with the fields changed."""
+    revisions = list(recipe.revisions.order_by('-number'))
+    for revision in revisions:
+        revision.changed = decode(revision.data)['changed']
+
+    return revisions
+
+
+def get_version(recipe, number):
+    """Return a revision of a recipe and its state, or None if missing."""
+    revisions = list(recipe.revisions.filter(
+        number__lte=number,
+        number__gte=latest_snapshot(number__lte=number),
+    ).order_by('number'))
+    if not revisions or revisions[-1].number != number:
+        return None
+
+    return revisions[-1], rebuild(revisions)
+
+
+@receiver(post_save, sender=Recipe)
+def record_save(
+    sender,
+    instance,
+    raw=False,
+    using=None,
+    update_fields=None,
+    **kwargs,
+):
+    if raw:
+        return
+    # Saves of images, thumbnails or hashes alone change nothing tracked.
+    if update_fields is not None and not update_fields & {*TRACKED_FIELDS}:
+        return
+    record_revisions([instance], using=using)
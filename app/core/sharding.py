@@ -0,0 +1,243 @@
+"""
+Sharding users' recipe data across databases.
+
+Users, tokens, jobs and the other account tables stay on the default
+database. A user's recipes, their revisions, tags, ingredients, change feed,
+webhook outbox and stats live together on one shard, one of the aliases in
+settings.SHARD_DATABASES, so every per-user query touches a single
+database. With only the default database as a shard all of this is a
+no-op.
+
+A user's shard is chosen by user id the first time it is needed and stored
+in User.shard, so adding shards leaves existing users in place until
+rebalance_shards moves them.
+
+Requests select the shard through a context variable set by UserShardMixin,
+which ShardRouter consults for the sharded models. Work outside a request
+(commands, jobs) wraps each user in use_shard(). While rebalance_shards moves
+a user, User.shard_moving is set and their writes are refused with
+ShardMoving until the move is done.
+
+Each shard allocates ids from its own range, starting at its position in
+SHARD_DATABASES shifted left by SHARD_ID_BITS. A moved user's rows keep their
+ids on the new shard, and a change feed cursor tells which shard issued it.
+Shards may be added to the end of SHARD_DATABASES but never reordered.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, migrations, transaction
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+
+SHARD_ID_BITS = 48
+
+SHARDED_MODELS = {
+    'core.recipe', 'core.tag', 'core.ingredient', 'core.recipeingredient',
+    'core.change', 'core.recipestats', 'core.outboxevent',
+    'core.reciperevision',
+}
+
+current_shard = ContextVar('current_shard', default=None)
+
+
+def is_sharding_enabled():
+    return settings.SHARD_DATABASES != [DEFAULT_DB_ALIAS]
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def shard_index(alias):
+    return settings.SHARD_DATABASES.index(alias)
+
+
+def id_range_start(alias):
+    return shard_index(alias) << SHARD_ID_BITS
+
+
+def cursor_shard(change_id):
+    """Return the index of the shard that issued a change id."""
+    return change_id >> SHARD_ID_BITS
+
+
+def placement(user_id):
+    """Return the shard a new user's data is placed on."""
+    return settings.SHARD_DATABASES[user_id % len(settings.SHARD_DATABASES)]
+
+
+def shard_for_user(user):
+    """Return the alias holding a user's data, recording it on first use."""
+    if not is_sharding_enabled():
+        return settings.SHARD_DATABASES[0]
+    if not user.shard:
+        users = get_user_model().objects.using(DEFAULT_DB_ALIAS)
+        alias = placement(user.id)
+        if users.filter(id=user.id, shard='').update(shard=alias):
+            user.shard = alias
+        else:
+            user.shard = users.values_list('shard', flat=True).get(id=user.id)
+
+    return user.shard
+
+
+def shard_for_user_id(user_id, for_write=False):
+    """Return the alias holding the data of the user with this id.
+
+    With ``for_write``, raises ShardMoving while the data is being moved.
+    """
+    if not is_sharding_enabled():
+        return settings.SHARD_DATABASES[0]
+    user = get_user_model().objects.using(DEFAULT_DB_ALIAS).only(
+        'id', 'shard', 'shard_moving',
+    ).filter(id=user_id).first()
+    if user is None:
+        return placement(user_id)
+    if for_write and user.shard_moving:
+        raise ShardMoving()
+
+    return shard_for_user(user)
+
+
+def shard_db():
+    """Return the alias sharded queries go to in the current context."""
+    return current_shard.get() or DEFAULT_DB_ALIAS
+
+
+def shard_atomic(savepoint=True):
+    """Return a transaction on the current shard."""
+    return transaction.atomic(using=shard_db(), savepoint=savepoint)
+
+
+@contextmanager
+def use_shard(alias):
+    """Route sharded queries in the block to the alias."""
+    token = current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        current_shard.reset(token)
+
+
+class ShardRouter:
+    """Database router sending sharded models to the user's shard."""
+
+    def db_for_read(self, model, **hints):
+        if not is_sharding_enabled():
+            return None
+        if not is_sharded(model):
+            return DEFAULT_DB_ALIAS
+
+        instance = hints.get('instance')
+        if isinstance(instance, get_user_model()):
+            return shard_for_user(instance)
+        if instance is not None and is_sharded(type(instance)):
+            if instance._state.db:
+                return instance._state.db
+            if current_shard.get() is None and instance.user_id:
+                return shard_for_user_id(instance.user_id)
+
+        return current_shard.get()
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Sharded rows point at users on the default database.
+        return True if is_sharding_enabled() else None
+
+
+class ShardMoving(APIException):
+    """Raised for writes of a user whose data is being moved."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Your recipes are being moved. Try again shortly.'
+    default_code = 'shard_moving'
+    # Sent as Retry-After, in seconds.
+    wait = 30
+
+
+class UserShardMixin:
+    """View mixin routing the request's sharded queries to the user's shard."""
+
+    shard_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            # Reads go on from the source until the move switches shards.
+            if (
+                request.user.shard_moving
+                and request.method not in SAFE_METHODS
+            ):
+                raise ShardMoving()
+            self.shard_token = current_shard.set(shard_for_user(request.user))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if self.shard_token is not None:
+            current_shard.reset(self.shard_token)
+            self.shard_token = None
+
+        return response
+
+
+def reserve_id_range(alias):
+    """Start the sharded tables' id sequences at the shard's id range."""
+    start = id_range_start(alias)
+    connection = connections[alias]
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for model in apps.get_models():
+            if not is_sharded(model):
+                continue
+            table = model._meta.db_table
+            cursor.execute(f'SELECT max(id) FROM {qn(table)}')
+            if (cursor.fetchone()[0] or 0) >= start:
+                continue
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT setval(pg_get_serial_sequence(%s, %s), %s, false)',
+                    [table, 'id', max(start, 1)],
+                )
+            elif connection.vendor == 'sqlite':
+                cursor.execute(
+                    'DELETE FROM sqlite_sequence WHERE name = %s',
+                    [table],
+                )
+                cursor.execute(
+                    'INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)',
+                    [table, start],
+                )
+
+
+class AlterShardField(migrations.AlterField):
+    """Migration altering a field only on the shards apart from the default.
+
+    Users live on the default database, so its foreign keys to them keep
+    their constraints, and an unsharded deployment keeps all of them.
+    """
+
+    def database_forwards(self, app_label, schema_editor, *args):
+        if schema_editor.connection.alias != DEFAULT_DB_ALIAS:
+            super().database_forwards(app_label, schema_editor, *args)
+
+    def database_backwards(self, app_label, schema_editor, *args):
+        if schema_editor.connection.alias != DEFAULT_DB_ALIAS:
+            super().database_backwards(app_label, schema_editor, *args)
+
+
+@receiver(post_migrate)
+def reserve_id_ranges(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    if sender.label != 'core' or using not in settings.SHARD_DATABASES:
+        return
+    if shard_index(using) > 0:
+        reserve_id_range(using)
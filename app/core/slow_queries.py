@@ -0,0 +1,273 @@
+"""
+Slow query log.
+
+Every database connection gets an execute wrapper that times its queries.
+Queries slower than SLOW_QUERY_THRESHOLD_MS are written as JSON lines to a
+log, with the view or job that ran them, a fingerprint of the SQL and of
+its parameters, and the duration. Parameter values themselves are never
+logged.
+
+Each process writes its own file, SLOW_QUERY_LOG_PATH followed by the
+process id, and rotates it alone at SLOW_QUERY_LOG_MAX_BYTES, keeping
+SLOW_QUERY_LOG_BACKUPS old files. A process starting to log removes the
+files of all but the SLOW_QUERY_LOG_MAX_PROCESSES most recently written
+processes, so the log stays bounded across restarts. The report reads
+every file.
+
+A sample of slow SELECTs (SLOW_QUERY_EXPLAIN_RATE) is run again under
+EXPLAIN (ANALYZE, BUFFERS) on Postgres, or EXPLAIN QUERY PLAN on SQLite,
+and the plan is stored with the entry. Locking SELECTs are not, as running
+them again would take their row locks a second time.
+
+Logging never fails the query: errors writing an entry are reported
+through this module's logger and the query's result is returned as usual.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+entry_logger = logging.getLogger(f'{__name__}.entries')
+# Entries go to the log file only, not to the console.
+entry_logger.propagate = False
+
+current_view = contextvars.ContextVar('current_view', default='')
+
+# Collapses IN lists so queries differing only in list length match.
+PLACEHOLDER_LIST = re.compile(r'%s(?:\s*,\s*%s)+')
+
+# SELECT ... FOR UPDATE and the other row locking clauses.
+LOCKING_CLAUSE = re.compile(
+    r'\bFOR\s+(?:NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b',
+    re.IGNORECASE,
+)
+
+SQL_MAX_LENGTH = 2000
+
+EXPLAIN_PREFIXES = {
+    'postgresql': 'EXPLAIN (ANALYZE, BUFFERS) ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+
+
+@contextmanager
+def query_context(name):
+    """Attribute queries run inside the block to a view or job name."""
+    token = current_view.set(name)
+    try:
+        yield
+    finally:
+        current_view.reset(token)
+
+
+def fingerprint(value):
+    return hashlib.sha1(value.encode()).hexdigest()[:16]
+
+
+def sql_fingerprint(sql):
+    return fingerprint(PLACEHOLDER_LIST.sub('%s...', sql))
+
+
+def log_files(path):
+    """Return {process id: [file path]} of the log files under a path."""
+    path = os.path.abspath(path)
+    directory, base = os.path.split(path)
+    pattern = re.compile(rf'{re.escape(base)}\.(\d+)(?:\.\d+)?')
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return {}
+
+    files = {}
+    for name in names:
+        match = pattern.fullmatch(name)
+        if match:
+            files.setdefault(int(match[1]), []).append(
+                os.path.join(directory, name),
+            )
+
+    return files
+
+
+def modified(path):
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        # Rotated or removed by its process meanwhile.
+        return 0
+
+
+def remove_old_logs(path, keep):
+    """Remove the log files of all but the ``keep`` latest processes."""
+    processes = sorted(
+        log_files(path).values(),
+        key=lambda paths: max(modified(log_path) for log_path in paths),
+    )
+    for paths in processes[:-keep] if keep else processes:
+        for old in paths:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+
+
+def get_handler():
+    """Attach this process's log file to the logger on first use.
+
+    Processes forked after the handler is attached get their own file on
+    their first entry.
+    """
+    path = f'{os.path.abspath(settings.SLOW_QUERY_LOG_PATH)}.{os.getpid()}'
+    for handler in entry_logger.handlers:
+        if handler.baseFilename == path:
+            return handler
+        entry_logger.removeHandler(handler)
+        handler.close()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    remove_old_logs(
+        settings.SLOW_QUERY_LOG_PATH,
+        settings.SLOW_QUERY_LOG_MAX_PROCESSES - 1,
+    )
+    handler = RotatingFileHandler(
+        path,
+        maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+        backupCount=settings.SLOW_QUERY_LOG_BACKUPS,
+        encoding='utf-8',
+    )
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    entry_logger.addHandler(handler)
+    entry_logger.setLevel(logging.INFO)
+
+    return handler
+
+
+def explain(connection, sql, params):
+    """Return the plan of a query, or None if it cannot be explained."""
+    prefix = EXPLAIN_PREFIXES.get(connection.vendor)
+    if (
+        prefix is None
+        or not sql.lstrip().upper().startswith('SELECT')
+        or LOCKING_CLAUSE.search(sql)
+    ):
+        return None
+
+    # A raw cursor keeps the caller's result set and skips this wrapper.
+    # The savepoint keeps a failed EXPLAIN from aborting the transaction.
+    in_transaction = not connection.get_autocommit()
+    cursor = connection.create_cursor()
+    try:
+        if in_transaction:
+            cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+        except Exception:
+            if in_transaction:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            return None
+        if in_transaction:
+            cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+    finally:
+        cursor.close()
+
+    return '\n'.join(' '.join(str(column) for column in row) for row in rows)
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    """Execute wrapper recording queries slower than the threshold."""
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = (time.perf_counter() - start) * 1000
+    if duration >= settings.SLOW_QUERY_THRESHOLD_MS:
+        try:
+            record(context['connection'], sql, params, many, duration)
+        except Exception:
+            logger.exception('Could not record a slow query.')
+
+    return result
+
+
+def record(connection, sql, params, many, duration):
+    plan = None
+    if not many and random.random() < settings.SLOW_QUERY_EXPLAIN_RATE:
+        plan = explain(connection, sql, params)
+
+    get_handler()
+    entry_logger.info(json.dumps({
+        'time': timezone.now().isoformat(),
+        'view': current_view.get(),
+        'database': connection.alias,
+        'duration_ms': round(duration, 3),
+        'sql_fingerprint': sql_fingerprint(sql),
+        'params_fingerprint': fingerprint(repr(params)),
+        'many': many,
+        'sql': sql[:SQL_MAX_LENGTH],
+        'plan': plan,
+    }))
+
+
+@receiver(connection_created)
+def install_wrapper(sender, connection, **kwargs):
+    if (
+        settings.SLOW_QUERY_LOG_ENABLED
+        and log_slow_queries not in connection.execute_wrappers
+    ):
+        connection.execute_wrappers.append(log_slow_queries)
+
+
+def read_entries(path=None):
+    """Yield the logged entries, oldest log file first."""
+    path = path or settings.SLOW_QUERY_LOG_PATH
+    paths = [
+        log_path
+        for paths in log_files(path).values()
+        for log_path in paths
+    ]
+    for log_path in sorted(paths, key=modified):
+        try:
+            with open(log_path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            continue
+
+
+def summarize(entries):
+    """Group entries by SQL, slowest total time first."""
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry['sql_fingerprint'], {
+            'sql_fingerprint': entry['sql_fingerprint'],
+            'sql': entry['sql'],
+            'count': 0,
+            'total_ms': 0,
+            'max_ms': 0,
+            'views': {},
+            'plan': None,
+        })
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+        view = entry['view'] or '-'
+        group['views'][view] = group['views'].get(view, 0) + 1
+        if entry.get('plan'):
+            group['plan'] = entry['plan']
+
+    return sorted(groups.values(), key=lambda group: -group['total_ms'])
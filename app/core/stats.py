@@ -0,0 +1,173 @@
+"""
+Incrementally maintained recipe statistics.
+
+Each user has one RecipeStats row holding the recipe count, the price and
+time totals and the number of recipes at every price. Writes adjust the row
+instead of re-aggregating the user's recipes, and the summary is read back
+without touching the recipe table.
+
+Precision: the count, the totals and the median price are exact. Averages
+are rounded half-up to 2 decimal places. Histogram buckets count every
+recipe exactly.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import IntegrityError
+from django.db.models import Count, Sum
+
+from core.models import Recipe, RecipeStats
+from core.sharding import shard_atomic
+
+CENT = Decimal('0.01')
+
+
+def to_cents(price):
+    return int(Decimal(price) * 100)
+
+
+def count_stats(user_id):
+    """Return the RecipeStats field values computed from a user's recipes."""
+    recipes = Recipe.objects.filter(user_id=user_id)
+    totals = recipes.aggregate(
+        recipe_count=Count('id'),
+        price_total=Sum('price'),
+        time_minutes_total=Sum('time_minutes'),
+    )
+    price_counts = {
+        str(to_cents(row['price'])): row['count']
+        for row in recipes.values('price').annotate(count=Count('id'))
+    }
+
+    return {
+        'recipe_count': totals['recipe_count'],
+        'price_total': totals['price_total'] or 0,
+        'time_minutes_total': totals['time_minutes_total'] or 0,
+        'price_counts': price_counts,
+    }
+
+
+def rebuild_stats(user_id):
+    """Recompute a user's stats from their recipes and store them."""
+    stats, _ = RecipeStats.objects.update_or_create(
+        user_id=user_id,
+        defaults=count_stats(user_id),
+    )
+
+    return stats
+
+
+def update_stats(user_id, removed=None, added=None):
+    """Apply a recipe write to the user's stats.
+
+    ``removed`` and ``added`` are (price, time_minutes) pairs for the recipe
+    before and after the write. Call this after the write: a user without a
+    stats row yet gets one computed from their recipes, which already
+    includes it.
+    """
+    with shard_atomic(savepoint=False):
+        stats = RecipeStats.objects.select_for_update().filter(
+            user_id=user_id,
+        ).first()
+        if stats is None:
+            try:
+                with shard_atomic():
+                    return RecipeStats.objects.create(
+                        user_id=user_id,
+                        **count_stats(user_id),
+                    )
+            except IntegrityError:
+                # Created by a concurrent first write, which could not see
+                # this one: apply it to that row like any other write.
+                stats = RecipeStats.objects.select_for_update().get(
+                    user_id=user_id,
+                )
+
+        for values, sign in ((removed, -1), (added, 1)):
+            if values is None:
+                continue
+            price, time_minutes = values
+            key = str(to_cents(price))
+            stats.recipe_count += sign
+            stats.price_total += sign * Decimal(price)
+            stats.time_minutes_total += sign * time_minutes
+            count = stats.price_counts.get(key, 0) + sign
+            if count:
+                stats.price_counts[key] = count
+            else:
+                stats.price_counts.pop(key, None)
+
+        stats.save()
+
+    return stats
+
+
+def invalidate_stats(user_id):
+    """Drop the user's stats row so the next read rebuilds it."""
+    RecipeStats.objects.filter(user_id=user_id).delete()
+
+
+def get_stats(user_id):
+    """Return the user's stats row, building it on first use."""
+    stats = RecipeStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        stats = rebuild_stats(user_id)
+
+    return stats
+
+
+def median_price(stats):
+    """Return the exact median price from the per-price counts."""
+    if not stats.recipe_count:
+        return None
+
+    middle = [(stats.recipe_count - 1) // 2, stats.recipe_count // 2]
+    values = []
+    seen = 0
+    for cents, count in sorted(
+        (int(cents), count) for cents, count in stats.price_counts.items()
+    ):
+        while middle and middle[0] < seen + count:
+            values.append(cents)
+            middle.pop(0)
+        seen += count
+
+    return (Decimal(sum(values)) / 2 / 100).quantize(CENT, ROUND_HALF_UP)
+
+
+def price_histogram(stats, bucket_width):
+    """Return recipe counts per price bucket of the given width in dollars."""
+    width = to_cents(bucket_width)
+    buckets = {}
+    for cents, count in stats.price_counts.items():
+        start = int(cents) // width * width
+        buckets[start] = buckets.get(start, 0) + count
+
+    return [
+        {
+            'price_min': Decimal(start) / 100,
+            'price_max': Decimal(start + width) / 100,
+            'count': buckets[start],
+        }
+        for start in sorted(buckets)
+    ]
+
+
+def summarize(stats, bucket_width=Decimal('5.00')):
+    """Return the dashboard summary for a stats row."""
+    count = stats.recipe_count
+    average_price = average_time = None
+    if count:
+        average_price = (stats.price_total / count).quantize(
+            CENT, ROUND_HALF_UP,
+        )
+        average_time = (Decimal(stats.time_minutes_total) / count).quantize(
+            CENT, ROUND_HALF_UP,
+        )
+
+    return {
+        'recipe_count': count,
+        'average_price': average_price,
+        'median_price': median_price(stats),
+        'average_time_minutes': average_time,
+        'price_histogram': price_histogram(stats, bucket_width),
+    }
@@ -1,9 +1,19 @@
 """Test django admin modifications."""
 
-from django.test import TestCase, Client
+from contextlib import ExitStack, contextmanager
+from decimal import Decimal
+from unittest import mock
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from core.admin import EstimatedCountPaginator
+from core.models import Ingredient, Recipe, Tag, WebhookEndpoint
+from core.sharding import shard_db
+
 
 class AdminSiteTests(TestCase):
     def setUp(self):
@@ -43,3 +53,148 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+
+class LargeTableAdminTests(TestCase):
+    """Test the recipe and tag changelists stay cheap as tables grow."""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+        )
+        self.client.force_login(self.admin_user)
+
+    def create_rows(self, count, start=0):
+        for i in range(start, start + count):
+            user = get_user_model().objects.create_user(
+                email=f'user{i}@example.com',
+            )
+            Recipe.objects.create(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=5,
+                price=Decimal('5.00'),
+            )
+            Tag.objects.create(user=user, name=f'Tag {i}')
+
+    @contextmanager
+    def assertQueries(self, num):
+        """Count queries on the default database and the shard together."""
+        with ExitStack() as stack:
+            contexts = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in {DEFAULT_DB_ALIAS, shard_db()}
+            ]
+            yield
+        self.assertEqual(sum(len(context) for context in contexts), num)
+
+    def test_changelist_query_count_is_constant(self):
+        """Test the changelists run a fixed number of queries."""
+        # Session, user, COUNT, the page and its users.
+        self.create_rows(3)
+        for name in ['recipe', 'tag']:
+            with self.subTest(name=name), self.assertQueries(5):
+                res = self.client.get(reverse(f'admin:core_{name}_changelist'))
+                self.assertEqual(res.status_code, 200)
+
+        self.create_rows(20, start=3)
+        for name in ['recipe', 'tag']:
+            with self.subTest(name=name), self.assertQueries(5):
+                self.client.get(reverse(f'admin:core_{name}_changelist'))
+
+    def search(self, name, term):
+        res = self.client.get(
+            reverse(f'admin:core_{name}_changelist'),
+            {'q': term},
+        )
+        self.assertEqual(res.status_code, 200)
+        return list(res.context['cl'].result_list)
+
+    def test_search_changelist(self):
+        """Test searching by whole-term prefix and owner email."""
+        self.create_rows(12)
+
+        results = self.search('recipe', 'Recipe 1')
+        self.assertEqual(
+            sorted(recipe.title for recipe in results),
+            ['Recipe 1', 'Recipe 10', 'Recipe 11'],
+        )
+        results = self.search('tag', 'Tag 2')
+        self.assertEqual([tag.name for tag in results], ['Tag 2'])
+        self.assertEqual(self.search('recipe', 'ecipe 1'), [])
+
+        # The owner's id is looked up before the COUNT and the page.
+        with self.assertQueries(6):
+            results = self.search('recipe', 'user2@example.com')
+        self.assertEqual([recipe.title for recipe in results], ['Recipe 2'])
+
+    def test_search_other_changelists(self):
+        """Test ingredients and webhook endpoints match the whole term."""
+        user = get_user_model().objects.create_user(email='cook@example.com')
+        for name in ['Olive oil', 'Olive', 'Oil']:
+            Ingredient.objects.create(user=user, name=name)
+        for path in ['hooks', 'hooks/recipes', 'other']:
+            WebhookEndpoint.objects.create(
+                user=user,
+                url=f'https://example.com/{path}',
+                secret='secret',
+            )
+
+        results = self.search('ingredient', 'olive oil')
+        self.assertEqual([i.name for i in results], ['Olive oil'])
+        results = self.search('webhookendpoint', 'https://example.com/hooks')
+        self.assertEqual(
+            sorted(endpoint.url for endpoint in results),
+            ['https://example.com/hooks', 'https://example.com/hooks/recipes'],
+        )
+
+    def test_change_page_does_not_list_users(self):
+        """Test the change form uses a raw id widget for the owner."""
+        self.create_rows(3)
+        recipe = Recipe.objects.first()
+        url = reverse('admin:core_recipe_change', args=[recipe.id])
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'vForeignKeyRawIdAdminField')
+        self.assertNotContains(res, 'user2@example.com')
+
+
+@override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=1000)
+class EstimatedCountPaginatorTests(TestCase):
+    """Test the estimated-count paginator."""
+
+    def test_exact_count_without_estimate(self):
+        """Test the exact count is used when no estimate is available."""
+        paginator = EstimatedCountPaginator(Recipe.objects.order_by('id'), 10)
+
+        self.assertEqual(paginator.count, 0)
+
+    @mock.patch.object(EstimatedCountPaginator, 'estimate_count')
+    def test_large_estimate_used(self, patched_estimate):
+        """Test estimates above the threshold replace COUNT(*)."""
+        patched_estimate.return_value = 5000
+        paginator = EstimatedCountPaginator(Recipe.objects.order_by('id'), 10)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 5000)
+
+    @mock.patch.object(EstimatedCountPaginator, 'estimate_count')
+    def test_small_estimate_counted_exactly(self, patched_estimate):
+        """Test small tables are still counted exactly."""
+        patched_estimate.return_value = 10
+        paginator = EstimatedCountPaginator(Recipe.objects.order_by('id'), 10)
+
+        self.assertEqual(paginator.count, 0)
+
+    def test_filtered_lists_not_estimated(self):
+        """Test filtered querysets have no estimate."""
+        paginator = EstimatedCountPaginator(
+            Recipe.objects.filter(title='x').order_by('id'),
+            10,
+        )
+
+        self.assertIsNone(paginator.estimate_count())
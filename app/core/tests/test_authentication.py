@@ -0,0 +1,163 @@
+"""
+Tests for expiring API tokens.
+"""
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import issue_token
+from core.models import TokenUsage
+
+ME_URL = reverse('user:me')
+TOKEN_URL = reverse('user:token')
+
+
+@override_settings(
+    TOKEN_TTL=timedelta(days=30),
+    TOKEN_LAST_USED_INTERVAL=timedelta(minutes=5),
+)
+class ExpiringTokenTests(TestCase):
+    """Test token expiry, last-used tracking and purging."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+
+    def set_last_used(self, token, ago):
+        TokenUsage.objects.filter(token=token).update(
+            last_used=timezone.now() - ago,
+        )
+
+    def get_me(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return self.client.get(ME_URL)
+
+    def test_live_token_authenticates(self):
+        """Test a recently used token is accepted."""
+        token = issue_token(self.user)
+
+        res = self.get_me(token)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_expired_token_rejected(self):
+        """Test a token unused for longer than the TTL is rejected."""
+        token = issue_token(self.user)
+        self.set_last_used(token, timedelta(days=31))
+
+        res = self.get_me(token)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res.data['detail'], 'Token has expired.')
+
+    def test_token_without_usage_expires_from_creation(self):
+        """Test a token never used expires relative to its creation."""
+        token = Token.objects.create(user=self.user)
+        Token.objects.filter(key=token.key).update(
+            created=timezone.now() - timedelta(days=31),
+        )
+
+        res = self.get_me(token)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_use_slides_expiry(self):
+        """Test using a token records the use, renewing it."""
+        token = issue_token(self.user)
+        self.set_last_used(token, timedelta(days=29))
+
+        self.get_me(token)
+
+        usage = TokenUsage.objects.get(token=token)
+        self.assertLess(timezone.now() - usage.last_used, timedelta(minutes=1))
+
+    def test_recent_use_not_written(self):
+        """Test uses within the interval do not write the last-used time."""
+        token = issue_token(self.user)
+        self.set_last_used(token, timedelta(minutes=1))
+        before = TokenUsage.objects.get(token=token).last_used
+
+        with self.assertNumQueries(1):
+            res = self.get_me(token)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(TokenUsage.objects.get(token=token).last_used, before)
+
+    def test_login_replaces_expired_token(self):
+        """Test logging in issues a new token once the old one expired."""
+        token = issue_token(self.user)
+        self.set_last_used(token, timedelta(days=31))
+
+        res = self.client.post(TOKEN_URL, {
+            'email': 'user@example.com',
+            'password': 'testpass123',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['token'], token.key)
+        self.assertFalse(Token.objects.filter(key=token.key).exists())
+
+    def test_login_keeps_live_token(self):
+        """Test logging in again returns the same live token."""
+        token = issue_token(self.user)
+
+        res = self.client.post(TOKEN_URL, {
+            'email': 'user@example.com',
+            'password': 'testpass123',
+        })
+
+        self.assertEqual(res.data['token'], token.key)
+
+    def test_purge_tokens(self):
+        """Test the purge command deletes only expired tokens in batches."""
+        users = [
+            get_user_model().objects.create_user(
+                f'user{i}@example.com',
+                'testpass123',
+            )
+            for i in range(5)
+        ]
+        expired = [issue_token(user) for user in users]
+        for token in expired:
+            self.set_last_used(token, timedelta(days=31))
+        live = issue_token(self.user)
+        out = StringIO()
+
+        call_command('purge_tokens', batch_size=2, stdout=out)
+
+        self.assertEqual(list(Token.objects.all()), [live])
+        self.assertIn('Purged 5 expired tokens.', out.getvalue())
+
+    def test_backfill_token_usage(self):
+        """Test old tokens without a recorded use stay valid once migrated."""
+        old = Token.objects.create(user=self.user)
+        Token.objects.filter(pk=old.pk).update(
+            created=timezone.now() - timedelta(days=400),
+        )
+        migration = import_module('core.migrations.0022_token_usage_backfill')
+
+        # The backfill only reads the schema editor's connection.
+        schema_editor = SimpleNamespace(connection=connection)
+        migration.backfill_token_usage(apps, schema_editor)
+
+        self.assertEqual(self.get_me(old).status_code, status.HTTP_200_OK)
+        usage = TokenUsage.objects.get(token=old)
+        self.assertGreater(
+            usage.last_used,
+            timezone.now() - timedelta(minutes=1),
+        )
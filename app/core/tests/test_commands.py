@@ -2,13 +2,19 @@
 Test custom Django management commands.
 """
 
+import subprocess
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+
+from core.management.commands import profile_startup
+from core.models import AccountDeletion, Job, Tag
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -35,3 +41,102 @@ class CommandsTest(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   email_validator.syntax
+import time:       300 |        420 | email_validator
+import time:      1000 |       5000 | rest_framework
+"""
+
+
+class ProfileStartupCommandTests(SimpleTestCase):
+    """Test the profile_startup command."""
+
+    def test_parse_importtime(self):
+        """Test parsing -X importtime output skips the header."""
+        imports = profile_startup.parse_importtime(IMPORTTIME_OUTPUT)
+
+        self.assertEqual(imports, [
+            ('email_validator.syntax', 120, 120),
+            ('email_validator', 300, 420),
+            ('rest_framework', 1000, 5000),
+        ])
+
+    @patch('core.management.commands.profile_startup.subprocess.run')
+    def test_profile_startup_reports_timings(self, patched_run):
+        """Test slowest imports and AppConfig.ready timings are reported."""
+        patched_run.return_value = subprocess.CompletedProcess(
+            args=[],
+            returncode=0,
+            stdout='{"admin": 0.0065, "core": 0.0001}\n',
+            stderr=IMPORTTIME_OUTPUT,
+        )
+        out = StringIO()
+
+        call_command('profile_startup', limit=2, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('rest_framework', output)
+        self.assertIn('email_validator', output)
+        self.assertNotIn('email_validator.syntax', output)
+        self.assertIn('6.5  admin', output)
+        self.assertIn('Total import time: 1.4 ms', output)
+
+
+class DeleteAccountCommandTests(TestCase):
+    """Test the delete_account command."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        Tag.objects.create(user=self.user, name='Vegan')
+
+    def test_delete_account(self):
+        """Test an account is deleted and progress reported."""
+        out = StringIO()
+
+        call_command('delete_account', 'user@example.com', stdout=out)
+
+        self.assertIn('0 recipes, 1 tags deleted...', out.getvalue())
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists()
+        )
+
+    def test_resume_unfinished_deletions(self):
+        """Test --resume finishes deletions left running."""
+        deletion = AccountDeletion.objects.create(
+            user_id=self.user.id,
+            status=AccountDeletion.RUNNING,
+        )
+
+        call_command('delete_account', resume=True, stdout=StringIO())
+
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.status, AccountDeletion.DONE)
+        self.assertEqual(deletion.tags_deleted, 1)
+
+
+class RunWorkersCommandTests(TestCase):
+    """Test the run_workers command."""
+
+    def test_run_workers_once_runs_account_deletion(self):
+        """Test a queued account deletion is run by the worker."""
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        deletion = AccountDeletion.objects.create(user_id=user.id)
+        job = Job.objects.create(
+            name='delete_account',
+            payload={'deletion_id': deletion.id},
+        )
+
+        call_command('run_workers', processes=1, once=True, stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertFalse(get_user_model().objects.filter(id=user.id).exists())
@@ -0,0 +1,159 @@
+"""
+Tests for response compression.
+"""
+import gzip
+import json
+import unittest
+from io import StringIO
+
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import compression
+from core.middleware import CompressionMiddleware
+
+BODY = json.dumps([{'title': f'Recipe {i}'} for i in range(200)]).encode()
+
+
+class NegotiationTests(SimpleTestCase):
+    """Test choosing a coding from Accept-Encoding."""
+
+    def test_highest_quality_wins(self):
+        """Test the client's quality values are respected."""
+        coding = compression.choose_coding(
+            'br;q=0.5, gzip;q=0.9, zstd;q=0.1',
+            ['br', 'zstd', 'gzip'],
+        )
+
+        self.assertEqual(coding, 'gzip')
+
+    def test_server_preference_breaks_ties(self):
+        """Test equal qualities pick the first preferred coding."""
+        coding = compression.choose_coding('gzip, br', ['br', 'gzip'])
+
+        self.assertEqual(coding, 'br')
+
+    def test_refused_codings(self):
+        """Test q=0 and identity-only headers get no coding."""
+        self.assertIsNone(compression.choose_coding('gzip;q=0', ['gzip']))
+        self.assertIsNone(compression.choose_coding('identity', ['gzip']))
+        self.assertEqual(
+            compression.choose_coding('*;q=0.5', ['gzip']),
+            'gzip',
+        )
+
+    @override_settings(
+        COMPRESSION_LEVELS={'gzip': 6},
+        COMPRESSION_ROUTE_LEVELS={'recipe:recipe-list': {'gzip': 1}},
+    )
+    def test_route_level(self):
+        """Test a route's level overrides the default."""
+        self.assertEqual(
+            compression.coding_level('gzip', 'recipe:recipe-list'),
+            1,
+        )
+        self.assertEqual(compression.coding_level('gzip', 'other'), 6)
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test the middleware compresses eligible responses."""
+
+    def run_middleware(self, response, accept='gzip'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        request.resolver_match = None
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_gzip_response(self):
+        """Test a large JSON response is gzipped."""
+        response = HttpResponse(BODY, content_type='application/json')
+        response['ETag'] = '"abc"'
+
+        response = self.run_middleware(response)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), BODY)
+        self.assertEqual(
+            response['Content-Length'],
+            str(len(response.content)),
+        )
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_small_response_skipped(self):
+        """Test responses under the threshold are left alone."""
+        response = HttpResponse(b'{}', content_type='application/json')
+
+        response = self.run_middleware(response)
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_binary_response_skipped(self):
+        """Test content types that do not compress are left alone."""
+        response = HttpResponse(BODY, content_type='image/png')
+
+        response = self.run_middleware(response)
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_no_accepted_coding(self):
+        """Test clients without Accept-Encoding get the plain body."""
+        response = HttpResponse(BODY, content_type='application/json')
+
+        response = self.run_middleware(response, accept='')
+
+        self.assertEqual(response.content, BODY)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_streaming_response(self):
+        """Test streaming bodies are compressed chunk by chunk."""
+        consumed = []
+
+        def chunks():
+            for i in range(100):
+                consumed.append(i)
+                yield b'{"line": %d}\n' % i
+
+        response = StreamingHttpResponse(
+            chunks(),
+            content_type='application/x-ndjson',
+        )
+
+        response = self.run_middleware(response)
+        self.assertEqual(consumed, [])
+        body = b''.join(response.streaming_content)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(
+            gzip.decompress(body),
+            b''.join(b'{"line": %d}\n' % i for i in range(100)),
+        )
+
+    @unittest.skipIf(compression.brotli is None, 'Needs brotli.')
+    def test_brotli_response(self):
+        """Test brotli is preferred when installed and accepted."""
+        response = HttpResponse(BODY, content_type='application/json')
+
+        response = self.run_middleware(response, accept='gzip, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content), BODY)
+
+
+class BenchmarkCompressionTests(SimpleTestCase):
+    """Test the compression benchmark command."""
+
+    def test_reports_each_coding(self):
+        """Test every available coding is reported."""
+        out = StringIO()
+
+        call_command(
+            'benchmark_compression',
+            sizes=[5],
+            repeat=1,
+            stdout=out,
+        )
+
+        for coding in compression.available_codings():
+            self.assertIn(coding, out.getvalue())
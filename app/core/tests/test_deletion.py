@@ -0,0 +1,106 @@
+"""
+Tests for chunked account deletion.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core import deletion as account_deletion
+from core.models import AccountDeletion, Recipe, Tag
+from core.sharding import shard_db
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_recipes(user, count):
+    Recipe.objects.bulk_create([
+        Recipe(user=user, title=f'Recipe {i}', time_minutes=5,
+               price=Decimal('1.00'))
+        for i in range(count)
+    ])
+
+
+class AccountDeletionTests(TestCase):
+    """Test deleting accounts in chunks."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.other_user = create_user('other@example.com')
+        create_recipes(self.user, 5)
+        create_recipes(self.other_user, 2)
+        Tag.objects.create(user=self.user, name='Vegan')
+
+    def test_run_account_deletion_in_chunks(self):
+        """Test recipes and tags are deleted in chunks, then the user."""
+        deletion, created = account_deletion.request_account_deletion(
+            self.user,
+        )
+        progress = []
+
+        account_deletion.run_account_deletion(
+            deletion,
+            chunk_size=2,
+            progress=lambda d: progress.append(
+                (d.recipes_deleted, d.tags_deleted)
+            ),
+        )
+
+        self.assertEqual(progress, [(2, 0), (4, 0), (5, 0), (5, 1)])
+        self.assertEqual(deletion.status, AccountDeletion.DONE)
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists()
+        )
+        self.assertFalse(Tag.objects.filter(user_id=self.user.id).exists())
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_each_chunk_is_one_select_and_one_delete(self):
+        """Test a chunk of tags is deleted without loading the rows."""
+        queryset = Tag.objects.filter(user=self.user)
+
+        with CaptureQueriesContext(connections[shard_db()]) as queries:
+            next(account_deletion.delete_in_chunks(queryset, 10))
+
+        statements = [
+            query['sql'].split()[0] for query in queries.captured_queries
+            if 'SAVEPOINT' not in query['sql']
+        ]
+        self.assertEqual(statements, ['SELECT', 'DELETE'])
+        self.assertFalse(queryset.exists())
+
+    def test_chunk_cascades_reading_only_ids(self):
+        """Test recipes and their ingredient lines go without loading rows."""
+        queryset = Recipe.objects.filter(user=self.user)
+
+        with CaptureQueriesContext(connections[shard_db()]) as queries:
+            next(account_deletion.delete_in_chunks(queryset, 10))
+
+        selects = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(len(selects), 2)
+        self.assertNotIn('"title"', selects[1])
+        self.assertFalse(queryset.exists())
+
+    def test_resume_failed_deletion(self):
+        """Test a failed deletion is reused and resumed."""
+        deletion = AccountDeletion.objects.create(
+            user_id=self.user.id,
+            status=AccountDeletion.FAILED,
+            recipes_deleted=3,
+        )
+
+        resumed, created = account_deletion.request_account_deletion(
+            self.user,
+        )
+        account_deletion.run_account_deletion(resumed)
+
+        self.assertFalse(created)
+        self.assertEqual(resumed.id, deletion.id)
+        self.assertEqual(resumed.recipes_deleted, 8)
+        self.assertEqual(resumed.status, AccountDeletion.DONE)
@@ -0,0 +1,150 @@
+"""
+Tests for the database-backed job queue.
+"""
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+
+TEST_TASKS = {
+    'succeed': 'core.tests.test_jobs.succeed_task',
+    'fail': 'core.tests.test_jobs.fail_task',
+    'sleep': 'core.tests.test_jobs.sleep_task',
+}
+
+
+def succeed_task(job):
+    return {'echo': job.payload}
+
+
+def fail_task(job):
+    raise RuntimeError('Task failed.')
+
+
+def sleep_task(job):
+    time.sleep(job.payload['seconds'])
+
+
+@override_settings(JOB_TASKS=TEST_TASKS, JOB_RETRY_DELAY=10)
+class JobQueueTests(TestCase):
+    """Test enqueueing, claiming and running jobs."""
+
+    def test_enqueue_unknown_task_error(self):
+        """Test enqueueing a task that is not configured raises an error."""
+        with self.assertRaises(ValueError):
+            jobs.enqueue('missing')
+
+    def test_claim_job_in_order(self):
+        """Test jobs are claimed oldest first and only once."""
+        first = jobs.enqueue('succeed')
+        second = jobs.enqueue('succeed')
+
+        claimed = [jobs.claim_job(), jobs.claim_job(), jobs.claim_job()]
+
+        self.assertEqual([claimed[0].id, claimed[1].id], [first.id, second.id])
+        self.assertIsNone(claimed[2])
+        first.refresh_from_db()
+        self.assertEqual(first.status, Job.RUNNING)
+        self.assertEqual(first.attempts, 1)
+
+    def test_expired_visibility_timeout_reclaimed(self):
+        """Test a running job is reclaimed after its lock expires."""
+        job = jobs.enqueue('succeed')
+        jobs.claim_job(visibility_timeout=60)
+        self.assertIsNone(jobs.claim_job())
+
+        Job.objects.filter(id=job.id).update(
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        reclaimed = jobs.claim_job()
+
+        self.assertEqual(reclaimed.id, job.id)
+        self.assertEqual(reclaimed.attempts, 2)
+
+    def test_expired_final_attempt_failed(self):
+        """Test an expired job with no attempts left fails, not reruns."""
+        job = jobs.enqueue('succeed', max_attempts=1)
+        jobs.claim_job(visibility_timeout=60)
+        Job.objects.filter(id=job.id).update(
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+
+        self.assertIsNone(jobs.claim_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(job.locked_until)
+
+    def test_extend_lease(self):
+        """Test a running job's lease is pushed back until it finishes."""
+        jobs.enqueue('succeed')
+        job = jobs.claim_job(visibility_timeout=60)
+
+        self.assertTrue(jobs.extend_lease(job, 600))
+        job.refresh_from_db()
+        self.assertGreater(
+            job.locked_until,
+            timezone.now() + timedelta(seconds=500),
+        )
+
+        jobs.run_job(job)
+        self.assertFalse(jobs.extend_lease(job, 600))
+
+    @mock.patch.object(jobs, 'extend_lease', return_value=True)
+    def test_run_job_renews_lease(self, patched_extend):
+        """Test the lease is renewed while a long task runs."""
+        jobs.enqueue('sleep', {'seconds': 0.2})
+
+        job = jobs.run_job(jobs.claim_job(), visibility_timeout=0.03)
+
+        self.assertEqual(job.status, Job.DONE)
+        self.assertGreaterEqual(patched_extend.call_count, 2)
+        patched_extend.assert_called_with(job, 0.03)
+
+    def test_run_job_success(self):
+        """Test a successful job stores its result."""
+        jobs.enqueue('succeed', {'value': 1})
+
+        job = jobs.run_job(jobs.claim_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.result, {'echo': {'value': 1}})
+        self.assertIsNone(job.locked_until)
+
+    def test_run_job_retries_with_backoff(self):
+        """Test a failed job is requeued after a backoff delay."""
+        jobs.enqueue('fail', max_attempts=2)
+
+        before = timezone.now()
+        job = jobs.run_job(jobs.claim_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.error, 'Task failed.')
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=10))
+        self.assertIsNone(jobs.claim_job())
+
+    def test_run_job_fails_after_max_attempts(self):
+        """Test a job is marked failed once attempts are exhausted."""
+        job = jobs.enqueue('fail', max_attempts=1)
+
+        jobs.run_job(jobs.claim_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_work_until_idle(self):
+        """Test a worker drains runnable jobs and stops when idle."""
+        jobs.enqueue('succeed')
+        jobs.enqueue('succeed')
+
+        jobs.work(stop_when_idle=True)
+
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 2)
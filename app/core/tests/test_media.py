@@ -0,0 +1,79 @@
+"""
+Tests for serving media files.
+"""
+import os
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from core.media import RangeNotSatisfiable, parse_range
+
+CONTENT = bytes(range(256)) * 4
+
+
+class ParseRangeTests(SimpleTestCase):
+    """Test reading Range headers."""
+
+    def test_ranges(self):
+        """Test bounded, open and suffix ranges."""
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=50-500', 100), (50, 99))
+
+    def test_ignored_ranges(self):
+        """Test absent and multiple ranges serve the whole file."""
+        self.assertIsNone(parse_range('', 100))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+
+    def test_unsatisfiable(self):
+        """Test ranges starting past the end are refused."""
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=100-', 100)
+
+
+class ServeMediaTests(SimpleTestCase):
+    """Test the media view."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        with open(os.path.join(directory.name, 'photo.jpg'), 'wb') as file:
+            file.write(CONTENT)
+        self.url = reverse('media', args=['photo.jpg'])
+
+    def test_whole_file(self):
+        """Test the file is served with immutable cache headers."""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', res['Cache-Control'])
+
+    def test_range_request(self):
+        """Test a byte range is served as partial content."""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT[10:20])
+        self.assertEqual(res['Content-Range'], f'bytes 10-19/{len(CONTENT)}')
+        self.assertEqual(res['Content-Length'], '10')
+
+    def test_unsatisfiable_range(self):
+        """Test a range past the end is refused."""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_path_outside_media_root(self):
+        """Test paths escaping the media root are not found."""
+        res = self.client.get('/media/../secret.txt')
+
+        self.assertEqual(res.status_code, 404)
@@ -5,8 +5,9 @@ from decimal import Decimal
 
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 
-from core import models
+from core import emails, models
 
 
 def create_user(email='user@example.com', password='testpass123'):
@@ -54,6 +55,33 @@ class ModelTests(TestCase):
             with self.assertRaises(ValueError):
                 user = get_user_model().objects.create_user(email, 'testpass123')
 
+    def test_email_domain_validation_cached(self):
+        """Test domain validation results are memoized per domain."""
+        emails.check_domain.cache_clear()
+
+        create_user('first@example.com')
+        create_user('second@EXAMPLE.com')
+
+        info = emails.check_domain.cache_info()
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.hits, 1)
+
+    def test_invalid_email_domain_raises_error(self):
+        """Test an invalid domain raises ValueError on every attempt."""
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                create_user('user@exa_mple.com')
+
+    def test_bulk_create_users(self):
+        """Test bulk creating users with precomputed password hashes."""
+        get_user_model().objects.bulk_create_users([
+            {'email': 'one@example.com', 'password': make_password('pass1')},
+            {'email': 'two@example.com', 'password': make_password('pass2')},
+        ])
+
+        user = get_user_model().objects.get(email='two@example.com')
+        self.assertTrue(user.check_password('pass2'))
+
     def test_create_super_user(self):
         """Test creating a superuser"""
         user = get_user_model().objects.create_superuser(
@@ -0,0 +1,113 @@
+"""
+Tests for partitioning the recipe table.
+"""
+import unittest
+from decimal import Decimal
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import partitioning
+from core.models import Recipe
+
+
+class PartitionDdlTests(SimpleTestCase):
+    """Test the partitioned table definition."""
+
+    def test_hash_partitions(self):
+        """Test one partition is created per remainder."""
+        statements = partitioning.partition_ddl(4)
+
+        self.assertIn('PARTITION BY HASH (user_id)', statements[0])
+        self.assertIn('PRIMARY KEY (id, user_id)', statements[1])
+        self.assertEqual(len(statements), 6)
+        self.assertIn('MODULUS 4, REMAINDER 3', statements[-1])
+
+    def test_no_constraints_reference_recipes(self):
+        """Test no model adds a foreign key constraint to the recipe id."""
+        for model in apps.get_models(include_auto_created=True):
+            for field in model._meta.local_fields:
+                if field.related_model is Recipe:
+                    with self.subTest(field=str(field)):
+                        self.assertFalse(field.db_constraint)
+
+    @unittest.skipIf(connection.vendor == 'postgresql', 'Runs on Postgres.')
+    def test_needs_postgres(self):
+        """Test the command refuses to run on other databases."""
+        with self.assertRaises(CommandError):
+            call_command('partition_recipes', 'prepare')
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Needs Postgres.')
+class PartitionRecipesTests(TestCase):
+    """Test converting the recipe table while it is written to."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, title):
+        return Recipe.objects.create(
+            user=self.user,
+            title=title,
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+
+    def run_step(self, *args):
+        call_command('partition_recipes', *args, stdout=StringIO())
+
+    def test_convert_online(self):
+        """Test writes during the copy survive the swap."""
+        kept = self.create_recipe('Kept')
+        edited = self.create_recipe('Edited')
+        deleted = self.create_recipe('Deleted')
+
+        self.run_step('prepare', '--partitions', '4')
+        added = self.create_recipe('Added during copy')
+        self.run_step('copy', '--batch-size', '1')
+        edited.title = 'Edited during copy'
+        edited.save()
+        deleted.delete()
+        self.run_step('swap')
+
+        self.assertTrue(partitioning.is_partitioned())
+        res = self.client.get(reverse('recipe:recipe-list'))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['title'] for recipe in res.data],
+            ['Added during copy', 'Edited during copy', 'Kept'],
+        )
+        detail = reverse('recipe:recipe-detail', args=[added.id])
+        res = self.client.patch(detail, {'title': 'Renamed'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.delete(
+            reverse('recipe:recipe-detail', args=[kept.id]),
+        )
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertGreater(self.create_recipe('New').id, added.id)
+
+        self.run_step('drop-old')
+        self.assertFalse(
+            partitioning.table_exists(partitioning.OLD_TABLE),
+        )
+
+    def test_swap_refuses_incomplete_copy(self):
+        """Test the swap is refused until every row is copied."""
+        self.create_recipe('Not copied')
+        self.run_step('prepare')
+
+        with self.assertRaises(CommandError):
+            self.run_step('swap')
@@ -0,0 +1,179 @@
+"""
+Tests for per-request profiling.
+"""
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import profiling
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class ProfilingTests(TestCase):
+    """Test flagged staff requests are profiled."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(PROFILE_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.staff = get_user_model().objects.create_user(
+            'staff@example.com',
+            'testpass123',
+            is_staff=True,
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.staff)}'
+        )
+
+    def profiles(self):
+        return list(profiling.read_profiles(self.directory))
+
+    def test_profile_with_header(self):
+        """Test a flagged request saves a speedscope file with its SQL."""
+        res = self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, 200)
+        [(name, profile)] = self.profiles()
+        self.assertEqual(res['X-Profile-Id'], name)
+        self.assertEqual(profile['$schema'], profiling.SPEEDSCOPE_SCHEMA)
+        self.assertEqual(
+            [p['name'].split()[-1] for p in profile['profiles']],
+            ['CPU', 'SQL'],
+        )
+        request = profile['request']
+        self.assertEqual(request['view'], 'recipe:recipe-list')
+        self.assertEqual(request['status'], 200)
+        self.assertGreater(request['query_count'], 0)
+        self.assertEqual(
+            len(profile['profiles'][1]['samples']),
+            request['query_count'],
+        )
+        leaf = profile['profiles'][1]['samples'][0][-1]
+        self.assertTrue(
+            profile['shared']['frames'][leaf]['name'].startswith('SQL '),
+        )
+
+    def test_profile_with_query_flag(self):
+        """Test ?profile=1 also profiles the request."""
+        self.client.get(RECIPES_URL, {'profile': '1'})
+
+        self.assertEqual(len(self.profiles()), 1)
+
+    def test_unflagged_request(self):
+        """Test requests without the flag are not profiled."""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertEqual(self.profiles(), [])
+
+    def test_flag_turned_off(self):
+        """Test only 1 or true turn profiling on."""
+        for value in ('0', 'false', 'no'):
+            self.client.get(RECIPES_URL, {'profile': value})
+            self.client.get(RECIPES_URL, HTTP_X_PROFILE=value)
+        self.client.get(RECIPES_URL, {'profile': 'true'})
+
+        self.assertEqual(len(self.profiles()), 1)
+
+    def test_non_staff_not_profiled(self):
+        """Test the flag is ignored for other users."""
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}'
+        )
+
+        res = client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertEqual(self.profiles(), [])
+
+    @override_settings(PROFILE_MAX_FILES=2)
+    def test_directory_bounded(self):
+        """Test only the newest profiles are kept."""
+        names = [
+            self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')['X-Profile-Id']
+            for _ in range(3)
+        ]
+
+        self.assertEqual(
+            sorted(profiling.list_profiles(self.directory)),
+            names[1:],
+        )
+
+    def test_profile_report(self):
+        """Test the report aggregates profiles by view."""
+        self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+        self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+        out = StringIO()
+
+        call_command('profile_report', list=True, path=self.directory,
+                     stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('recipe:recipe-list: 2 x', output)
+        self.assertIn('2 profiles of 1 views.', output)
+
+
+class SpeedscopeTests(TestCase):
+    """Test the profiler's output without a request."""
+
+    def test_samples_and_queries(self):
+        """Test sampled stacks and queries end up in the file."""
+        with profiling.Profiler(interval=0.5) as profiler:
+            get_user_model().objects.count()
+            total = 0
+            for number in range(200000):
+                total += number
+
+        profile = profiler.speedscope('test', {'view': 'test'})
+
+        json.dumps(profile)
+        cpu, sql = profile['profiles']
+        self.assertEqual(len(cpu['samples']), len(cpu['weights']))
+        self.assertGreater(len(cpu['samples']), 0)
+        self.assertEqual(len(sql['samples']), 1)
+        frames = profile['shared']['frames']
+        self.assertTrue(any(
+            frame['name'] == 'test_samples_and_queries'
+            for frame in frames
+        ))
+        self.assertIn(os.path.basename(__file__), json.dumps(frames))
+
+    def test_frames_added_concurrently(self):
+        """Test frames added from several threads keep one index each."""
+        frames = profiling.Frames()
+        names = [f'frame{i}' for i in range(2000)]
+
+        def add_all():
+            for name in names:
+                frames.add(name)
+
+        threads = [threading.Thread(target=add_all) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(frames.frames), len(names))
+        for name in names:
+            self.assertEqual(frames.frames[frames.add(name)]['name'], name)
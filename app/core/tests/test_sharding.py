@@ -0,0 +1,245 @@
+"""
+Tests for sharding recipe data across databases.
+
+The database tests need a second shard, for example with SQLite files:
+
+    DB_SQLITE_DIR=/tmp SHARD_DATABASES=default,shard1 \
+        python manage.py test core.tests.test_sharding
+"""
+import unittest
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import rebalance, sharding
+from core.changes import record_changes
+from core.deletion import request_account_deletion, run_account_deletion
+from core.models import Change, Recipe, RecipeStats
+from core.rebalance import move_user, plan_moves
+
+RECIPES_URL = reverse('recipe:recipe-list')
+SYNC_URL = reverse('recipe:recipe-sync')
+
+
+@override_settings(SHARD_DATABASES=['default', 'shard1', 'shard2'])
+class ShardMapTests(SimpleTestCase):
+    """Test placing users and reading cursors."""
+
+    def test_placement_by_user_id(self):
+        """Test users are spread over the shards by id."""
+        self.assertEqual(
+            [sharding.placement(user_id) for user_id in range(1, 5)],
+            ['shard1', 'shard2', 'default', 'shard1'],
+        )
+
+    def test_recorded_shard_wins(self):
+        """Test a user's recorded shard is used over their placement."""
+        user = get_user_model()(id=1, shard='shard2')
+
+        self.assertEqual(sharding.shard_for_user(user), 'shard2')
+
+    def test_cursor_shard(self):
+        """Test change ids tell which shard issued them."""
+        start = sharding.id_range_start('shard2')
+
+        self.assertEqual(sharding.cursor_shard(start + 5), 2)
+        self.assertEqual(sharding.cursor_shard(5), 0)
+
+    @override_settings(SHARD_DATABASES=['default'])
+    def test_single_shard_not_routed(self):
+        """Test the router stays out of the way without shards."""
+        router = sharding.ShardRouter()
+
+        self.assertIsNone(router.db_for_read(Recipe))
+
+
+class PlanMovesTests(SimpleTestCase):
+    """Test planning moves between shards."""
+
+    def test_moves_to_emptiest(self):
+        """Test users move from the fullest shard to the emptiest."""
+        loads = {
+            'default': {1: 50, 2: 30, 3: 20},
+            'shard1': {4: 10},
+        }
+
+        moves = plan_moves(loads)
+
+        self.assertEqual(moves, [(2, 'default', 'shard1')])
+
+    def test_balanced_shards_left_alone(self):
+        """Test nothing moves when the shards are within tolerance."""
+        loads = {'default': {1: 50}, 'shard1': {2: 48}}
+
+        self.assertEqual(plan_moves(loads), [])
+
+
+@unittest.skipUnless(
+    len(settings.SHARD_DATABASES) > 1,
+    'Needs SHARD_DATABASES with at least two shards.',
+)
+@override_settings(SHARD_MOVE_SETTLE_SECONDS=0)
+class ShardedRecipeTests(TestCase):
+    """Test recipe data lives on and moves between shards."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        self.source, self.target = settings.SHARD_DATABASES[-2:]
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+            shard=self.target,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, title):
+        res = self.client.post(RECIPES_URL, {
+            'title': title,
+            'time_minutes': 10,
+            'price': '5.00',
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def test_writes_go_to_user_shard(self):
+        """Test API writes land on the user's shard only."""
+        recipe_id = self.create_recipe('Soup')
+
+        self.assertTrue(
+            Recipe.objects.using(self.target).filter(id=recipe_id).exists()
+        )
+        self.assertFalse(
+            Recipe.objects.using(self.source).filter(id=recipe_id).exists()
+        )
+        self.assertGreaterEqual(
+            recipe_id,
+            sharding.id_range_start(self.target),
+        )
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual([r['title'] for r in res.data], ['Soup'])
+
+    @override_settings(SYNC_COMMIT_LAG_SECONDS=0)
+    def test_rebalance_moves_user(self):
+        """Test a moved user keeps their recipes, ids, history and stats."""
+        kept = self.create_recipe('Kept')
+        deleted = self.create_recipe('Deleted')
+        self.client.delete(reverse('recipe:recipe-detail', args=[deleted]))
+        cursor = self.client.get(SYNC_URL).data['cursor']
+
+        call_command(
+            'rebalance_shards',
+            self.user.email,
+            to=self.source,
+            stdout=StringIO(),
+        )
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.shard, self.source)
+        for model in (Recipe, Change, RecipeStats):
+            self.assertFalse(
+                model.objects.using(self.target).filter(
+                    user=self.user,
+                ).exists()
+            )
+        res = self.client.get(reverse('recipe:recipe-detail', args=[kept]))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get(reverse('recipe:recipe-revisions', args=[kept]))
+        self.assertEqual([r['number'] for r in res.data], [1])
+        res = self.client.get(SYNC_URL, {'cursor': cursor})
+        self.assertEqual([r['id'] for r in res.data['recipes']], [kept])
+        self.assertEqual(res.data['deleted']['recipe'], [deleted])
+        res = self.client.get(reverse('recipe:recipe-stats'))
+        self.assertEqual(res.data['recipe_count'], 1)
+
+    def test_moving_user_writes_refused(self):
+        """Test a user's writes get 503 while their data moves, reads work."""
+        recipe_id = self.create_recipe('Soup')
+        self.user.shard_moving = True
+        self.user.save(update_fields=['shard_moving'])
+
+        res = self.client.post(RECIPES_URL, {
+            'title': 'Stew',
+            'time_minutes': 10,
+            'price': '5.00',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', res)
+        url = reverse('recipe:recipe-detail', args=[recipe_id])
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_write_during_move_kept(self):
+        """Test a write committing after the copy is replayed, not lost."""
+        self.create_recipe('Soup')
+        rebuild_feed = rebalance.rebuild_feed
+        late = []
+
+        def write_late(user_id, source, target):
+            rebuild_feed(user_id, source, target)
+            if not late:
+                late.append(Recipe.objects.using(source).create(
+                    user=self.user,
+                    title='Late',
+                    time_minutes=5,
+                    price=Decimal('2.00'),
+                ))
+                record_changes(Recipe, user_id, [late[0].id], using=source)
+
+        with mock.patch.object(rebalance, 'rebuild_feed', write_late):
+            move_user(self.user, self.source)
+
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.shard_moving)
+        self.assertTrue(
+            Recipe.objects.using(self.source).filter(id=late[0].id).exists()
+        )
+        self.assertFalse(
+            Recipe.objects.using(self.target).filter(
+                user_id=self.user.id,
+            ).exists()
+        )
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(
+            sorted(r['title'] for r in res.data),
+            ['Late', 'Soup'],
+        )
+
+    def test_account_deletion_clears_shard(self):
+        """Test deleting an account removes its rows from the shard."""
+        self.create_recipe('Soup')
+        deletion, _ = request_account_deletion(self.user)
+
+        run_account_deletion(deletion)
+
+        self.assertFalse(
+            Recipe.objects.using(self.target).filter(
+                user_id=self.user.id,
+            ).exists()
+        )
+        self.assertFalse(
+            Change.objects.using(self.target).filter(
+                user_id=self.user.id,
+            ).exists()
+        )
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists()
+        )
+
+    def test_recipe_stats_price(self):
+        """Test stats are kept on the shard as recipes are written."""
+        self.create_recipe('Soup')
+
+        stats = RecipeStats.objects.using(self.target).get(user=self.user)
+
+        self.assertEqual(stats.price_total, Decimal('5.00'))
@@ -0,0 +1,176 @@
+"""
+Tests for the slow query log.
+"""
+import os
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import slow_queries
+from core.models import Recipe
+from core.sharding import shard_db
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class SlowQueryLogTests(TestCase):
+    """Test slow queries are logged with their context."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'slow_queries.log')
+        settings = override_settings(
+            SLOW_QUERY_LOG_PATH=self.path,
+            SLOW_QUERY_THRESHOLD_MS=0,
+            SLOW_QUERY_EXPLAIN_RATE=0,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(self.close_handlers)
+
+    def close_handlers(self):
+        for handler in list(slow_queries.entry_logger.handlers):
+            slow_queries.entry_logger.removeHandler(handler)
+            handler.close()
+
+    def entries(self):
+        return list(slow_queries.read_entries(self.path))
+
+    def test_wrapper_installed(self):
+        """Test connections get the wrapper when they are created."""
+        connection.ensure_connection()
+
+        self.assertIn(
+            slow_queries.log_slow_queries,
+            connection.execute_wrappers,
+        )
+
+    def test_logs_view_and_fingerprints(self):
+        """Test an API request's queries are logged under its view name."""
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        client.get(RECIPES_URL)
+
+        entries = [
+            entry for entry in self.entries()
+            if 'core_recipe' in entry['sql']
+        ]
+        self.assertEqual(entries[0]['view'], 'recipe:recipe-list')
+        self.assertEqual(entries[0]['database'], shard_db())
+        self.assertEqual(len(entries[0]['params_fingerprint']), 16)
+        self.assertGreaterEqual(entries[0]['duration_ms'], 0)
+
+    def test_params_not_logged(self):
+        """Test parameter values never reach the log."""
+        list(Recipe.objects.filter(title='secret-title'))
+
+        with open(f'{self.path}.{os.getpid()}') as file:
+            self.assertNotIn('secret-title', file.read())
+
+    def test_logging_errors_not_raised(self):
+        """Test a failure to log leaves the query's result alone."""
+        with mock.patch.object(
+            slow_queries,
+            'get_handler',
+            side_effect=PermissionError('read-only'),
+        ), self.assertLogs(slow_queries.logger, 'ERROR'):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                self.assertEqual(cursor.fetchone(), (1,))
+
+    @override_settings(SLOW_QUERY_LOG_MAX_BYTES=2000)
+    def test_log_bounded(self):
+        """Test each process rotates its own file within the bound."""
+        for _ in range(50):
+            list(Recipe.objects.filter(title='x'))
+
+        files = slow_queries.log_files(self.path)
+        self.assertEqual(list(files), [os.getpid()])
+        self.assertEqual(len(files[os.getpid()]), 4)
+        for path in files[os.getpid()]:
+            self.assertLessEqual(os.path.getsize(path), 2000)
+        self.assertGreater(len(self.entries()), 0)
+
+    @override_settings(SLOW_QUERY_LOG_MAX_PROCESSES=2)
+    def test_old_process_logs_removed(self):
+        """Test a process starting to log drops the oldest processes' files.
+        """
+        for pid, age in ((1, 300), (2, 200), (3, 100)):
+            for path in (f'{self.path}.{pid}', f'{self.path}.{pid}.1'):
+                with open(path, 'w') as file:
+                    file.write('{}\n')
+                mtime = time.time() - age
+                os.utime(path, (mtime, mtime))
+
+        list(Recipe.objects.all())
+
+        self.assertEqual(
+            sorted(slow_queries.log_files(self.path)),
+            sorted([3, os.getpid()]),
+        )
+
+    def test_in_lists_share_fingerprint(self):
+        """Test IN lists of different lengths have one fingerprint."""
+        self.assertEqual(
+            slow_queries.sql_fingerprint('SELECT 1 WHERE id IN (%s, %s)'),
+            slow_queries.sql_fingerprint('SELECT 1 WHERE id IN (%s,%s,%s)'),
+        )
+
+    def test_fast_queries_not_logged(self):
+        """Test queries under the threshold are skipped."""
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=60000):
+            list(Recipe.objects.all())
+
+        self.assertEqual(self.entries(), [])
+
+    @override_settings(SLOW_QUERY_EXPLAIN_RATE=1)
+    def test_sampled_explain(self):
+        """Test sampled queries are stored with their plan."""
+        with slow_queries.query_context('test'):
+            list(Recipe.objects.filter(user_id=1))
+
+        entry = [e for e in self.entries() if e['view'] == 'test'][0]
+        self.assertIn('recipe_user', entry['plan'])
+
+    @override_settings(SLOW_QUERY_EXPLAIN_RATE=1)
+    def test_locking_queries_not_explained(self):
+        """Test SELECT ... FOR UPDATE is not run again to explain it."""
+        sql = 'SELECT id FROM core_recipe WHERE id = %s FOR UPDATE NOWAIT'
+
+        with mock.patch.object(connection, 'create_cursor') as create:
+            plan = slow_queries.explain(connection, sql, [1])
+
+        self.assertIsNone(plan)
+        create.assert_not_called()
+
+    def test_report_command(self):
+        """Test the report groups queries by fingerprint."""
+        with slow_queries.query_context('report-test'):
+            for _ in range(3):
+                list(Recipe.objects.filter(title='x'))
+        out = StringIO()
+
+        call_command(
+            'slow_query_report',
+            view='report-test',
+            path=self.path,
+            stdout=out,
+        )
+
+        self.assertIn('3 x', out.getvalue())
+        self.assertIn('report-test (3)', out.getvalue())
+        self.assertIn('1 distinct slow queries.', out.getvalue())
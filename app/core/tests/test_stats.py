@@ -0,0 +1,134 @@
+"""
+Tests for incrementally maintained recipe statistics.
+"""
+import random
+import statistics
+from itertools import count
+from decimal import ROUND_HALF_UP, Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from core import stats
+from core.models import Recipe, RecipeStats
+
+
+RECIPE_NUMBERS = count(1)
+
+
+def create_recipe(user, price, time_minutes=10):
+    return Recipe.objects.create(
+        user=user,
+        title=f'Recipe {next(RECIPE_NUMBERS)}',
+        price=Decimal(price),
+        time_minutes=time_minutes,
+    )
+
+
+class RecipeStatsTests(TestCase):
+    """Test maintaining and summarizing recipe stats."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+
+    def test_incremental_updates_match_rebuild(self):
+        """Test random writes applied incrementally match a recompute."""
+        rng = random.Random(0)
+        recipes = []
+        stats.rebuild_stats(self.user.id)
+        for _ in range(200):
+            if recipes and rng.random() < 0.3:
+                recipe = recipes.pop(rng.randrange(len(recipes)))
+                recipe.delete()
+                stats.update_stats(
+                    self.user.id,
+                    removed=(recipe.price, recipe.time_minutes),
+                )
+                continue
+
+            recipe = create_recipe(
+                self.user,
+                Decimal(rng.randint(1, 5000)) / 100,
+                rng.randint(1, 120),
+            )
+            recipes.append(recipe)
+            stats.update_stats(
+                self.user.id,
+                added=(recipe.price, recipe.time_minutes),
+            )
+
+        incremental = stats.summarize(stats.get_stats(self.user.id))
+        rebuilt = stats.summarize(stats.rebuild_stats(self.user.id))
+
+        self.assertEqual(incremental, rebuilt)
+        prices = [recipe.price for recipe in recipes]
+        self.assertEqual(incremental['recipe_count'], len(recipes))
+        self.assertEqual(
+            incremental['median_price'],
+            statistics.median(prices).quantize(Decimal('0.01'), ROUND_HALF_UP),
+        )
+
+    def test_concurrent_first_writes(self):
+        """Test a first write losing the race to create the row is kept."""
+        first = create_recipe(self.user, '4.00')
+        stats.rebuild_stats(self.user.id)
+        second = create_recipe(self.user, '6.00', 20)
+        select_for_update = RecipeStats.objects.select_for_update
+        missing = mock.Mock()
+        missing.filter.return_value.first.return_value = None
+
+        with mock.patch.object(
+            RecipeStats.objects,
+            'select_for_update',
+            side_effect=[missing, select_for_update()],
+        ):
+            stats.update_stats(
+                self.user.id,
+                added=(second.price, second.time_minutes),
+            )
+
+        row = RecipeStats.objects.get()
+        self.assertEqual(row.recipe_count, 2)
+        self.assertEqual(row.price_total, first.price + second.price)
+        self.assertEqual(row.price_counts, {'400': 1, '600': 1})
+
+    def test_summary(self):
+        """Test averages, median and histogram of a small library."""
+        for price, minutes in (('2.00', 10), ('4.00', 20), ('7.50', 31)):
+            create_recipe(self.user, price, minutes)
+
+        summary = stats.summarize(stats.get_stats(self.user.id))
+
+        self.assertEqual(summary['recipe_count'], 3)
+        self.assertEqual(summary['average_price'], Decimal('4.50'))
+        self.assertEqual(summary['median_price'], Decimal('4.00'))
+        self.assertEqual(summary['average_time_minutes'], Decimal('20.33'))
+        self.assertEqual(
+            [bucket['count'] for bucket in summary['price_histogram']],
+            [2, 1],
+        )
+
+    def test_empty_summary(self):
+        """Test a user without recipes has empty stats."""
+        summary = stats.summarize(stats.get_stats(self.user.id))
+
+        self.assertEqual(summary['recipe_count'], 0)
+        self.assertIsNone(summary['median_price'])
+        self.assertEqual(summary['price_histogram'], [])
+
+    def test_rebuild_command(self):
+        """Test the rebuild command fixes drifted stats."""
+        create_recipe(self.user, '3.00')
+        RecipeStats.objects.create(user=self.user, recipe_count=99)
+
+        call_command('rebuild_recipe_stats', stdout=StringIO())
+
+        self.user.recipe_stats.refresh_from_db()
+        self.assertEqual(self.user.recipe_stats.recipe_count, 1)
+        self.assertEqual(self.user.recipe_stats.price_counts, {'300': 1})
@@ -0,0 +1,175 @@
+"""
+Tests for token-bucket throttling.
+"""
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import throttling
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TOKEN_URL = reverse('user:token')
+CREATE_USER_URL = reverse('user:create')
+
+RATES = {
+    'user': '3/min',
+    'anon': '3/min',
+    'login': '2/min',
+    'signup': '1/hour',
+}
+
+
+class TokenBucketTests(SimpleTestCase):
+    """Test the bucket arithmetic."""
+
+    def setUp(self):
+        throttling.reset_buckets()
+        self.addCleanup(throttling.reset_buckets)
+
+    def test_burst_then_refill(self):
+        """Test a full bucket allows a burst, then refills over time."""
+        for _ in range(3):
+            self.assertEqual(throttling.take_token('k', 3, 60, now=0), 0)
+
+        self.assertEqual(throttling.take_token('k', 3, 60, now=0), 20)
+        self.assertEqual(throttling.take_token('k', 3, 60, now=10), 10)
+        self.assertEqual(throttling.take_token('k', 3, 60, now=20), 0)
+
+    def test_buckets_are_per_key(self):
+        """Test clients do not share tokens."""
+        self.assertEqual(throttling.take_token('a', 1, 60, now=0), 0)
+        self.assertEqual(throttling.take_token('b', 1, 60, now=0), 0)
+        self.assertGreater(throttling.take_token('a', 1, 60, now=0), 0)
+
+    @override_settings(THROTTLE_MAX_BUCKETS=2)
+    def test_prune_refilled_buckets(self):
+        """Test idle buckets are dropped once there are too many."""
+        throttling.take_token('a', 1, 60, now=0)
+        throttling.take_token('b', 1, 60, now=50)
+
+        throttling.take_token('c', 1, 60, now=61)
+
+        self.assertEqual(set(throttling._buckets), {'b', 'c'})
+
+    @override_settings(THROTTLE_MAX_BUCKETS=2)
+    def test_prune_oldest_buckets(self):
+        """Test the least recently used bucket goes when none refilled."""
+        throttling.take_token('a', 1, 60, now=0)
+        throttling.take_token('b', 1, 60, now=1)
+        throttling.take_token('a', 1, 60, now=2)
+
+        throttling.take_token('c', 1, 60, now=3)
+
+        self.assertEqual(set(throttling._buckets), {'a', 'c'})
+        self.assertGreater(throttling.take_token('a', 1, 60, now=3), 0)
+
+    @override_settings(THROTTLE_CACHE='default')
+    def test_shared_window(self):
+        """Test the shared counter limits requests across processes."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        self.assertEqual(throttling.take_shared('k', 2, 60, now=0), 0)
+        self.assertEqual(throttling.take_shared('k', 2, 60, now=1), 0)
+        self.assertEqual(throttling.take_shared('k', 2, 60, now=15), 45)
+        self.assertEqual(throttling.take_shared('k', 2, 60, now=60), 0)
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': RATES,
+})
+class ThrottleApiTests(TestCase):
+    """Test throttled API responses."""
+
+    def setUp(self):
+        throttling.reset_buckets()
+        self.addCleanup(throttling.reset_buckets)
+        self.client = APIClient()
+
+    def test_user_throttled_with_retry_after(self):
+        """Test a user over their rate gets a 429 with Retry-After."""
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(user)
+        for _ in range(3):
+            res = self.client.get(RECIPES_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '20')
+
+    def test_users_throttled_separately(self):
+        """Test one user's requests do not use up another's."""
+        for email in ['a@example.com', 'b@example.com']:
+            self.client.force_authenticate(
+                get_user_model().objects.create_user(email, 'testpass123'),
+            )
+            for _ in range(3):
+                res = self.client.get(RECIPES_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_forwarded_for_ignored(self):
+        """Test clients cannot dodge the login bucket by faking addresses."""
+        payload = {'email': 'user@example.com', 'password': 'wrong'}
+        for i in range(3):
+            res = self.client.post(
+                TOKEN_URL,
+                payload,
+                HTTP_X_FORWARDED_FOR=f'10.0.0.{i}',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_login_bucket(self):
+        """Test logins have their own stricter per-IP bucket."""
+        payload = {'email': 'user@example.com', 'password': 'wrong'}
+        for _ in range(2):
+            res = self.client.post(TOKEN_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '30')
+
+    def test_signup_bucket(self):
+        """Test signups are limited per IP address."""
+        res = self.client.post(CREATE_USER_URL, {
+            'email': 'a@example.com',
+            'password': 'testpass123',
+            'name': 'A',
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = self.client.post(CREATE_USER_URL, {
+            'email': 'b@example.com',
+            'password': 'testpass123',
+            'name': 'B',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '3600')
+
+
+class BenchmarkThrottleCommandTests(SimpleTestCase):
+    """Test the throttle benchmark command."""
+
+    def test_reports_overhead(self):
+        """Test the command prints the cost per request."""
+        out = StringIO()
+
+        call_command('benchmark_throttle', requests=100, stdout=out)
+
+        self.assertRegex(out.getvalue(), r'per process: [\d.]+ us/request')
@@ -0,0 +1,273 @@
+"""
+Tests for the webhook outbox and delivery worker.
+"""
+import hashlib
+import hmac
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import webhooks
+from core.models import OutboxEvent, Recipe, WebhookDelivery, WebhookEndpoint
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Records posted bodies and answers with the server's status."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append({
+            'path': self.path,
+            'body': json.loads(body),
+            'raw': body,
+            'signature': self.headers['X-Webhook-Signature'],
+            'client': self.client_address,
+        })
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer:
+    """Local HTTP server standing in for a partner's endpoint."""
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.requests = []
+        self.server.statuses = []
+        self.thread = threading.Thread(
+            target=self.server.serve_forever,
+            daemon=True,
+        )
+        self.thread.start()
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def url(self, path='/hook'):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}{path}'
+
+    def fail_next(self, *statuses):
+        self.server.statuses.extend(statuses)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@override_settings(WEBHOOK_RETRY_DELAY=0, WEBHOOK_MAX_ATTEMPTS=3)
+class WebhookTests(TestCase):
+    """Test events flow from writes to endpoints."""
+
+    def setUp(self):
+        self.stub = StubServer()
+        self.addCleanup(self.stub.stop)
+        self.pool = webhooks.ConnectionPool(timeout=5)
+        self.addCleanup(self.pool.close)
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.addCleanup(self.executor.shutdown)
+
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.endpoint = WebhookEndpoint.objects.create(
+            user=self.user,
+            url=self.stub.url(),
+            secret='s3cret',
+        )
+
+    def create_recipe(self, title='Sample recipe'):
+        return Recipe.objects.create(
+            user=self.user,
+            title=title,
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+
+    def deliver(self):
+        webhooks.dispatch_events()
+        while webhooks.deliver_due(self.pool, self.executor):
+            pass
+
+    def test_write_adds_outbox_event(self):
+        """Test an API write adds its event in the same transaction."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.post(
+            RECIPES_URL,
+            {'title': 'Soup', 'time_minutes': 5, 'price': '2.00'},
+        )
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.topic, 'recipe.changed')
+        self.assertEqual(event.object_id, res.data['id'])
+
+    def test_batches_delivered_signed(self):
+        """Test events are posted in one signed batch per endpoint."""
+        recipes = [self.create_recipe(f'Recipe {i}') for i in range(3)]
+
+        self.deliver()
+
+        [request] = self.stub.requests
+        self.assertEqual(request['path'], '/hook')
+        self.assertEqual(
+            [event['object_id'] for event in request['body']['events']],
+            [recipe.id for recipe in recipes],
+        )
+        expected = hmac.new(
+            b's3cret', request['raw'], hashlib.sha256,
+        ).hexdigest()
+        self.assertEqual(request['signature'], f'sha256={expected}')
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(
+            set(WebhookDelivery.objects.values_list('status', flat=True)),
+            {WebhookDelivery.DELIVERED},
+        )
+
+    @override_settings(WEBHOOK_BATCH_SIZE=2)
+    def test_connections_kept_alive(self):
+        """Test batches to an endpoint reuse one connection."""
+        for i in range(6):
+            self.create_recipe(f'Recipe {i}')
+        webhooks.dispatch_events()
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+
+        webhooks.deliver_due(self.pool, executor)
+
+        self.assertEqual(len(self.stub.requests), 3)
+        self.assertEqual(
+            len({request['client'] for request in self.stub.requests}),
+            1,
+        )
+
+    def test_failed_batch_retried(self):
+        """Test a failed batch is retried and then delivered."""
+        self.create_recipe()
+        self.stub.fail_next(503)
+
+        with self.assertLogs('core.webhooks', 'WARNING'):
+            self.deliver()
+
+        self.assertEqual(len(self.stub.requests), 2)
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.status, WebhookDelivery.DELIVERED)
+        self.assertEqual(delivery.attempts, 2)
+
+    def test_dead_letter_and_redeliver(self):
+        """Test deliveries die after the last attempt and can be revived."""
+        self.create_recipe()
+        self.stub.fail_next(500, 500, 500)
+
+        with self.assertLogs('core.webhooks', 'WARNING'):
+            self.deliver()
+
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.status, WebhookDelivery.DEAD)
+        self.assertEqual(delivery.attempts, 3)
+        self.assertEqual(delivery.error, 'HTTP 500')
+
+        webhooks.redeliver(WebhookDelivery.objects.all())
+        self.deliver()
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, WebhookDelivery.DELIVERED)
+
+    @override_settings(WEBHOOK_RETRY_DELAY=60)
+    def test_retry_waits_for_backoff(self):
+        """Test a failed delivery is not due until its backoff passes."""
+        self.create_recipe()
+        self.stub.fail_next(500)
+
+        with self.assertLogs('core.webhooks', 'WARNING'):
+            self.deliver()
+
+        self.assertEqual(len(self.stub.requests), 1)
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.status, WebhookDelivery.PENDING)
+        self.assertGreater(delivery.next_attempt_at, delivery.updated_at)
+
+    def test_unreachable_endpoint(self):
+        """Test connection errors count as failed attempts."""
+        self.stub.stop()
+        self.create_recipe()
+
+        webhooks.dispatch_events()
+        with self.assertLogs('core.webhooks', 'WARNING'):
+            webhooks.deliver_due(self.pool, self.executor)
+
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.attempts, 1)
+        self.assertIn('Error', delivery.error)
+
+    def test_racing_workers_claim_once(self):
+        """Test two workers selecting the same rows claim each only once."""
+        self.create_recipe('First')
+        self.create_recipe('Second')
+        webhooks.dispatch_events()
+        update = QuerySet.update
+
+        def update_after_other_worker(queryset, **kwargs):
+            # Another worker claims between this one's SELECT and UPDATE.
+            patcher.stop()
+            other.extend(webhooks.claim_deliveries())
+            return update(queryset, **kwargs)
+
+        other = []
+        patcher = mock.patch.object(
+            QuerySet,
+            'update',
+            update_after_other_worker,
+        )
+        patcher.start()
+        claimed = webhooks.claim_deliveries()
+
+        self.assertEqual(claimed, [])
+        self.assertEqual(len(other), 2)
+
+    def test_dispatch_is_idempotent(self):
+        """Test dispatching an event twice queues one delivery."""
+        recipe = self.create_recipe()
+        event = OutboxEvent.objects.get()
+        webhooks.dispatch_events()
+        OutboxEvent.objects.create(
+            id=event.id,
+            user=self.user,
+            topic=event.topic,
+            object_id=recipe.id,
+        )
+
+        webhooks.dispatch_events()
+
+        self.assertEqual(WebhookDelivery.objects.count(), 1)
+
+    def test_users_without_endpoints(self):
+        """Test events of users without endpoints are dropped."""
+        self.endpoint.delete()
+        self.create_recipe()
+
+        webhooks.dispatch_events()
+
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertFalse(WebhookDelivery.objects.exists())
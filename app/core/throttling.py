@@ -0,0 +1,171 @@
+"""
+Token-bucket request throttling.
+
+Every client has a bucket per scope holding up to N tokens, refilled at N
+per period. A request takes a token, or is refused with 429 and a
+Retry-After saying when the next token is due. Rates come from
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], e.g. ``'10/min'``.
+
+Buckets live in a per-process dict. A bucket is a (tokens, updated) tuple
+replaced by a single dict assignment, so no lock is taken: two threads
+racing on one bucket may both spend the same token, erring on the side of
+admitting a request.
+
+Each process enforces its limits on its own. Setting THROTTLE_CACHE to a
+cache alias also counts requests across workers in that cache. The cache
+only offers atomic increments, so the shared limit is a fixed window of N
+requests per period, checked after the local bucket admits the request.
+"""
+import heapq
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+_buckets = {}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """Return (requests, seconds) for a rate such as '10/min'."""
+    requests, period = rate.split('/')
+    return int(requests), PERIODS[period[0]]
+
+
+def reset_buckets():
+    """Forget every per-process bucket."""
+    _buckets.clear()
+
+
+def prune_buckets(now):
+    """Make room for new buckets.
+
+    Buckets that have refilled go first, as a new one would start the same.
+    If that frees less than a tenth of THROTTLE_MAX_BUCKETS, the buckets
+    updated longest ago go too, so clients throttled right now keep theirs.
+    """
+    buckets = list(_buckets.items())
+    full = [
+        key for key, (tokens, updated, capacity, period) in buckets
+        if tokens + (now - updated) * capacity / period >= capacity
+    ]
+    for key in full:
+        _buckets.pop(key, None)
+
+    wanted = max(settings.THROTTLE_MAX_BUCKETS // 10, 1) - len(full)
+    if wanted > 0:
+        oldest = heapq.nsmallest(
+            wanted,
+            (item for item in buckets if item[0] in _buckets),
+            key=lambda item: item[1][1],
+        )
+        for key, _ in oldest:
+            _buckets.pop(key, None)
+
+
+def take_token(key, capacity, period, now=None):
+    """Take a token from a local bucket.
+
+    Returns 0 if the request is allowed, otherwise the seconds until the
+    next token is due.
+    """
+    now = time.monotonic() if now is None else now
+    bucket = _buckets.get(key)
+    if bucket is None:
+        if len(_buckets) >= settings.THROTTLE_MAX_BUCKETS:
+            prune_buckets(now)
+        tokens = capacity
+    else:
+        tokens, updated = bucket[0], bucket[1]
+        tokens = min(capacity, tokens + (now - updated) * capacity / period)
+
+    if tokens >= 1:
+        _buckets[key] = (tokens - 1, now, capacity, period)
+        return 0
+
+    _buckets[key] = (tokens, now, capacity, period)
+    return (1 - tokens) * period / capacity
+
+
+def take_shared(key, capacity, period, now=None):
+    """Count a request in the shared cache's current window.
+
+    Returns 0 if the request is allowed, otherwise the seconds until the
+    window ends.
+    """
+    now = time.time() if now is None else now
+    window = int(now // period)
+    cache = caches[settings.THROTTLE_CACHE]
+    cache_key = f'throttle:{key}:{window}'
+    cache.add(cache_key, 0, timeout=period + 1)
+    try:
+        count = cache.incr(cache_key)
+    except ValueError:
+        # Evicted between add and incr.
+        cache.set(cache_key, 1, timeout=period + 1)
+        count = 1
+
+    if count <= capacity:
+        return 0
+
+    return (window + 1) * period - now
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Base throttle taking one token per request from a client's bucket."""
+
+    scope = None
+
+    def get_scope(self, request):
+        return self.scope
+
+    def get_ident_key(self, request):
+        """Return the key of the client's bucket, or None to not throttle."""
+        return f'ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        ident = self.get_ident_key(request)
+        if rate is None or ident is None:
+            return True
+
+        capacity, period = parse_rate(rate)
+        key = f'{scope}:{ident}'
+        self.delay = take_token(key, capacity, period)
+        if not self.delay and settings.THROTTLE_CACHE:
+            self.delay = take_shared(key, capacity, period)
+
+        return not self.delay
+
+    def wait(self):
+        return self.delay
+
+
+class UserThrottle(TokenBucketThrottle):
+    """Throttle users by account, and anonymous clients by IP address."""
+
+    def get_scope(self, request):
+        return 'user' if request.user.is_authenticated else 'anon'
+
+    def get_ident_key(self, request):
+        if request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return super().get_ident_key(request)
+
+
+class LoginThrottle(TokenBucketThrottle):
+    """Stricter per-IP throttle for obtaining tokens."""
+
+    scope = 'login'
+
+
+class SignupThrottle(TokenBucketThrottle):
+    """Stricter per-IP throttle for creating accounts."""
+
+    scope = 'signup'
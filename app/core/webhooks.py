@@ -0,0 +1,327 @@
+"""
+Webhook delivery from a transactional outbox.
+
+Recipe and tag writes add an OutboxEvent in their own transaction
+(core.changes), so an event exists exactly when its write committed and no
+request waits on a partner's server. manage.py deliver_webhooks then loops
+over two steps.
+
+dispatch_events moves each shard's outbox into WebhookDelivery rows on the
+default database, one per event and active endpoint of its user. The
+unique (endpoint, event) constraint makes dispatching an event twice after
+a crash harmless.
+
+deliver_due claims the deliveries that are due, groups them into batches
+of up to WEBHOOK_BATCH_SIZE events per endpoint and posts the batches
+WEBHOOK_CONCURRENCY at a time over keep-alive connections. A failed batch
+is retried with exponential backoff. After WEBHOOK_MAX_ATTEMPTS its
+deliveries are marked dead, and stay until redeliver() queues them again.
+
+Delivery is at least once, so receivers should skip event ids they have
+already seen. Each body is signed with the endpoint's secret in the
+X-Webhook-Signature header, as sha256=<hex HMAC-SHA256>.
+"""
+import hashlib
+import hmac
+import http.client
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import OutboxEvent, WebhookDelivery, WebhookEndpoint
+
+logger = logging.getLogger(__name__)
+
+# A reused connection the server has since closed fails on first use.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections, reused per scheme, host and port."""
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout or settings.WEBHOOK_TIMEOUT
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, key):
+        """Return an idle connection for the key, or a new one."""
+        with self.lock:
+            idle = self.idle.get(key)
+            if idle:
+                return idle.pop(), True
+
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(
+                host, port, timeout=self.timeout,
+            ), False
+        return http.client.HTTPConnection(
+            host, port, timeout=self.timeout,
+        ), False
+
+    def release(self, key, conn):
+        with self.lock:
+            self.idle.setdefault(key, []).append(conn)
+
+    def post(self, url, body, headers):
+        """POST a body and return the response status."""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or '/'
+        if parts.query:
+            path = f'{path}?{parts.query}'
+
+        while True:
+            conn, reused = self.acquire(key)
+            try:
+                conn.request('POST', path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                self.release(key, conn)
+            return response.status
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle.values():
+                for conn in connections:
+                    conn.close()
+            self.idle.clear()
+
+
+def sign(secret, body):
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return f'sha256={digest}'
+
+
+def event_payload(delivery):
+    return {
+        'id': delivery.event_id,
+        'type': delivery.topic,
+        'object_id': delivery.object_id,
+        'occurred_at': delivery.occurred_at.isoformat(),
+    }
+
+
+def send_batch(pool, endpoint, deliveries):
+    """Post deliveries to their endpoint; return an error or None."""
+    body = json.dumps({
+        'events': [event_payload(delivery) for delivery in deliveries],
+    }).encode()
+    headers = {
+        'Content-Type': 'application/json',
+        'X-Webhook-Signature': sign(endpoint.secret, body),
+    }
+    try:
+        status = pool.post(endpoint.url, body, headers)
+    except (OSError, http.client.HTTPException) as error:
+        return f'{error.__class__.__name__}: {error}'
+
+    if 200 <= status < 300:
+        return None
+    return f'HTTP {status}'
+
+
+def dispatch_events(batch_size=None):
+    """Queue deliveries for every shard's outbox events.
+
+    Returns the number of events taken from the outbox. Events of users
+    without active endpoints are dropped.
+    """
+    batch_size = batch_size or settings.WEBHOOK_DISPATCH_SIZE
+    dispatched = 0
+    for alias in settings.SHARD_DATABASES:
+        outbox = OutboxEvent.objects.using(alias)
+        while True:
+            events = list(outbox.order_by('id')[:batch_size])
+            if not events:
+                break
+
+            endpoints = {}
+            for endpoint in WebhookEndpoint.objects.filter(
+                user_id__in={event.user_id for event in events},
+                is_active=True,
+            ):
+                endpoints.setdefault(endpoint.user_id, []).append(endpoint)
+            WebhookDelivery.objects.bulk_create(
+                [
+                    WebhookDelivery(
+                        endpoint=endpoint,
+                        event_id=event.id,
+                        topic=event.topic,
+                        object_id=event.object_id,
+                        occurred_at=event.created_at,
+                    )
+                    for event in events
+                    for endpoint in endpoints.get(event.user_id, [])
+                ],
+                ignore_conflicts=True,
+            )
+            outbox.filter(id__in=[event.id for event in events]).delete()
+            dispatched += len(events)
+
+    return dispatched
+
+
+def claim_deliveries(limit=None):
+    """Claim due deliveries, hiding them from other workers for a while."""
+    limit = limit or settings.WEBHOOK_CLAIM_SIZE
+    now = timezone.now()
+    due = WebhookDelivery.objects.filter(
+        status=WebhookDelivery.PENDING,
+        next_attempt_at__lte=now,
+        endpoint__is_active=True,
+    ).order_by('next_attempt_at', 'id')
+
+    # As in core.jobs, SQLite has no row locks and relies on the
+    # conditional UPDATE alone.
+    locking = connection.features.has_select_for_update
+    with transaction.atomic() if locking else nullcontext():
+        ids = list(due.select_for_update(
+            skip_locked=True,
+            of=('self',),
+        ).values_list('id', flat=True)[:limit])
+        lease = now + timedelta(seconds=settings.WEBHOOK_CLAIM_TIMEOUT)
+        claimed = WebhookDelivery.objects.filter(
+            id__in=ids,
+            status=WebhookDelivery.PENDING,
+            next_attempt_at__lte=now,
+        ).update(next_attempt_at=lease)
+        if not claimed:
+            return []
+
+    # Without locks another worker may have claimed some of the rows first:
+    # only those carrying this claim's lease are ours.
+    return list(
+        WebhookDelivery.objects.filter(
+            id__in=ids,
+            status=WebhookDelivery.PENDING,
+            next_attempt_at=lease,
+        ).select_related('endpoint').order_by('id')
+    )
+
+
+def retry_delay(attempts):
+    """Return the backoff in seconds after a failed attempt."""
+    return settings.WEBHOOK_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def record_result(deliveries, error):
+    """Mark a sent batch delivered, or schedule its retry or death."""
+    now = timezone.now()
+    if error is None:
+        WebhookDelivery.objects.filter(
+            id__in=[delivery.id for delivery in deliveries],
+        ).update(
+            status=WebhookDelivery.DELIVERED,
+            attempts=F('attempts') + 1,
+            error='',
+            updated_at=now,
+        )
+        return
+
+    by_attempts = {}
+    for delivery in deliveries:
+        by_attempts.setdefault(delivery.attempts + 1, []).append(delivery.id)
+    for attempts, ids in by_attempts.items():
+        if attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+            changes = {'status': WebhookDelivery.DEAD}
+        else:
+            changes = {
+                'next_attempt_at': now + timedelta(
+                    seconds=retry_delay(attempts),
+                ),
+            }
+        WebhookDelivery.objects.filter(id__in=ids).update(
+            attempts=attempts,
+            error=error,
+            updated_at=now,
+            **changes,
+        )
+
+
+def deliver_due(pool, executor, limit=None):
+    """Send the due deliveries in concurrent per-endpoint batches.
+
+    Returns the number of deliveries attempted.
+    """
+    deliveries = claim_deliveries(limit)
+    by_endpoint = {}
+    for delivery in deliveries:
+        by_endpoint.setdefault(delivery.endpoint_id, []).append(delivery)
+
+    batch_size = settings.WEBHOOK_BATCH_SIZE
+    futures = []
+    for items in by_endpoint.values():
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            futures.append((
+                batch,
+                executor.submit(send_batch, pool, batch[0].endpoint, batch),
+            ))
+    for batch, future in futures:
+        error = future.result()
+        if error is not None:
+            logger.warning(
+                'Webhook batch of %s events to %s failed: %s',
+                len(batch), batch[0].endpoint.url, error,
+            )
+        record_result(batch, error)
+
+    return len(deliveries)
+
+
+def redeliver(queryset):
+    """Queue dead deliveries again with a fresh set of attempts."""
+    return queryset.filter(status=WebhookDelivery.DEAD).update(
+        status=WebhookDelivery.PENDING,
+        attempts=0,
+        next_attempt_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+
+
+def work(poll_interval=1.0, stop_when_idle=False):
+    """Dispatch and deliver events until interrupted, or until idle."""
+    pool = ConnectionPool()
+    executor = ThreadPoolExecutor(max_workers=settings.WEBHOOK_CONCURRENCY)
+    try:
+        while True:
+            close_old_connections()
+            dispatched = dispatch_events()
+            attempted = deliver_due(pool, executor)
+            if dispatched or attempted:
+                continue
+
+            if stop_when_idle:
+                return
+            time.sleep(poll_interval)
+    finally:
+        executor.shutdown()
+        pool.close()
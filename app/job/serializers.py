@@ -0,0 +1,23 @@
+"""Serializers for job APIs"""
+
+from rest_framework import serializers
+from core.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for background job status."""
+
+    class Meta:
+        model = Job
+        fields = [
+            'id',
+            'name',
+            'status',
+            'attempts',
+            'max_attempts',
+            'result',
+            'error',
+            'created_at',
+            'updated_at',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,79 @@
+"""Tests for job APIs."""
+
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Job
+from job.serializers import JobSerializer
+
+JOBS_URL = reverse('job:job-list')
+
+
+def detail_url(job_id):
+    """Create and return a job detail URL."""
+    return reverse('job:job-detail', args=[job_id])
+
+
+def create_user(**params):
+    return get_user_model().objects.create(**params)
+
+
+class PublicJobAPITests(TestCase):
+    """Test public features of the job API."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        """Test auth is required to call API."""
+        res = self.client.get(JOBS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateJobApiTests(TestCase):
+    """Test private features of the job API."""
+
+    def setUp(self):
+        self.user = create_user(email='test@example.com', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_retrieve_jobs_limited_to_user(self):
+        """Test listing jobs returns only the user's jobs."""
+        other_user = create_user(email='other@example.com')
+        Job.objects.create(name='delete_account', user=other_user)
+        job = Job.objects.create(name='delete_account', user=self.user)
+
+        res = self.client.get(JOBS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, JobSerializer([job], many=True).data)
+
+    def test_get_job_detail(self):
+        """Test retrieving a job's status."""
+        job = Job.objects.create(
+            name='delete_account',
+            user=self.user,
+            status=Job.DONE,
+            result={'recipes_deleted': 3},
+        )
+
+        res = self.client.get(detail_url(job.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], Job.DONE)
+        self.assertEqual(res.data['result'], {'recipes_deleted': 3})
+
+    def test_other_users_job_not_found(self):
+        """Test another user's job is not found."""
+        other_user = create_user(email='other@example.com')
+        job = Job.objects.create(name='delete_account', user=other_user)
+
+        res = self.client.get(detail_url(job.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
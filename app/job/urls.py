@@ -0,0 +1,18 @@
+from django.urls import (
+    path,
+    include,
+)
+from rest_framework.routers import DefaultRouter
+
+from job.views import JobViewSet
+
+router = DefaultRouter()
+
+router.register('jobs', JobViewSet)
+
+
+app_name = 'job'
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
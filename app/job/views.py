@@ -0,0 +1,20 @@
+"""Views for the job APIs."""
+
+from rest_framework.permissions import IsAuthenticated
+from rest_framework import viewsets
+
+from core.authentication import ExpiringTokenAuthentication
+from core.models import Job
+from job.serializers import JobSerializer
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Report the status of the user's background jobs."""
+
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return self.queryset.filter(user=self.request.user).order_by('-id')
@@ -0,0 +1,89 @@
+"""
+Autocomplete for tag names and recipe titles.
+
+Suggestions are the user's distinct tag names or recipe titles starting
+with the typed text, followed, from MIN_SUBSTRING_LENGTH characters, by
+those containing it. Each group is ranked by how many of the user's tags
+or recipes carry the name, then alphabetically.
+
+Both lookups are case-insensitive, which Django runs on Postgres as
+UPPER(column::text) LIKE UPPER(...). Migration 0017 indexes exactly that
+expression per user: a btree with text_pattern_ops serves prefixes and a
+trigram GIN index serves substrings.
+
+The same short prefixes come up on every keystroke, so results are kept in
+a small per-process LRU cache for AUTOCOMPLETE_CACHE_TTL seconds.
+Suggestions may lag a write by that long.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Count
+
+from core.models import Recipe, Tag
+from core.sharding import shard_db
+
+# Kind -> model and the column suggested from it.
+SOURCES = {
+    'tag': (Tag, 'name'),
+    'title': (Recipe, 'title'),
+}
+
+# Trigram indexes cannot narrow shorter substrings.
+MIN_SUBSTRING_LENGTH = 3
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def ranked(queryset, field, limit):
+    """Return {'text', 'uses'} for the most used values of a field."""
+    return [
+        {'text': row[field], 'uses': row['uses']}
+        for row in queryset.order_by().values(field).annotate(
+            uses=Count('id'),
+        ).order_by('-uses', field)[:limit]
+    ]
+
+
+def find_suggestions(user_id, kind, text, limit):
+    """Query the best suggestions for the text, prefix matches first."""
+    model, field = SOURCES[kind]
+    rows = model.objects.filter(user_id=user_id)
+    prefix = {f'{field}__istartswith': text}
+    suggestions = ranked(rows.filter(**prefix), field, limit)
+    if len(suggestions) < limit and len(text) >= MIN_SUBSTRING_LENGTH:
+        suggestions += ranked(
+            rows.filter(**{f'{field}__icontains': text}).exclude(**prefix),
+            field,
+            limit - len(suggestions),
+        )
+
+    return suggestions
+
+
+def suggest(user_id, kind, text, limit):
+    """Return cached suggestions, querying them on a miss."""
+    key = (shard_db(), user_id, kind, text.upper(), limit)
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] > now:
+            _cache.move_to_end(key)
+            return entry[1]
+
+    suggestions = find_suggestions(user_id, kind, text, limit)
+    with _cache_lock:
+        _cache[key] = (now + settings.AUTOCOMPLETE_CACHE_TTL, suggestions)
+        _cache.move_to_end(key)
+        while len(_cache) > settings.AUTOCOMPLETE_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return suggestions
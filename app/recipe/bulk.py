@@ -0,0 +1,115 @@
+"""
+Set-based bulk adjustments of recipe prices and times.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    Q,
+    Value,
+)
+from django.db.models.functions import Cast, Round
+
+from app import calc
+from core.changes import record_changes
+from core.models import Recipe
+from core.revisions import record_revisions
+from core.stats import rebuild_stats
+
+# Largest value each adjustable column can hold.
+ADJUSTABLE_FIELDS = {
+    'price': {'places': 2, 'max_value': Decimal('999.99')},
+    'time_minutes': {'places': 0, 'max_value': 2 ** 31 - 1},
+}
+
+# Keeps IN lists below SQLite's bound parameter limit.
+CHUNK_SIZE = 500
+
+
+def adjusted_expression(field, scale, offset):
+    """Return SQL for field * scale + offset, rounded half up like calc.
+
+    The result stays numeric, so it can be checked against the column's
+    range before column_value casts it to the column's type.
+    """
+    places = ADJUSTABLE_FIELDS[field]['places']
+    factor = Value(Decimal(10) ** places, output_field=DecimalField())
+    value = ExpressionWrapper(
+        F(field) * Value(scale, output_field=DecimalField())
+        + Value(offset, output_field=DecimalField()),
+        output_field=DecimalField(),
+    )
+
+    return ExpressionWrapper(
+        Round(value * factor) / factor,
+        output_field=DecimalField(),
+    )
+
+
+def column_value(field, expression):
+    """Return an adjusted value cast to the type of its column."""
+    if ADJUSTABLE_FIELDS[field]['places'] == 0:
+        return Cast(expression, IntegerField())
+
+    return expression
+
+
+def preview_adjustment(queryset, field, scale, offset):
+    """Compute the adjustment in memory without writing anything."""
+    config = ADJUSTABLE_FIELDS[field]
+    values = dict(queryset.values_list('id', field))
+    adjusted, out_of_range = calc.preview_adjust(
+        values,
+        scale,
+        offset,
+        places=config['places'],
+        max_value=config['max_value'],
+    )
+    changes = [
+        {'id': recipe_id, 'old': values[recipe_id], 'new': new_value}
+        for recipe_id, new_value in sorted(adjusted.items())
+    ]
+
+    return changes, sorted(out_of_range)
+
+
+def apply_adjustment(queryset, field, scale, offset):
+    """Adjust every recipe in one UPDATE, skipping out of range results.
+
+    Returns the number of recipes updated and the ids of the recipes left
+    unchanged because their result would not fit the column.
+    """
+    config = ADJUSTABLE_FIELDS[field]
+    adjusted = adjusted_expression(field, scale, offset)
+    queryset = queryset.order_by().annotate(adjusted=adjusted)
+    # Compared before the cast, which would fail for integers out of range.
+    in_range = Q(adjusted__gte=0, adjusted__lte=config['max_value'])
+
+    with transaction.atomic(using=queryset.db):
+        out_of_range = list(
+            queryset.exclude(in_range).values_list('id', flat=True)
+        )
+        rows = queryset.filter(in_range).select_for_update()
+        updated = list(rows.values_list('id', 'user_id'))
+        queryset.filter(in_range).update(
+            **{field: column_value(field, adjusted)},
+        )
+
+        by_user = {}
+        for recipe_id, user_id in updated:
+            by_user.setdefault(user_id, []).append(recipe_id)
+        for user_id, ids in by_user.items():
+            for start in range(0, len(ids), CHUNK_SIZE):
+                chunk = ids[start:start + CHUNK_SIZE]
+                record_changes(Recipe, user_id, chunk)
+                record_revisions(
+                    Recipe.objects.using(queryset.db).filter(id__in=chunk),
+                    using=queryset.db,
+                )
+            rebuild_stats(user_id)
+
+    return len(updated), sorted(out_of_range)
@@ -0,0 +1,65 @@
+"""
+Finding and merging duplicate recipes.
+"""
+from core.changes import record_changes
+from core.fingerprints import near_duplicate_clusters
+from core.models import Recipe
+from core.sharding import shard_atomic
+from core.stats import rebuild_stats
+
+# Keeps IN lists below SQLite's bound parameter limit.
+CHUNK_SIZE = 500
+
+
+def recipe_text(title, link, description):
+    return ' '.join([title, link, description])
+
+
+def find_duplicates(user_id, threshold=0.8):
+    """Return clusters of a user's recipe ids with near identical text.
+
+    Recipes are streamed from the database, so only their signatures are
+    held in memory.
+    """
+    recipes = Recipe.objects.filter(user_id=user_id).order_by('id')
+    items = (
+        (recipe_id, recipe_text(title, link, description))
+        for recipe_id, title, link, description in recipes.values_list(
+            'id', 'title', 'link', 'description',
+        ).iterator(chunk_size=2000)
+    )
+
+    return near_duplicate_clusters(items, threshold)
+
+
+def merge_duplicates(user_id, clusters):
+    """Keep the oldest recipe of each cluster and delete the others.
+
+    Returns the number of recipes deleted.
+    """
+    duplicate_ids = [
+        recipe_id for cluster in clusters for recipe_id in cluster[1:]
+    ]
+    keep_ids = [cluster[0] for cluster in clusters]
+
+    with shard_atomic():
+        for start in range(0, len(duplicate_ids), CHUNK_SIZE):
+            ids = duplicate_ids[start:start + CHUNK_SIZE]
+            record_changes(Recipe, user_id, ids, deleted=True)
+            Recipe.objects.filter(user_id=user_id, id__in=ids).delete()
+
+        # Kept recipes that predate the content hash may now take it.
+        for recipe in Recipe.objects.filter(
+            id__in=keep_ids,
+            content_hash__isnull=True,
+        ):
+            value = recipe.compute_content_hash()
+            if not Recipe.objects.filter(
+                user_id=user_id,
+                content_hash=value,
+            ).exists():
+                recipe.save(update_fields=['content_hash'])
+
+        rebuild_stats(user_id)
+
+    return len(duplicate_ids)
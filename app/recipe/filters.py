@@ -0,0 +1,84 @@
+"""Filters for recipe APIs"""
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+
+class RecipeRangeParamsSerializer(serializers.Serializer):
+    """Query parameters for time and price ranges."""
+
+    time_minutes_min = serializers.IntegerField(min_value=0, required=False)
+    time_minutes_max = serializers.IntegerField(min_value=0, required=False)
+    price_min = serializers.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        min_value=0,
+        required=False,
+    )
+    price_max = serializers.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        min_value=0,
+        required=False,
+    )
+
+    def validate(self, attrs):
+        for field in ('time_minutes', 'price'):
+            low = attrs.get(f'{field}_min')
+            high = attrs.get(f'{field}_max')
+            if low is not None and high is not None and low > high:
+                msg = _('Minimum must not be greater than maximum.')
+                raise serializers.ValidationError({f'{field}_min': msg})
+
+        return attrs
+
+
+class RecipeRangeFilter(BaseFilterBackend):
+    """Filter recipes by inclusive time_minutes and price ranges.
+
+    Only lists and collection actions are filtered; a recipe is looked up by
+    its id whatever the query string holds.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if view.detail:
+            return queryset
+
+        params = RecipeRangeParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        lookups = {}
+        for name, value in params.validated_data.items():
+            field, bound = name.rsplit('_', 1)
+            lookups[f"{field}__{'gte' if bound == 'min' else 'lte'}"] = value
+
+        return queryset.filter(**lookups)
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """Whitelisted ordering, with the id as tiebreaker for stable pages."""
+
+    def filter_queryset(self, request, queryset, view):
+        if view.detail:
+            return queryset
+
+        return super().filter_queryset(request, queryset, view)
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        valid = super().remove_invalid_fields(queryset, fields, view, request)
+        if len(valid) != len(fields):
+            raise serializers.ValidationError({
+                self.ordering_param: _('Ordering must be one of: %s.') % (
+                    ', '.join(view.ordering_fields)
+                ),
+            })
+
+        return valid
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and ordering[-1].lstrip('-') != 'id':
+            ordering = [*ordering, '-id' if ordering[-1][0] == '-' else 'id']
+
+        return ordering
@@ -0,0 +1,136 @@
+"""
+Recipe images and their thumbnails.
+
+Uploads are streamed to a temporary file a chunk at a time and hashed on the
+way, so an upload is never held in memory. A valid image is stored under its
+content hash, so its URL always names the same bytes and can be cached
+forever. Thumbnails are generated by a background job and named after the
+image they were made from.
+"""
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import (
+    SkipFile,
+    TemporaryFileUploadHandler,
+)
+from PIL import Image, ImageOps
+
+from core import jobs
+from core.changes import record_changes
+from core.models import Recipe
+from core.sharding import shard_atomic, shard_for_user_id, use_shard
+
+# Accepted image formats and the extension they are stored under.
+FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+THUMBNAIL_QUALITY = 85
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """Stream an upload to a temporary file, hashing it as it arrives.
+
+    Files over settings.RECIPE_IMAGE_MAX_BYTES are dropped as soon as they
+    pass the limit, and ``too_large`` is set.
+    """
+
+    too_large = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.RECIPE_IMAGE_MAX_BYTES:
+            self.too_large = True
+            raise SkipFile()
+        self.sha256.update(raw_data)
+
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.sha256.hexdigest()
+
+        return file
+
+
+def store_image(file, image_format):
+    """Save a validated upload under its content hash and return its name."""
+    name = f'recipes/{file.sha256[:32]}.{FORMATS[image_format]}'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, file)
+
+    return name
+
+
+def set_image(recipe, name, user=None):
+    """Attach a stored image to a recipe and queue its thumbnails."""
+    recipe.image = name
+    recipe.thumbnails = {}
+    # Committed before the job is queued, so the worker sees the new image.
+    with shard_atomic():
+        recipe.save(update_fields=['image', 'thumbnails'])
+
+    return jobs.enqueue(
+        'recipe_thumbnails',
+        {'recipe_id': recipe.id, 'image': name},
+        user=user,
+    )
+
+
+def generate_thumbnails(name):
+    """Write the thumbnails of a stored image and return {size: name}.
+
+    Sizes are made largest first, each from the one before, so only the
+    first resize reads the full image.
+    """
+    stem = name.rsplit('.', 1)[0]
+    thumbnails = {}
+    with default_storage.open(name) as file, Image.open(file) as image:
+        largest = max(settings.RECIPE_THUMBNAIL_SIZES)
+        # Lets JPEG decode at a reduced scale close to the largest size.
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        for size in sorted(settings.RECIPE_THUMBNAIL_SIZES, reverse=True):
+            image.thumbnail((size, size))
+            thumbnail_name = f'{stem}_{size}.jpg'
+            if not default_storage.exists(thumbnail_name):
+                buffer = BytesIO()
+                image.save(
+                    buffer,
+                    'JPEG',
+                    quality=THUMBNAIL_QUALITY,
+                    optimize=True,
+                )
+                default_storage.save(
+                    thumbnail_name,
+                    ContentFile(buffer.getvalue()),
+                )
+            thumbnails[str(size)] = thumbnail_name
+
+    return thumbnails
+
+
+def thumbnails_task(job):
+    """Job task generating thumbnails for the recipe named in the payload."""
+    if job.user_id is None:
+        return {'thumbnails': {}}
+
+    name = job.payload['image']
+    thumbnails = generate_thumbnails(name)
+    # Raises while the user's data is moved, so the job is retried later.
+    shard = shard_for_user_id(job.user_id, for_write=True)
+    with use_shard(shard):
+        # A newer upload may have replaced the image meanwhile.
+        updated = Recipe.objects.filter(
+            id=job.payload['recipe_id'],
+            image=name,
+        ).update(thumbnails=thumbnails)
+        if updated:
+            record_changes(Recipe, job.user_id, [job.payload['recipe_id']])
+
+    return {'thumbnails': thumbnails}
@@ -0,0 +1,114 @@
+"""
+Ingredients and shopping lists.
+
+Each user has one Ingredient per normalized name, so "Plain Flour" and
+"plain  flour" are the same ingredient. Units are normalized to a short
+form so quantities in "grams" and "g" add up.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+
+from core.fingerprints import normalize_text
+from core.models import Ingredient, RecipeIngredient
+
+UNIT_ALIASES = {
+    'gram': 'g', 'grams': 'g', 'kilogram': 'kg', 'kilograms': 'kg',
+    'millilitre': 'ml', 'millilitres': 'ml', 'milliliter': 'ml',
+    'milliliters': 'ml', 'litre': 'l', 'litres': 'l', 'liter': 'l',
+    'liters': 'l', 'teaspoon': 'tsp', 'teaspoons': 'tsp',
+    'tablespoon': 'tbsp', 'tablespoons': 'tbsp', 'cups': 'cup',
+    'ounce': 'oz', 'ounces': 'oz', 'pound': 'lb', 'pounds': 'lb',
+    'lbs': 'lb',
+}
+
+
+def normalize_unit(unit):
+    unit = normalize_text(unit).rstrip('.')
+    return UNIT_ALIASES.get(unit, unit)
+
+
+def resolve_ingredients(user, names):
+    """Return {normalized name: Ingredient} for names, creating missing ones.
+
+    Takes one query to find existing ingredients, and when some are missing
+    one insert and one query to read them back, however many names there
+    are.
+    """
+    wanted = {}
+    for name in names:
+        wanted.setdefault(normalize_text(name), ' '.join(name.split()))
+
+    found = {
+        ingredient.normalized_name: ingredient
+        for ingredient in Ingredient.objects.filter(
+            user=user,
+            normalized_name__in=wanted,
+        )
+    }
+    missing = [key for key in wanted if key not in found]
+    if missing:
+        # A concurrent write may have added some; the read below finds them.
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(user=user, name=wanted[key], normalized_name=key)
+                for key in missing
+            ],
+            ignore_conflicts=True,
+        )
+        found.update(
+            (ingredient.normalized_name, ingredient)
+            for ingredient in Ingredient.objects.filter(
+                user=user,
+                normalized_name__in=missing,
+            )
+        )
+
+    return found
+
+
+def set_recipe_ingredients(recipe, items):
+    """Replace a recipe's ingredients with items of name, quantity and unit.
+
+    Lines naming the same ingredient and unit are added together.
+    """
+    ingredients = resolve_ingredients(
+        recipe.user,
+        [item['name'] for item in items],
+    )
+    quantities = {}
+    for item in items:
+        key = (
+            ingredients[normalize_text(item['name'])].id,
+            normalize_unit(item.get('unit', '')),
+        )
+        quantities[key] = quantities.get(key, Decimal(0)) + item['quantity']
+
+    RecipeIngredient.objects.filter(recipe=recipe).delete()
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient_id=ingredient_id,
+            unit=unit,
+            quantity=quantity,
+        )
+        for (ingredient_id, unit), quantity in quantities.items()
+    ])
+
+
+def sum_ingredients(user, recipe_ids):
+    """Return summed quantities per ingredient and unit over the recipes.
+
+    One grouped query over the recipes' ingredient rows.
+    """
+    return list(
+        RecipeIngredient.objects.filter(
+            recipe__user=user,
+            recipe_id__in=recipe_ids,
+        ).values(
+            'ingredient_id', 'ingredient__name', 'unit',
+        ).annotate(
+            quantity=Sum('quantity'),
+            recipes=Count('recipe_id', distinct=True),
+        ).order_by('ingredient__name', 'unit')
+    )
@@ -0,0 +1,97 @@
+"""
+Django command to benchmark autocomplete at large vocabulary sizes.
+"""
+
+import random
+import statistics
+import string
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Recipe, Tag
+from recipe.autocomplete import SOURCES, find_suggestions
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark data."""
+
+
+class Command(BaseCommand):
+    """Django command to time autocomplete queries at several sizes.
+
+    Each vocabulary is loaded for a throwaway user inside a transaction that
+    is rolled back afterwards. Queries bypass the in-process cache, so the
+    timings are those of a miss.
+    """
+
+    help = 'Benchmark tag and title autocomplete.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10000, 100000],
+        )
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        self.words = [
+            ''.join(random.choices(
+                string.ascii_lowercase,
+                k=random.randint(3, 9),
+            ))
+            for _ in range(5000)
+        ]
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self.benchmark(size, options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def name(self):
+        return ' '.join(random.choices(self.words, k=random.randint(1, 3)))
+
+    def benchmark(self, size, options):
+        user = get_user_model().objects.create(
+            email=f'benchmark-{size}@example.com',
+        )
+        Tag.objects.bulk_create(
+            (Tag(user=user, name=self.name()) for _ in range(size)),
+            batch_size=5000,
+        )
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    user=user,
+                    title=self.name(),
+                    description=f'Recipe {i}',
+                    time_minutes=10,
+                    price=1,
+                )
+                for i in range(size)
+            ),
+            batch_size=5000,
+        )
+
+        for kind in SOURCES:
+            for length in (1, 2, 3, 4):
+                timings = []
+                for _ in range(options['repeat']):
+                    text = random.choice(self.words)[:length]
+                    start = time.perf_counter()
+                    find_suggestions(user.id, kind, text, options['limit'])
+                    timings.append(time.perf_counter() - start)
+                p95 = statistics.quantiles(timings, n=20)[-1]
+                self.stdout.write(
+                    f'{size:>10} rows  {kind:<5} {length} chars  '
+                    f'p50 {statistics.median(timings) * 1000:8.2f} ms  '
+                    f'p95 {p95 * 1000:8.2f} ms'
+                )
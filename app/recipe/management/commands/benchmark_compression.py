@@ -0,0 +1,85 @@
+"""
+Django command to weigh compression CPU time against bytes saved.
+"""
+
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core import compression
+from core.models import Recipe
+from recipe.serializers import RecipeSerializer
+
+WORDS = [
+    'chicken', 'soup', 'garlic', 'roast', 'lemon', 'pasta', 'tomato', 'basil',
+    'slow', 'cooked', 'spicy', 'bean', 'stew', 'quick', 'salad', 'bread',
+]
+
+LEVELS = {
+    'gzip': [1, 6, 9],
+    'br': [1, 4, 6, 11],
+    'zstd': [1, 3, 9, 19],
+}
+
+
+class Command(BaseCommand):
+    """Django command to time each coding and level on recipe list pages.
+
+    Payloads are RecipeSerializer pages rendered as JSON from unsaved
+    recipes, so no database is needed.
+    """
+
+    help = 'Benchmark response compression of recipe list payloads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[20, 100, 1000],
+            help='Recipes per payload.',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        rng = random.Random(0)
+        for size in options['sizes']:
+            payload = self.payload(rng, size)
+            self.stdout.write(f'{size} recipes, {len(payload)} bytes:')
+            for coding in compression.available_codings():
+                for level in LEVELS[coding]:
+                    self.benchmark(coding, level, payload, options['repeat'])
+
+    def payload(self, rng, size):
+        recipes = [
+            Recipe(
+                id=i,
+                title=' '.join(rng.sample(WORDS, 3)).title(),
+                time_minutes=rng.randint(5, 240),
+                price=Decimal(rng.randint(100, 5000)) / 100,
+                link=f'https://example.com/recipes/{i}',
+            )
+            for i in range(1, size + 1)
+        ]
+
+        return JSONRenderer().render(
+            RecipeSerializer(recipes, many=True).data,
+        )
+
+    def benchmark(self, coding, level, payload, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            compressed = compression.compress(coding, level, payload)
+        elapsed = (time.perf_counter() - start) / repeat
+        saved = len(payload) - len(compressed)
+        self.stdout.write(
+            f'  {coding:<5} level {level:>2}  '
+            f'{len(compressed):>9} bytes  '
+            f'{len(compressed) / len(payload):6.1%}  '
+            f'{elapsed * 1000:8.3f} ms  '
+            f'{saved / max(elapsed * 1000, 1e-6) / 1024:9.1f} KiB saved/ms'
+        )
@@ -0,0 +1,86 @@
+"""
+Django command to benchmark filtered and sorted recipe list queries.
+"""
+
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Recipe
+
+QUERIES = {
+    'newest': lambda qs: qs.order_by('-id'),
+    'under 30 minutes': lambda qs: qs.filter(
+        time_minutes__lte=30,
+    ).order_by('time_minutes', 'id'),
+    'under $10 by price': lambda qs: qs.filter(
+        price__lte=Decimal('10.00'),
+    ).order_by('-price', '-id'),
+}
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark data."""
+
+
+class Command(BaseCommand):
+    """Django command to time recipe list pages at several dataset sizes.
+
+    Each size is loaded for a throwaway user inside a transaction that is
+    rolled back afterwards, so the command can run against a copy of a real
+    database.
+    """
+
+    help = 'Benchmark filtered and sorted recipe list pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 100000],
+        )
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self.benchmark(size, options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def benchmark(self, size, options):
+        user = get_user_model().objects.create(
+            email=f'benchmark-{size}@example.com',
+        )
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    user=user,
+                    title=f'Recipe {i}',
+                    time_minutes=random.randint(1, 240),
+                    price=Decimal(random.randint(100, 99999)) / 100,
+                )
+                for i in range(size)
+            ),
+            batch_size=5000,
+        )
+
+        queryset = Recipe.objects.filter(user=user)
+        for name, build in QUERIES.items():
+            page = build(queryset)[:options['page_size']]
+            start = time.perf_counter()
+            for _ in range(options['repeat']):
+                list(page)
+            elapsed = (time.perf_counter() - start) / options['repeat']
+            self.stdout.write(
+                f'{size:>10} rows  {name:<20} {elapsed * 1000:8.2f} ms/page'
+            )
@@ -0,0 +1,84 @@
+"""
+Django command to benchmark list latency and vacuum time of a recipe table.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+QUERIES = {
+    'newest': 'ORDER BY id DESC',
+    'under 30 minutes': (
+        'AND time_minutes <= 30 ORDER BY time_minutes, id'
+    ),
+    'under $10 by price': 'AND price <= 10 ORDER BY price DESC, id DESC',
+}
+
+
+class Command(BaseCommand):
+    """Django command to time recipe list pages and VACUUM on a table.
+
+    Runs against existing data, so it can compare core_recipe with
+    core_recipe_partitioned between the copy and swap steps of
+    partition_recipes, or the same table before and after the swap.
+    """
+
+    help = 'Benchmark per-user list pages and vacuum on a recipe table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--table', default='core_recipe')
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=20,
+            help='Number of users with the most recipes to query.',
+        )
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='Also time VACUUM (ANALYZE) of the table (Postgres only).',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        table = connection.ops.quote_name(options['table'])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT user_id FROM {table} GROUP BY user_id '
+                f'ORDER BY count(*) DESC LIMIT %s',
+                [options['users']],
+            )
+            user_ids = [row[0] for row in cursor.fetchall()]
+
+            for name, clause in QUERIES.items():
+                sql = (
+                    f'SELECT id, title, time_minutes, price, link '
+                    f'FROM {table} WHERE user_id = %s {clause} LIMIT %s'
+                )
+                start = time.perf_counter()
+                for _ in range(options['repeat']):
+                    for user_id in user_ids:
+                        cursor.execute(sql, [user_id, options['page_size']])
+                        cursor.fetchall()
+                pages = options['repeat'] * max(len(user_ids), 1)
+                elapsed = (time.perf_counter() - start) / pages
+                self.stdout.write(
+                    f'{options["table"]}  {name:<20} '
+                    f'{elapsed * 1000:8.3f} ms/page'
+                )
+
+        if options['vacuum']:
+            self.benchmark_vacuum(table, options['table'])
+
+    def benchmark_vacuum(self, table, name):
+        if connection.vendor != 'postgresql':
+            self.stderr.write('VACUUM timing needs PostgreSQL.')
+            return
+
+        with connection.cursor() as cursor:
+            start = time.perf_counter()
+            cursor.execute(f'VACUUM (ANALYZE) {table}')
+            elapsed = time.perf_counter() - start
+        self.stdout.write(f'{name}  VACUUM (ANALYZE)     {elapsed:8.3f} s')
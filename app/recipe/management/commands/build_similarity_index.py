@@ -0,0 +1,33 @@
+"""
+Django command to build the similar-recipe index.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipe.similarity import build_index
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the index file read by workers."""
+
+    help = 'Build the similar-recipe index from every recipe.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=settings.SIMILARITY_INDEX_PATH,
+            help='Where to write the index.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        start = time.perf_counter()
+        indexed = build_index(options['path'])
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {indexed} recipes in {elapsed:.2f}s '
+            f'to {options["path"]}.'
+        ))
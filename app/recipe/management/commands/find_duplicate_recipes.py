@@ -0,0 +1,74 @@
+"""
+Django command to report and merge near-duplicate recipes.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from core.sharding import shard_for_user, use_shard
+from recipe.dedupe import find_duplicates, merge_duplicates
+
+
+class Command(BaseCommand):
+    """Django command to find clusters of near-duplicate recipes."""
+
+    help = 'Report near-duplicate recipes per user and optionally merge them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'emails',
+            nargs='*',
+            help='Users to check. Defaults to every user.',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.8,
+            help='Estimated text similarity from 0 to 1 to report.',
+        )
+        parser.add_argument(
+            '--merge',
+            action='store_true',
+            help='Keep the oldest recipe of each cluster, delete the rest.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        users = get_user_model().objects.order_by('id')
+        if options['emails']:
+            users = users.filter(email__in=options['emails'])
+
+        found = merged = 0
+        for user in users.only('id', 'email', 'shard').iterator():
+            with use_shard(shard_for_user(user)):
+                found_user, merged_user = self.check_user(user, options)
+            found += found_user
+            merged += merged_user
+
+        message = f'Found {found} duplicate recipes.'
+        if options['merge']:
+            message += f' Merged {merged}.'
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def check_user(self, user, options):
+        """Report one user's duplicates, returning (found, merged)."""
+        clusters = find_duplicates(user.id, options['threshold'])
+        if not clusters:
+            return 0, 0
+
+        found = 0
+        titles = dict(Recipe.objects.filter(
+            id__in=[cluster[0] for cluster in clusters],
+        ).values_list('id', 'title'))
+        for cluster in clusters:
+            found += len(cluster) - 1
+            duplicates = ', '.join(str(i) for i in cluster[1:])
+            self.stdout.write(
+                f'{user.email}: recipe {cluster[0]} '
+                f'"{titles[cluster[0]]}" ~ {duplicates}'
+            )
+        if options['merge']:
+            return found, merge_duplicates(user.id, clusters)
+
+        return found, 0
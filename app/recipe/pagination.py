@@ -0,0 +1,112 @@
+"""Pagination for recipe APIs"""
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+def seek(ordering, values, reverse=False):
+    """Return a filter for the rows after a position in an ordering.
+
+    The position holds a value for every field of the ordering. Rows tied
+    on the leading fields are told apart by the later ones, down to the id,
+    so no offset is needed. The leading field also gets a plain range
+    condition, which an index on it can seek to.
+    """
+    condition = None
+    for name, value in reversed(list(zip(ordering, values))):
+        attr = name.lstrip('-')
+        op = 'lt' if reverse != name.startswith('-') else 'gt'
+        after = Q(**{f'{attr}__{op}': value})
+        if condition is None:
+            condition = after
+        else:
+            condition = Q(**{f'{attr}__{op}e': value}) & (
+                after | (Q(**{attr: value}) & condition)
+            )
+
+    return condition
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination, used when the client asks for a page_size.
+
+    A cursor holds every ordering value of the row it points at, ending with
+    the id the ordering filter adds, so each page seeks past that row on the
+    (value, id) index without an offset however deep the client goes.
+    """
+
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor and self.cursor.position
+
+        if reverse:
+            queryset = queryset.order_by(*[
+                name[1:] if name.startswith('-') else f'-{name}'
+                for name in self.ordering
+            ])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(seek(
+                self.ordering,
+                self.decode_position(queryset.model, position),
+                reverse,
+            ))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > len(self.page):
+            following = self._get_position_from_instance(
+                results[-1],
+                self.ordering,
+            )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = following is not None
+            self.next_position = position
+            self.previous_position = following
+        else:
+            self.has_next = following is not None
+            self.has_previous = position is not None
+            self.next_position = following
+            self.previous_position = position
+        if self.has_previous or self.has_next:
+            self.display_page_controls = True
+
+        return self.page
+
+    def decode_position(self, model, position):
+        """Return the ordering values held by a cursor position."""
+        try:
+            values = json.loads(position)
+            if len(values) != len(self.ordering):
+                raise ValueError(position)
+            return [
+                model._meta.get_field(name.lstrip('-')).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _get_position_from_instance(self, instance, ordering):
+        return json.dumps([
+            str(getattr(instance, name.lstrip('-'))) for name in ordering
+        ])
@@ -1,7 +1,14 @@
 """Serializers for recipe APIs"""
 
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from core.models import Recipe
+from core.fingerprints import content_hash
+from core.models import Recipe, RecipeRevision, Tag
+from recipe.images import FORMATS
+from recipe.ingredients import set_recipe_ingredients
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -13,6 +20,36 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'time_minutes', 'price', 'link']
         read_only_fields = ['id']
 
+    def validate(self, attrs):
+        """Reject content identical to another of the user's recipes."""
+        # Single statement writes rely on the unique constraint instead.
+        if not self.context.get('check_duplicates', True):
+            return attrs
+        # Edits leaving the text alone keep the stored hash, if any.
+        if self.instance is not None and not (
+            set(Recipe.HASHED_FIELDS) & attrs.keys()
+        ):
+            return attrs
+
+        values = {
+            field: attrs.get(field, getattr(self.instance, field, ''))
+            for field in Recipe.HASHED_FIELDS
+        }
+        duplicates = Recipe.objects.filter(
+            user=self.context['request'].user,
+            content_hash=content_hash(**values),
+        )
+        if self.instance is not None:
+            duplicates = duplicates.exclude(id=self.instance.id)
+        duplicate_id = duplicates.values_list('id', flat=True).first()
+        if duplicate_id is not None:
+            raise serializers.ValidationError(
+                f'Duplicate of recipe {duplicate_id}.',
+                code='duplicate',
+            )
+
+        return attrs
+
     # def create(self, validated_data):
     #     """Create and return a new recipe"""
     #     return Recipe.objects.create(**validated_data)
@@ -40,10 +77,236 @@ class RecipeSerializer(serializers.ModelSerializer):
 #         read_only_fields = ('id', 'user')
 
 
+class RecipeIngredientSerializer(serializers.Serializer):
+    """Serializer for an ingredient line of a recipe."""
+
+    name = serializers.CharField(max_length=255, source='ingredient.name')
+    quantity = serializers.DecimalField(
+        max_digits=9,
+        decimal_places=3,
+        min_value=Decimal('0.001'),
+    )
+    unit = serializers.CharField(max_length=32, allow_blank=True, default='')
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for recipe detail view."""
 
+    thumbnails = serializers.SerializerMethodField()
+    ingredients = RecipeIngredientSerializer(
+        many=True,
+        required=False,
+        source='recipe_ingredients',
+    )
+
     class Meta(RecipeSerializer.Meta):
         """Formulate a detailed version for the recipe."""
 
-        fields = RecipeSerializer.Meta.fields + ['description']
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'thumbnails', 'ingredients',
+        ]
+        read_only_fields = ['id', 'image']
+
+    def create(self, validated_data):
+        """Create a recipe and its ingredient lines."""
+        items = validated_data.pop('recipe_ingredients', None)
+        recipe = super().create(validated_data)
+        if items is not None:
+            set_recipe_ingredients(recipe, self.ingredient_items(items))
+
+        return recipe
+
+    def update(self, instance, validated_data):
+        """Update a recipe, replacing its ingredients when given."""
+        items = validated_data.pop('recipe_ingredients', None)
+        recipe = super().update(instance, validated_data)
+        if items is not None:
+            set_recipe_ingredients(recipe, self.ingredient_items(items))
+
+        return recipe
+
+    def ingredient_items(self, items):
+        """Flatten validated ingredient lines for set_recipe_ingredients."""
+        return [
+            {
+                'name': item['ingredient']['name'],
+                'quantity': item['quantity'],
+                'unit': item.get('unit', ''),
+            }
+            for item in items
+        ]
+
+    def get_thumbnails(self, recipe):
+        """Return thumbnail URLs keyed by their size in pixels."""
+        request = self.context.get('request')
+        urls = {}
+        for size, name in recipe.thumbnails.items():
+            url = default_storage.url(name)
+            urls[size] = request.build_absolute_uri(url) if request else url
+
+        return urls
+
+
+class RecipeImageSerializer(serializers.Serializer):
+    """Serializer for uploading an image to a recipe."""
+
+    image = serializers.ImageField()
+
+    def validate_image(self, value):
+        """Accept only known formats of a bounded pixel count."""
+        image = value.image
+        if image.format not in FORMATS:
+            raise serializers.ValidationError(
+                f'Upload one of: {", ".join(sorted(FORMATS))}.',
+            )
+        width, height = image.size
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            raise serializers.ValidationError('The image has too many pixels.')
+
+        return value
+
+
+class SimilarRecipeSerializer(RecipeSerializer):
+    """Serializer for a recipe with its similarity to another."""
+
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['score']
+
+
+class RecipeRevisionSerializer(serializers.ModelSerializer):
+    """Serializer for a recorded revision of a recipe."""
+
+    changed = serializers.ListField(
+        child=serializers.CharField(),
+        read_only=True,
+    )
+
+    class Meta:
+        model = RecipeRevision
+        fields = ['number', 'created_at', 'is_snapshot', 'changed']
+        read_only_fields = fields
+
+
+class RecipeVersionSerializer(serializers.Serializer):
+    """Serializer for a recipe as it was at one of its revisions."""
+
+    number = serializers.IntegerField()
+    created_at = serializers.DateTimeField()
+    title = serializers.CharField()
+    time_minutes = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=5, decimal_places=2)
+    description = serializers.CharField()
+    link = serializers.CharField()
+
+
+class TagSerializer(serializers.ModelSerializer):
+    """Serializer for tags."""
+
+    class Meta:
+        model = Tag
+        fields = ['id', 'name']
+        read_only_fields = ['id']
+
+
+class AutocompleteParamsSerializer(serializers.Serializer):
+    """Query parameters for autocomplete suggestions."""
+
+    q = serializers.CharField(max_length=100)
+    kind = serializers.ChoiceField(choices=['tag', 'title'], default='title')
+    limit = serializers.IntegerField(min_value=1, max_value=20, default=10)
+
+
+class SuggestionSerializer(serializers.Serializer):
+    """Serializer for a suggested tag name or recipe title."""
+
+    text = serializers.CharField()
+    uses = serializers.IntegerField()
+
+
+class SyncParamsSerializer(serializers.Serializer):
+    """Query parameters for the change feed."""
+
+    cursor = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=100)
+
+
+class StatsParamsSerializer(serializers.Serializer):
+    """Query parameters for recipe statistics."""
+
+    bucket_width = serializers.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        min_value=Decimal('0.01'),
+        default=Decimal('5.00'),
+    )
+
+
+class PriceBucketSerializer(serializers.Serializer):
+    """Serializer for one price histogram bucket."""
+
+    price_min = serializers.DecimalField(max_digits=7, decimal_places=2)
+    price_max = serializers.DecimalField(max_digits=7, decimal_places=2)
+    count = serializers.IntegerField()
+
+
+class RecipeStatsSerializer(serializers.Serializer):
+    """Serializer for a user's recipe statistics."""
+
+    recipe_count = serializers.IntegerField()
+    average_price = serializers.DecimalField(max_digits=14, decimal_places=2)
+    median_price = serializers.DecimalField(max_digits=5, decimal_places=2)
+    average_time_minutes = serializers.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+    )
+    price_histogram = PriceBucketSerializer(many=True)
+
+
+class BulkAdjustSerializer(serializers.Serializer):
+    """Serializer for a bulk price or time adjustment."""
+
+    field = serializers.ChoiceField(choices=['price', 'time_minutes'])
+    scale = serializers.DecimalField(
+        max_digits=9,
+        decimal_places=6,
+        default=Decimal('1'),
+    )
+    offset = serializers.DecimalField(
+        max_digits=9,
+        decimal_places=2,
+        default=Decimal('0'),
+    )
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        max_length=1000,
+    )
+    dry_run = serializers.BooleanField(default=False)
+
+
+class ShoppingListParamsSerializer(serializers.Serializer):
+    """Serializer for the recipes to build a shopping list from."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(),
+        min_length=1,
+        max_length=1000,
+    )
+
+
+class ShoppingListItemSerializer(serializers.Serializer):
+    """Serializer for the total quantity of an ingredient in one unit."""
+
+    ingredient = serializers.IntegerField(source='ingredient_id')
+    name = serializers.CharField(source='ingredient__name')
+    unit = serializers.CharField()
+    quantity = serializers.DecimalField(max_digits=12, decimal_places=3)
+    recipes = serializers.IntegerField()
+
+
+class SimilarParamsSerializer(serializers.Serializer):
+    """Query parameters for similar recipes."""
+
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
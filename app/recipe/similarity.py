@@ -0,0 +1,428 @@
+"""
+Similar-recipe index.
+
+Recipes are TF-IDF vectors over the words of their title and description,
+compared by cosine similarity with the owner's other recipes. Weights are
+computed per user, and each (user, word) pair is one term, so a term's
+postings only list that user's recipes.
+
+The index is built offline into a single file of packed arrays: a sorted
+term table with a posting list per term, and each recipe's own vector. It is
+memory-mapped read-only and read through NumPy views, so worker processes
+share the same pages, and a query gathers and sums only the postings of the
+recipe's own terms.
+
+Writes after a build come from the change feed. Recipes changed since the
+build are vectorized from the database at query time and their stale index
+entries are skipped, until the next build folds them in. The index covers
+every shard and keeps each shard's change sequence at build time.
+
+That work grows with the writes since the build, so it is bounded: a query
+seeing more than SIMILARITY_REBUILD_CHANGES changes of its user queues a
+build job, and past SIMILARITY_MAX_CHANGES it is refused until the build
+is done.
+"""
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+from array import array
+from collections import Counter
+from hashlib import blake2b
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max
+
+from core import jobs
+from core.fingerprints import normalize_text
+from core.models import Change, Job, Recipe
+from core.sharding import shard_index
+
+MAGIC = b'RSIM0002'
+# The number of shards, then the length of every other section.
+HEADER = struct.Struct('<8s6Q')
+
+WORD = re.compile(r'\w+')
+
+# Too common in recipe text to say anything about similarity.
+STOP_WORDS = frozenset([
+    'a', 'an', 'and', 'as', 'at', 'by', 'for', 'from', 'in', 'into', 'is',
+    'it', 'of', 'on', 'or', 'the', 'then', 'to', 'until', 'with',
+])
+
+# Title words count this many times as often as description words.
+TITLE_WEIGHT = 2
+
+
+class IndexNotBuilt(Exception):
+    """The similarity index file does not exist yet."""
+
+
+class IndexOutOfDate(Exception):
+    """Too many of the user's recipes changed since the index was built."""
+
+
+def term_hash(user_id, word):
+    digest = blake2b(f'{user_id}\x1f{word}'.encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), 'little')
+
+
+def words(text):
+    return [
+        word for word in WORD.findall(normalize_text(text))
+        if word not in STOP_WORDS
+    ]
+
+
+def term_counts(title, description):
+    """Return how often each word occurs in a recipe's text."""
+    counts = Counter(words(description))
+    for word in words(title):
+        counts[word] += TITLE_WEIGHT
+
+    return counts
+
+
+def idf(document_count, document_frequency):
+    return math.log((1 + document_count) / (1 + document_frequency)) + 1
+
+
+def weigh(counts, idfs):
+    """Return the unit-length TF-IDF vector for word counts and their IDFs."""
+    vector = {
+        term: (1 + math.log(count)) * idfs[term]
+        for term, count in counts.items()
+    }
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    if not norm:
+        return {}
+
+    return {term: weight / norm for term, weight in vector.items()}
+
+
+def dot(vector, other):
+    if len(other) < len(vector):
+        vector, other = other, vector
+    return sum(weight * other.get(term, 0) for term, weight in vector.items())
+
+
+def user_vectors(user_id, recipes):
+    """Return the TF-IDF vectors of one user's (id, title, description)."""
+    counts = {
+        recipe_id: {
+            term_hash(user_id, word): count
+            for word, count in term_counts(title, description).items()
+        }
+        for recipe_id, title, description in recipes
+    }
+    frequencies = Counter(term for terms in counts.values() for term in terms)
+    idfs = {
+        term: idf(len(counts), frequency)
+        for term, frequency in frequencies.items()
+    }
+
+    return (
+        {recipe_id: weigh(terms, idfs) for recipe_id, terms in counts.items()},
+        idfs,
+    )
+
+
+def build_index(path=None):
+    """Build the index from every recipe and atomically replace the file.
+
+    Returns the number of recipes indexed.
+    """
+    path = path or settings.SIMILARITY_INDEX_PATH
+    # Taken first, so writes racing the build are treated as changed.
+    change_ids = array('Q', (
+        Change.objects.using(alias).aggregate(last=Max('id'))['last'] or 0
+        for alias in settings.SHARD_DATABASES
+    ))
+
+    counts = {}
+    vectors = {}
+    idfs = {}
+
+    def add_user(user_id, rows):
+        user_vecs, user_idfs = user_vectors(user_id, rows)
+        counts[user_id] = len(rows)
+        vectors.update(user_vecs)
+        idfs.update(user_idfs)
+
+    for alias in settings.SHARD_DATABASES:
+        recipes = Recipe.objects.using(alias).order_by(
+            'user_id', 'id',
+        ).values_list(
+            'user_id', 'id', 'title', 'description',
+        ).iterator(chunk_size=2000)
+        user_id, rows = None, []
+        for row_user_id, recipe_id, title, description in recipes:
+            if row_user_id != user_id and rows:
+                add_user(user_id, rows)
+                rows = []
+            user_id = row_user_id
+            rows.append((recipe_id, title, description))
+        if rows:
+            add_user(user_id, rows)
+
+    users = array('Q', sorted(counts))
+    user_counts = array('I', (counts[user_id] for user_id in users))
+    recipe_ids = array('Q', sorted(vectors))
+    terms = array('Q', sorted(idfs))
+    term_numbers = {term: number for number, term in enumerate(terms)}
+
+    forward_offsets = array('Q', [0])
+    forward_terms = array('I')
+    forward_weights = array('f')
+    postings = [[] for _ in terms]
+    for doc, recipe_id in enumerate(recipe_ids):
+        for term, weight in sorted(vectors[recipe_id].items()):
+            number = term_numbers[term]
+            forward_terms.append(number)
+            forward_weights.append(weight)
+            postings[number].append((doc, weight))
+        forward_offsets.append(len(forward_terms))
+
+    posting_offsets = array('Q', [0])
+    posting_docs = array('I')
+    posting_weights = array('f')
+    for term_postings in postings:
+        for doc, weight in term_postings:
+            posting_docs.append(doc)
+            posting_weights.append(weight)
+        posting_offsets.append(len(posting_docs))
+
+    sections = [
+        change_ids, users, recipe_ids, forward_offsets, terms, posting_offsets,
+        user_counts, array('f', (idfs[term] for term in terms)),
+        forward_terms, forward_weights, posting_docs, posting_weights,
+    ]
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as file:
+        file.write(HEADER.pack(
+            MAGIC, len(change_ids), len(users), len(recipe_ids), len(terms),
+            len(forward_terms), len(posting_docs),
+        ))
+        for section in sections:
+            section.tofile(file)
+    # Readers keep the old mapping until they notice the new file.
+    os.replace(file.name, path)
+
+    return len(recipe_ids)
+
+
+class SimilarityIndex:
+    """Read-only view of an index file mapped into memory."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic, n_shards, n_users, n_docs, n_terms, n_forward,
+            n_postings,
+        ) = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a similarity index.')
+
+        offset = HEADER.size
+
+        def section(dtype, length):
+            nonlocal offset
+            values = np.frombuffer(
+                self.buffer,
+                dtype=dtype,
+                count=length,
+                offset=offset,
+            )
+            offset += values.nbytes
+            return values
+
+        self.change_ids = section('<u8', n_shards)
+        self.users = section('<u8', n_users)
+        self.recipe_ids = section('<u8', n_docs)
+        self.forward_offsets = section('<u8', n_docs + 1)
+        self.terms = section('<u8', n_terms)
+        self.posting_offsets = section('<u8', n_terms + 1)
+        self.user_counts = section('<u4', n_users)
+        self.idfs = section('<f4', n_terms)
+        self.forward_terms = section('<u4', n_forward)
+        self.forward_weights = section('<f4', n_forward)
+        self.posting_docs = section('<u4', n_postings)
+        self.posting_weights = section('<f4', n_postings)
+
+    @staticmethod
+    def find(values, keys):
+        """Return the positions of keys in sorted values, -1 where absent."""
+        keys = np.asarray(keys, dtype=np.uint64)
+        positions = np.searchsorted(values, keys)
+        found = positions < len(values)
+        found[found] = values[positions[found]] == keys[found]
+        return np.where(found, positions, -1)
+
+    def vector(self, recipe_id):
+        """Return an indexed recipe's vector, or None if it is not indexed."""
+        [doc] = self.find(self.recipe_ids, [recipe_id])
+        if doc < 0:
+            return None
+
+        start, end = self.forward_offsets[doc], self.forward_offsets[doc + 1]
+        return dict(zip(
+            self.terms[self.forward_terms[start:end]].tolist(),
+            self.forward_weights[start:end].tolist(),
+        ))
+
+    def vectorize(self, user_id, title, description):
+        """Return the vector of text not in the index, using its IDFs."""
+        counts = {
+            term_hash(user_id, word): count
+            for word, count in term_counts(title, description).items()
+        }
+        [user] = self.find(self.users, [user_id])
+        document_count = int(self.user_counts[user]) if user >= 0 else 0
+        numbers = self.find(self.terms, list(counts))
+        idfs = {
+            term: (
+                float(self.idfs[number]) if number >= 0
+                else idf(document_count, 0)
+            )
+            for term, number in zip(counts, numbers.tolist())
+        }
+
+        return weigh(counts, idfs)
+
+    def scores(self, vector):
+        """Return the ids of indexed recipes sharing a term with the vector
+        and their dot products with it, as arrays.
+        """
+        numbers = self.find(self.terms, list(vector))
+        weights = np.fromiter(vector.values(), dtype=np.float64)
+        present = numbers >= 0
+        numbers, weights = numbers[present], weights[present]
+        if not len(numbers):
+            return np.empty(0, np.uint64), np.empty(0, np.float64)
+
+        starts = self.posting_offsets[numbers]
+        ends = self.posting_offsets[numbers + 1]
+
+        docs = np.concatenate([
+            self.posting_docs[start:end]
+            for start, end in zip(starts, ends)
+        ])
+        products = np.concatenate([
+            self.posting_weights[start:end] * weight
+            for start, end, weight in zip(starts, ends, weights)
+        ])
+        docs, inverse = np.unique(docs, return_inverse=True)
+
+        return (
+            self.recipe_ids[docs],
+            np.bincount(inverse, weights=products, minlength=len(docs)),
+        )
+
+
+_index = None
+_index_key = None
+
+
+def load_index(path=None):
+    """Return the mapped index, remapping it when the file is replaced."""
+    global _index, _index_key
+
+    path = path or settings.SIMILARITY_INDEX_PATH
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise IndexNotBuilt(path)
+
+    key = (str(path), stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    if key != _index_key:
+        _index, _index_key = SimilarityIndex(path), key
+
+    return _index
+
+
+def request_build():
+    """Queue an index build unless one is already waiting or running."""
+    if not Job.objects.filter(
+        name='build_similarity_index',
+        status__in=[Job.QUEUED, Job.RUNNING],
+    ).exists():
+        jobs.enqueue('build_similarity_index')
+
+
+def build_index_task(job):
+    """Job task rebuilding the index file."""
+    return {'indexed': build_index()}
+
+
+def similar_recipes(recipe, limit=10):
+    """Return (recipe id, score) pairs for the recipes most like this one.
+
+    Raises IndexOutOfDate when more of the user's recipes changed since the
+    build than a query re-vectorizes.
+    """
+    index = load_index()
+    shard = shard_index(recipe._state.db)
+    change_id = (
+        int(index.change_ids[shard]) if shard < len(index.change_ids) else 0
+    )
+    changes = Change.objects.using(recipe._state.db).filter(
+        user_id=recipe.user_id,
+        model=Change.RECIPE,
+        id__gt=change_id,
+    ).values_list('object_id', 'deleted')
+    changes = dict(changes[:settings.SIMILARITY_MAX_CHANGES + 1])
+    if len(changes) > settings.SIMILARITY_REBUILD_CHANGES:
+        request_build()
+    if len(changes) > settings.SIMILARITY_MAX_CHANGES:
+        raise IndexOutOfDate(recipe.user_id)
+
+    vector = None
+    if recipe.id not in changes:
+        vector = index.vector(recipe.id)
+    if vector is None:
+        vector = index.vectorize(
+            recipe.user_id,
+            recipe.title,
+            recipe.description,
+        )
+
+    ids, scores = index.scores(vector)
+    stale = np.isin(ids, np.fromiter(
+        [recipe.id, *changes], dtype=np.uint64,
+    ))
+    ids, scores = ids[~stale], scores[~stale]
+
+    changed = Recipe.objects.using(recipe._state.db).filter(
+        user_id=recipe.user_id,
+        id__in=[
+            recipe_id for recipe_id, deleted in changes.items()
+            if not deleted and recipe_id != recipe.id
+        ],
+    ).values_list('id', 'title', 'description')
+    changed_scores = {
+        recipe_id: dot(
+            vector,
+            index.vectorize(recipe.user_id, title, description),
+        )
+        for recipe_id, title, description in changed
+    }
+    if changed_scores:
+        ids = np.concatenate([
+            ids, np.fromiter(changed_scores, dtype=np.uint64),
+        ])
+        scores = np.concatenate([
+            scores,
+            np.fromiter(changed_scores.values(), dtype=np.float64),
+        ])
+
+    positive = scores > 0
+    ids, scores = ids[positive], scores[positive]
+    # Highest score first, ties by id.
+    order = np.lexsort((ids, -scores))[:limit]
+
+    return list(zip(ids[order].tolist(), scores[order].tolist()))
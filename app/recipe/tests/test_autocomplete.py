@@ -0,0 +1,127 @@
+"""
+Tests for tag and title autocomplete.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe import autocomplete
+
+AUTOCOMPLETE_URL = reverse('recipe:recipe-autocomplete')
+
+
+def create_recipe(user, title, description=''):
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        description=description,
+        time_minutes=10,
+        price=Decimal('5.00'),
+    )
+
+
+class AutocompleteTests(TestCase):
+    """Test autocomplete suggestions."""
+
+    def setUp(self):
+        autocomplete.clear_cache()
+        self.addCleanup(autocomplete.clear_cache)
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_auth_required(self):
+        """Test auth is required for suggestions."""
+        res = APIClient().get(AUTOCOMPLETE_URL, {'q': 'pa'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_titles_ranked_by_uses(self):
+        """Test titles starting with the text are ranked by frequency."""
+        create_recipe(self.user, 'Pasta')
+        create_recipe(self.user, 'Pancakes')
+        create_recipe(self.user, 'Pancakes', 'With syrup')
+        create_recipe(self.user, 'Soup')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'PA'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['text'], item['uses']) for item in res.data],
+            [('Pancakes', 2), ('Pasta', 1)],
+        )
+
+    def test_tags_prefix_before_substring(self):
+        """Test prefix matches come before substring matches."""
+        for name in ['Dinner', 'Winter dinner', 'Winter dinner', 'Dessert']:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'din', 'kind': 'tag'})
+
+        self.assertEqual(
+            [(item['text'], item['uses']) for item in res.data],
+            [('Dinner', 1), ('Winter dinner', 2)],
+        )
+
+    def test_short_text_prefix_only(self):
+        """Test texts too short for substrings only match prefixes."""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'ga', 'kind': 'tag'})
+
+        self.assertEqual(res.data, [])
+
+    def test_limit(self):
+        """Test at most limit suggestions are returned, most used first."""
+        for name in ['Bread', 'Bread', 'Brownies', 'Broth']:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(
+            AUTOCOMPLETE_URL,
+            {'q': 'br', 'kind': 'tag', 'limit': 1},
+        )
+
+        self.assertEqual(res.data, [{'text': 'Bread', 'uses': 2}])
+
+    def test_other_users_excluded(self):
+        """Test suggestions only come from the user's own data."""
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        create_recipe(other, 'Pasta')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'pa'})
+
+        self.assertEqual(res.data, [])
+
+    def test_cached(self):
+        """Test repeated texts are answered from the cache."""
+        create_recipe(self.user, 'Pasta')
+        autocomplete.suggest(self.user.id, 'title', 'pa', 10)
+
+        with self.assertNumQueries(0):
+            suggestions = autocomplete.suggest(
+                self.user.id, 'title', 'PA', 10,
+            )
+
+        self.assertEqual(suggestions, [{'text': 'Pasta', 'uses': 1}])
+
+    def test_invalid_params(self):
+        """Test a missing text or unknown kind is rejected."""
+        for params in [
+            {},
+            {'q': 'pa', 'kind': 'user'},
+            {'q': 'a', 'limit': 0},
+        ]:
+            res = self.client.get(AUTOCOMPLETE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
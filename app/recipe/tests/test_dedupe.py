@@ -0,0 +1,242 @@
+"""
+Tests for duplicate recipe detection.
+"""
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.fingerprints import content_hash, near_duplicate_clusters
+from core.models import Change, Recipe, RecipeStats
+from recipe.images import set_image
+from recipe.serializers import RecipeSerializer
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+SOUP = (
+    'Simmer the onions, carrots and celery in butter, add the stock and '
+    'the lentils and cook for forty minutes until soft, then season.'
+)
+
+
+def create_recipe(user, title, description='', **params):
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        description=description,
+        time_minutes=params.pop('time_minutes', 10),
+        price=params.pop('price', Decimal('5.00')),
+        **params,
+    )
+
+
+class ContentHashTests(TestCase):
+    """Test exact duplicates are caught by the content hash."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_hash_ignores_case_and_whitespace(self):
+        """Test content differing in case and spacing hashes the same."""
+        self.assertEqual(
+            content_hash('Lentil  Soup ', '', 'Cook it.'),
+            content_hash('lentil soup', '', 'COOK it.'),
+        )
+        self.assertNotEqual(
+            content_hash('Lentil soup', '', ''),
+            content_hash('Lentil', '', 'soup'),
+        )
+
+    def test_duplicate_rejected_on_create(self):
+        """Test creating a recipe identical to an existing one fails."""
+        recipe = create_recipe(self.user, 'Lentil soup')
+        payload = {'title': 'LENTIL SOUP', 'time_minutes': 5, 'price': '2.00'}
+
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(recipe.id), res.data['non_field_errors'][0])
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_duplicate_rejected_on_update(self):
+        """Test editing a recipe into a copy of another fails."""
+        create_recipe(self.user, 'Lentil soup')
+        other = create_recipe(self.user, 'Pea soup')
+        url = reverse('recipe:recipe-detail', args=[other.id])
+
+        res = self.client.patch(url, {'title': 'lentil soup'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_racing_duplicate_rejected(self):
+        """Test a duplicate created after validation is reported, not a 500.
+        """
+        recipe = create_recipe(self.user, 'Lentil soup')
+        payload = {'title': 'Lentil soup', 'time_minutes': 5, 'price': '2.00'}
+
+        # As if both requests were validated before either was saved.
+        with mock.patch.object(
+            RecipeSerializer,
+            'validate',
+            lambda self, attrs: attrs,
+        ):
+            res = self.client.post(RECIPES_URL, payload)
+            other = create_recipe(self.user, 'Pea soup')
+            update = self.client.patch(
+                reverse('recipe:recipe-detail', args=[other.id]),
+                {'title': 'lentil soup'},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data['non_field_errors'],
+            [f'Duplicate of recipe {recipe.id}.'],
+        )
+        self.assertEqual(update.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            update.data['non_field_errors'],
+            [f'Duplicate of recipe {recipe.id}.'],
+        )
+
+    def test_legacy_duplicate_saved(self):
+        """Test duplicates without a hash save fields other than their text.
+        """
+        create_recipe(self.user, 'Lentil soup')
+        legacy = create_recipe(self.user, 'Old soup')
+        Recipe.objects.filter(id=legacy.id).update(
+            title='Lentil soup',
+            content_hash=None,
+        )
+        legacy = Recipe.objects.get(id=legacy.id)
+
+        set_image(legacy, 'recipes/soup.jpg')
+        res = self.client.patch(
+            reverse('recipe:recipe-detail', args=[legacy.id]),
+            {'price': '3.00'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.image.name, 'recipes/soup.jpg')
+        self.assertIsNone(legacy.content_hash)
+
+    def test_same_content_allowed_for_other_users(self):
+        """Test different users may hold identical recipes."""
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        create_recipe(other_user, 'Lentil soup')
+        payload = {'title': 'Lentil soup', 'time_minutes': 5, 'price': '2.00'}
+
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_bulk_create_skips_duplicates(self):
+        """Test bulk creates hash recipes and can skip duplicates."""
+        create_recipe(self.user, 'Lentil soup')
+        recipes = [
+            Recipe(
+                user=self.user,
+                title=title,
+                time_minutes=5,
+                price=Decimal('1.00'),
+            )
+            for title in ['Lentil Soup', 'Pea soup']
+        ]
+
+        Recipe.objects.bulk_create(recipes, ignore_conflicts=True)
+
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('title', flat=True)),
+            ['Lentil soup', 'Pea soup'],
+        )
+        with self.assertRaises(IntegrityError):
+            Recipe.objects.bulk_create([Recipe(
+                user=self.user,
+                title='pea soup',
+                time_minutes=5,
+                price=Decimal('1.00'),
+            )])
+
+
+class NearDuplicateTests(TestCase):
+    """Test near-duplicate clustering and merging."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+
+    def test_clusters_similar_text(self):
+        """Test texts differing by a word cluster, unrelated ones do not."""
+        clusters = near_duplicate_clusters([
+            (1, 'Lentil soup ' + SOUP),
+            (2, 'Unrelated text about baking bread with yeast and flour.'),
+            (3, 'Lentil soup ' + SOUP.replace('forty', 'forty five')),
+            (4, 'Lentil soup ' + SOUP),
+        ], threshold=0.7)
+
+        self.assertEqual(clusters, [[1, 3, 4]])
+
+    def test_command_reports_without_merging(self):
+        """Test the command lists clusters and changes nothing by default."""
+        first = create_recipe(self.user, 'Lentil soup', SOUP)
+        second = create_recipe(self.user, 'Lentil soup', SOUP + ' Serve.')
+        out = StringIO()
+
+        call_command('find_duplicate_recipes', threshold=0.7, stdout=out)
+
+        self.assertIn(
+            f'user@example.com: recipe {first.id} "Lentil soup" ~ '
+            f'{second.id}',
+            out.getvalue(),
+        )
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_command_merges_clusters(self):
+        """Test merging keeps the oldest recipe and records the deletes."""
+        first = create_recipe(self.user, 'Lentil soup', SOUP)
+        second = create_recipe(self.user, 'Lentil soup', SOUP + ' Serve.')
+        create_recipe(self.user, 'Bread', 'Knead flour, water and yeast.')
+        # A duplicate from before content hashes were enforced.
+        legacy = create_recipe(self.user, 'Old soup', SOUP)
+        Recipe.objects.filter(id=first.id).update(content_hash=None)
+        Recipe.objects.filter(id=legacy.id).update(
+            title='Lentil soup',
+            content_hash=None,
+        )
+
+        call_command(
+            'find_duplicate_recipes',
+            threshold=0.7,
+            merge=True,
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('title', flat=True)),
+            ['Bread', 'Lentil soup'],
+        )
+        first.refresh_from_db()
+        self.assertEqual(first.content_hash, first.compute_content_hash())
+        self.assertTrue(Change.objects.filter(
+            object_id=second.id,
+            deleted=True,
+        ).exists())
+        stats = RecipeStats.objects.get(user=self.user)
+        self.assertEqual(stats.recipe_count, 2)
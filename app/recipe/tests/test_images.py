@@ -0,0 +1,147 @@
+"""
+Tests for recipe image uploads and thumbnails.
+"""
+import os
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import Change, Job, Recipe
+
+
+def image_upload_url(recipe_id):
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class RecipeImageTests(TestCase):
+    """Test uploading images and generating thumbnails."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media_root = directory.name
+        settings = override_settings(
+            MEDIA_ROOT=self.media_root,
+            RECIPE_THUMBNAIL_SIZES=[32, 64],
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+
+    def upload(self, size=(200, 100), image_format='JPEG'):
+        suffix = f'.{image_format.lower()}'
+        with tempfile.NamedTemporaryFile(suffix=suffix) as file:
+            Image.new('RGB', size, color=(200, 80, 40)).save(
+                file,
+                format=image_format,
+            )
+            file.seek(0)
+            return self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': file},
+                format='multipart',
+            )
+
+    def test_upload_image(self):
+        """Test uploading an image stores it under its content hash."""
+        res = self.upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertRegex(
+            self.recipe.image.name,
+            r'^recipes/[0-9a-f]{32}\.jpg$',
+        )
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertTrue(res.data['image'].endswith(self.recipe.image.name))
+        self.assertEqual(res.data['thumbnails'], {})
+        self.assertTrue(Job.objects.filter(name='recipe_thumbnails').exists())
+
+    def test_same_image_stored_once(self):
+        """Test identical uploads share one file."""
+        self.upload()
+        self.upload()
+
+        files = os.listdir(os.path.join(self.media_root, 'recipes'))
+        self.assertEqual(len(files), 1)
+
+    def test_thumbnails_generated_by_job(self):
+        """Test the job writes each size and records the change."""
+        self.upload()
+        cursor = Change.objects.order_by('-id').first().id
+
+        jobs.work(stop_when_idle=True)
+
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(sorted(res.data['thumbnails']), ['32', '64'])
+        self.recipe.refresh_from_db()
+        path = os.path.join(self.media_root, self.recipe.thumbnails['64'])
+        with Image.open(path) as thumbnail:
+            self.assertEqual(thumbnail.size, (64, 32))
+        self.assertTrue(Change.objects.filter(id__gt=cursor).exists())
+
+    def test_upload_invalid_image(self):
+        """Test uploading a file that is not an image fails."""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as file:
+            file.write(b'not an image')
+            file.seek(0)
+            res = self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': file},
+                format='multipart',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_unsupported_format(self):
+        """Test only the accepted formats are stored."""
+        res = self.upload(image_format='GIF')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMAGE_MAX_BYTES=100)
+    def test_upload_too_large(self):
+        """Test uploads over the size limit are rejected."""
+        res = self.upload()
+
+        self.assertEqual(
+            res.status_code,
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    def test_other_users_recipe(self):
+        """Test uploading to another user's recipe is not found."""
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(other)
+
+        res = self.upload()
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,213 @@
+"""
+Tests for recipe ingredients and shopping lists.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, RecipeIngredient
+from core.sharding import shard_db
+from recipe.ingredients import normalize_unit, set_recipe_ingredients
+
+RECIPES_URL = reverse('recipe:recipe-list')
+SHOPPING_LIST_URL = reverse('recipe:recipe-shopping-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class IngredientTests(TestCase):
+    """Test ingredients on recipes."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_normalize_unit(self):
+        """Test unit spellings share one short form."""
+        self.assertEqual(normalize_unit('Grams'), 'g')
+        self.assertEqual(normalize_unit(' tbsp. '), 'tbsp')
+        self.assertEqual(normalize_unit(''), '')
+
+    def test_create_recipe_with_ingredients(self):
+        """Test ingredients are created once per normalized name."""
+        payload = {
+            'title': 'Pancakes',
+            'time_minutes': 20,
+            'price': '3.50',
+            'ingredients': [
+                {'name': 'Plain Flour', 'quantity': '200', 'unit': 'grams'},
+                {'name': 'plain  flour', 'quantity': '50', 'unit': 'g'},
+                {'name': 'Eggs', 'quantity': '2'},
+            ],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 2)
+        lines = {
+            (line['name'], line['unit']): line['quantity']
+            for line in res.data['ingredients']
+        }
+        self.assertEqual(lines, {
+            ('Plain Flour', 'g'): '250.000',
+            ('Eggs', ''): '2.000',
+        })
+
+    def test_existing_ingredient_reused(self):
+        """Test a recipe names the ingredient the user already has."""
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe = create_recipe(self.user)
+
+        set_recipe_ingredients(recipe, [
+            {'name': 'SALT', 'quantity': Decimal('1'), 'unit': 'tsp'},
+        ])
+
+        self.assertEqual(ingredient.normalized_name, 'salt')
+        self.assertEqual(
+            list(recipe.ingredients.all()),
+            [ingredient],
+        )
+
+    def test_nested_write_queries_batched(self):
+        """Test writing ingredients takes the same queries for any count."""
+        recipe = create_recipe(self.user)
+        items = [
+            {'name': f'Spice {i}', 'quantity': Decimal('1'), 'unit': 'g'}
+            for i in range(50)
+        ]
+
+        # Select, insert, re-select, delete the old lines, insert the new.
+        with self.assertNumQueries(5, using=shard_db()):
+            set_recipe_ingredients(recipe, items)
+
+    def test_partial_update_keeps_ingredients(self):
+        """Test updates without ingredients leave them alone."""
+        recipe = create_recipe(self.user)
+        set_recipe_ingredients(recipe, [
+            {'name': 'Rice', 'quantity': Decimal('100'), 'unit': 'g'},
+        ])
+
+        res = self.client.patch(
+            detail_url(recipe.id),
+            {'title': 'Rice bowl'},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['ingredients']), 1)
+
+    def test_update_replaces_ingredients(self):
+        """Test updating ingredients replaces the recipe's lines."""
+        recipe = create_recipe(self.user)
+        set_recipe_ingredients(recipe, [
+            {'name': 'Rice', 'quantity': Decimal('100'), 'unit': 'g'},
+        ])
+
+        res = self.client.patch(
+            detail_url(recipe.id),
+            {'ingredients': [{'name': 'Noodles', 'quantity': '1'}]},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [line['name'] for line in res.data['ingredients']],
+            ['Noodles'],
+        )
+        self.assertEqual(RecipeIngredient.objects.count(), 1)
+
+
+class ShoppingListTests(TestCase):
+    """Test the shopping list endpoint."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_shopping_list(self):
+        """Test quantities are summed per ingredient and unit."""
+        soup = create_recipe(self.user, title='Soup')
+        stew = create_recipe(self.user, title='Stew')
+        set_recipe_ingredients(soup, [
+            {'name': 'Carrot', 'quantity': Decimal('2'), 'unit': ''},
+            {'name': 'Stock', 'quantity': Decimal('500'), 'unit': 'ml'},
+        ])
+        set_recipe_ingredients(stew, [
+            {'name': 'carrot', 'quantity': Decimal('3'), 'unit': ''},
+            {'name': 'Stock', 'quantity': Decimal('1'), 'unit': 'litre'},
+        ])
+
+        with self.assertNumQueries(1, using=shard_db()):
+            res = self.client.post(
+                SHOPPING_LIST_URL,
+                {'recipes': [soup.id, stew.id]},
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (item['name'], item['unit'], item['quantity'], item['recipes'])
+                for item in res.data
+            ],
+            [
+                ('Carrot', '', '5.000', 2),
+                ('Stock', 'l', '1.000', 1),
+                ('Stock', 'ml', '500.000', 1),
+            ],
+        )
+
+    def test_other_users_recipes_ignored(self):
+        """Test recipes of other users add nothing."""
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        recipe = create_recipe(other)
+        set_recipe_ingredients(recipe, [
+            {'name': 'Salt', 'quantity': Decimal('1'), 'unit': 'g'},
+        ])
+
+        res = self.client.post(
+            SHOPPING_LIST_URL,
+            {'recipes': [recipe.id]},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+    def test_recipes_required(self):
+        """Test an empty list of recipes is rejected."""
+        res = self.client.post(
+            SHOPPING_LIST_URL,
+            {'recipes': []},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,21 +1,34 @@
 """Tests for Recipe APIs."""
 
+from datetime import timedelta
 from decimal import Decimal
+from itertools import count
+from urllib.parse import parse_qs, urlparse
 
-from django.test import TestCase
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
-from core.models import Recipe
+from core.models import Change, Recipe, Tag
+from core.sharding import shard_db
 from recipe.serializers import (
     RecipeSerializer,
     RecipeDetailSerializer,
 )
 
 RECIPES_URL = reverse('recipe:recipe-list')
+SYNC_URL = reverse('recipe:recipe-sync')
+STATS_URL = reverse('recipe:recipe-stats')
+BULK_ADJUST_URL = reverse('recipe:recipe-bulk-adjust')
+
+# Recipes with identical content are rejected, so sample titles are unique.
+RECIPE_NUMBERS = count(1)
 
 
 def detail_url(recipe_id):
@@ -26,7 +39,7 @@ def detail_url(recipe_id):
 def create_recipe(user, **params):
     """Create and return a sample recipe."""
     defaults = {
-        'title': 'Sample recipe title',
+        'title': f'Sample recipe title {next(RECIPE_NUMBERS)}',
         'time_minutes': 22,
         'price': Decimal('5.25'),
         'description': 'Sample description',
@@ -249,3 +262,382 @@ class PrivateRecipeApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
         self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    @override_settings(SYNC_COMMIT_LAG_SECONDS=0)
+    def test_sync_returns_changes_after_cursor(self):
+        """Test the change feed returns only what changed after the cursor."""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        create_recipe(user=create_user(email='other@example.com'))
+
+        res = self.client.get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['recipes'],
+            RecipeDetailSerializer([recipe], many=True).data,
+        )
+        self.assertEqual(res.data['tags'], [{'id': tag.id, 'name': 'Vegan'}])
+        self.assertFalse(res.data['has_more'])
+
+        res = self.client.get(SYNC_URL, {'cursor': res.data['cursor']})
+
+        self.assertEqual(res.data['recipes'], [])
+        self.assertEqual(res.data['tags'], [])
+
+    @override_settings(SYNC_COMMIT_LAG_SECONDS=0)
+    def test_sync_reports_updates_once(self):
+        """Test an object updated twice appears once, at its latest change."""
+        recipe = create_recipe(user=self.user)
+        cursor = self.client.get(SYNC_URL).data['cursor']
+
+        self.client.patch(detail_url(recipe.id), {'title': 'First'})
+        self.client.patch(detail_url(recipe.id), {'title': 'Second'})
+        res = self.client.get(SYNC_URL, {'cursor': cursor})
+
+        self.assertEqual(len(res.data['recipes']), 1)
+        self.assertEqual(res.data['recipes'][0]['title'], 'Second')
+        self.assertEqual(Change.objects.filter(object_id=recipe.id).count(), 1)
+
+    @override_settings(SYNC_COMMIT_LAG_SECONDS=0)
+    def test_sync_reports_deletions(self):
+        """Test deleted recipes are returned as tombstones."""
+        recipe = create_recipe(user=self.user)
+        cursor = self.client.get(SYNC_URL).data['cursor']
+
+        self.client.delete(detail_url(recipe.id))
+        res = self.client.get(SYNC_URL, {'cursor': cursor})
+
+        self.assertEqual(res.data['recipes'], [])
+        self.assertEqual(res.data['deleted']['recipe'], [recipe.id])
+
+    @override_settings(SYNC_COMMIT_LAG_SECONDS=0)
+    def test_sync_pages(self):
+        """Test the change feed is returned in bounded pages."""
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+
+        first = self.client.get(SYNC_URL, {'limit': 2})
+        second = self.client.get(
+            SYNC_URL,
+            {'limit': 2, 'cursor': first.data['cursor']},
+        )
+
+        self.assertTrue(first.data['has_more'])
+        self.assertFalse(second.data['has_more'])
+        self.assertEqual(
+            [r['id'] for r in first.data['recipes'] + second.data['recipes']],
+            [recipe.id for recipe in recipes],
+        )
+
+    def test_sync_holds_back_recent_changes(self):
+        """Test changes are served once older than the commit lag."""
+        first = create_recipe(user=self.user)
+        second = create_recipe(user=self.user)
+        Change.objects.filter(object_id=first.id).update(
+            created_at=timezone.now() - timedelta(minutes=1),
+        )
+
+        res = self.client.get(SYNC_URL)
+
+        self.assertEqual([r['id'] for r in res.data['recipes']], [first.id])
+        self.assertFalse(res.data['has_more'])
+        with override_settings(SYNC_COMMIT_LAG_SECONDS=0):
+            res = self.client.get(SYNC_URL, {'cursor': res.data['cursor']})
+        self.assertEqual([r['id'] for r in res.data['recipes']], [second.id])
+
+    def test_sync_invalid_cursor(self):
+        """Test an invalid cursor returns an error."""
+        res = self.client.get(SYNC_URL, {'cursor': 'abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_by_time_and_price_range(self):
+        """Test filtering recipes by time_minutes and price ranges."""
+        quick_cheap = create_recipe(
+            user=self.user, time_minutes=10, price=Decimal('4.00'))
+        create_recipe(user=self.user, time_minutes=45, price=Decimal('4.00'))
+        create_recipe(user=self.user, time_minutes=10, price=Decimal('12.00'))
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'time_minutes_max': 30, 'price_max': '10.00'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [quick_cheap.id])
+
+    def test_invalid_range_filter_error(self):
+        """Test invalid or inverted ranges return an error."""
+        for params in (
+            {'price_max': 'cheap'},
+            {'time_minutes_min': -1},
+            {'time_minutes_min': 30, 'time_minutes_max': 10},
+        ):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ordering(self):
+        """Test ordering by a whitelisted field, ties broken by id."""
+        r1 = create_recipe(user=self.user, price=Decimal('3.00'))
+        r2 = create_recipe(user=self.user, price=Decimal('1.00'))
+        r3 = create_recipe(user=self.user, price=Decimal('3.00'))
+
+        res = self.client.get(RECIPES_URL, {'ordering': '-price'})
+
+        self.assertEqual([r['id'] for r in res.data], [r3.id, r1.id, r2.id])
+
+    def test_ordering_not_whitelisted_error(self):
+        """Test ordering by a field that is not whitelisted is rejected."""
+        res = self.client.get(RECIPES_URL, {'ordering': 'description'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_paginate_filtered_and_sorted(self):
+        """Test cursor pages follow the filter and ordering."""
+        for minutes in (5, 50, 20, 10, 15):
+            create_recipe(user=self.user, time_minutes=minutes)
+        params = {
+            'time_minutes_max': 20,
+            'ordering': 'time_minutes',
+            'page_size': 3,
+        }
+
+        first = self.client.get(RECIPES_URL, params)
+        second = self.client.get(first.data['next'])
+
+        self.assertEqual(
+            [r['time_minutes'] for r in first.data['results']],
+            [5, 10, 15],
+        )
+        self.assertEqual(
+            [r['time_minutes'] for r in second.data['results']],
+            [20],
+        )
+        self.assertIsNone(second.data['next'])
+
+    def test_paginate_through_ties(self):
+        """Test pages seek past rows sharing a value without losing any."""
+        recipes = [
+            create_recipe(user=self.user, price=Decimal(price))
+            for price in ('5.00', '3.00', '5.00', '5.00', '9.00', '5.00')
+        ]
+        expected = [
+            r.id for r in sorted(recipes, key=lambda r: (-r.price, -r.id))
+        ]
+        params = {'ordering': '-price', 'page_size': 2}
+
+        pages = [self.client.get(RECIPES_URL, params).data]
+        while pages[-1]['next']:
+            pages.append(self.client.get(pages[-1]['next']).data)
+        back = [pages[-1]]
+        while back[-1]['previous']:
+            back.append(self.client.get(back[-1]['previous']).data)
+
+        self.assertEqual(
+            [r['id'] for page in pages for r in page['results']],
+            expected,
+        )
+        self.assertEqual(
+            [r['id'] for page in reversed(back) for r in page['results']],
+            expected,
+        )
+
+    def test_invalid_page_cursor_error(self):
+        """Test a cursor that does not match the ordering is not found."""
+        create_recipe(user=self.user)
+        create_recipe(user=self.user)
+        first = self.client.get(RECIPES_URL, {'page_size': 1})
+        cursor = parse_qs(urlparse(first.data['next']).query)['cursor'][0]
+
+        for params in (
+            {'ordering': 'price', 'cursor': cursor},
+            {'cursor': 'abc'},
+        ):
+            res = self.client.get(RECIPES_URL, {'page_size': 1, **params})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_detail_ignores_list_params(self):
+        """Test range and ordering parameters only apply to lists."""
+        recipe = create_recipe(user=self.user, price=Decimal('5.00'))
+        url = f'{detail_url(recipe.id)}?price_max=1&ordering=description'
+
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.patch(url, {'title': 'Renamed'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.delete(url)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_stats_follow_api_writes(self):
+        """Test stats are kept up to date through create, update, delete."""
+        payload = {'title': 'Soup', 'time_minutes': 10, 'price': '4.00'}
+        recipe_id = self.client.post(RECIPES_URL, payload).data['id']
+        self.client.post(
+            RECIPES_URL,
+            {**payload, 'title': 'Stew', 'price': '8.00'},
+        )
+        self.client.patch(detail_url(recipe_id), {'price': '2.00'})
+        create_recipe(user=self.user, price=Decimal('6.00'))
+        self.client.delete(detail_url(recipe_id))
+
+        res = self.client.get(STATS_URL, {'bucket_width': '10.00'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 1)
+        self.assertEqual(res.data['average_price'], '8.00')
+        self.assertEqual(res.data['median_price'], '8.00')
+        self.assertEqual(res.data['price_histogram'], [
+            {'price_min': '0.00', 'price_max': '10.00', 'count': 1},
+        ])
+
+    def test_stats_built_on_first_use(self):
+        """Test stats for existing recipes are computed on first request."""
+        create_recipe(user=self.user, price=Decimal('3.00'))
+        create_recipe(user=self.user, price=Decimal('5.00'))
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 2)
+        self.assertEqual(res.data['median_price'], '4.00')
+
+    def test_bulk_adjust_price(self):
+        """Test scaling prices in one update, reporting overflow rows."""
+        r1 = create_recipe(user=self.user, price=Decimal('5.25'))
+        r2 = create_recipe(user=self.user, price=Decimal('990.00'))
+        r3 = create_recipe(user=self.user, price=Decimal('2.00'))
+        other = create_recipe(
+            user=create_user(email='other@example.com'),
+            price=Decimal('5.25'),
+        )
+        payload = {'field': 'price', 'scale': '1.05', 'ids': [r1.id, r2.id]}
+
+        res = self.client.post(BULK_ADJUST_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'updated': 1, 'out_of_range': [r2.id]})
+        for recipe, price in (
+            (r1, '5.51'), (r2, '990.00'), (r3, '2.00'), (other, '5.25'),
+        ):
+            recipe.refresh_from_db()
+            self.assertEqual(recipe.price, Decimal(price))
+        stats = self.client.get(STATS_URL).data
+        self.assertEqual(stats['median_price'], '5.51')
+
+    def test_bulk_adjust_time_with_filters(self):
+        """Test offsetting times of the recipes matching the filters."""
+        slow = create_recipe(user=self.user, time_minutes=60)
+        quick = create_recipe(user=self.user, time_minutes=10)
+
+        res = self.client.post(
+            f'{BULK_ADJUST_URL}?time_minutes_min=30',
+            {'field': 'time_minutes', 'scale': '0.5', 'offset': '5'},
+            format='json',
+        )
+
+        self.assertEqual(res.data['updated'], 1)
+        slow.refresh_from_db()
+        quick.refresh_from_db()
+        self.assertEqual(slow.time_minutes, 35)
+        self.assertEqual(quick.time_minutes, 10)
+
+    def test_bulk_adjust_time_overflow(self):
+        """Test times scaled past the integer column are left unchanged."""
+        slow = create_recipe(user=self.user, time_minutes=2 ** 30)
+        quick = create_recipe(user=self.user, time_minutes=10)
+
+        res = self.client.post(
+            BULK_ADJUST_URL,
+            {'field': 'time_minutes', 'scale': '4'},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'updated': 1, 'out_of_range': [slow.id]})
+        slow.refresh_from_db()
+        quick.refresh_from_db()
+        self.assertEqual(slow.time_minutes, 2 ** 30)
+        self.assertEqual(quick.time_minutes, 40)
+
+    def test_bulk_adjust_dry_run(self):
+        """Test a dry run previews the changes without writing them."""
+        recipe = create_recipe(user=self.user, price=Decimal('10.00'))
+        payload = {
+            'field': 'price',
+            'scale': '0.9',
+            'offset': '-0.01',
+            'dry_run': True,
+        }
+
+        res = self.client.post(BULK_ADJUST_URL, payload, format='json')
+
+        self.assertEqual(res.data['changes'], [
+            {'id': recipe.id, 'old': '10.00', 'new': '8.99'},
+        ])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.price, Decimal('10.00'))
+
+
+class RecipeQueryPlanTests(TestCase):
+    """Test filtered and sorted recipe list pages are index-driven."""
+
+    def setUp(self):
+        self.user = create_user(email='test@example.com', password='testpass')
+        for i in range(20):
+            create_recipe(
+                user=self.user,
+                time_minutes=i,
+                price=Decimal(i % 5),
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def explain_page(self, params):
+        """Return the plan of the query the list runs for a later page."""
+        first = self.client.get(RECIPES_URL, params)
+        db = connections[shard_db()]
+        with CaptureQueriesContext(db) as queries:
+            self.client.get(first.data['next'])
+        [sql] = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "core_recipe"' in query['sql']
+        ]
+
+        with db.cursor() as cursor:
+            if db.vendor == 'postgresql':
+                # Tiny test tables would otherwise always be scanned.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'{db.ops.explain_query_prefix()} {sql}')
+            return '\n'.join(
+                ' '.join(map(str, row)) for row in cursor.fetchall()
+            )
+
+    def assertNoSort(self, plan):
+        """Assert rows come out in index order, not through a sort step."""
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertNotRegex(plan, r'\bSort\b')
+
+    def test_price_range_uses_index(self):
+        """Test a price range sorted by price seeks on the price index."""
+        plan = self.explain_page({
+            'price_min': '1.00',
+            'price_max': '3.00',
+            'ordering': 'price',
+            'page_size': 5,
+        })
+
+        self.assertIn('recipe_user_price_idx', plan)
+        self.assertNoSort(plan)
+
+    def test_time_range_uses_index(self):
+        """Test a time range sorted by time seeks on the time index."""
+        plan = self.explain_page({
+            'time_minutes_max': 30,
+            'ordering': '-time_minutes',
+            'page_size': 5,
+        })
+
+        self.assertIn('recipe_user_time_idx', plan)
+        self.assertNoSort(plan)
@@ -0,0 +1,210 @@
+"""
+Tests for recipe revision history.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import revisions
+from core.models import Recipe, RecipeRevision
+from core.sharding import shard_db
+
+BULK_ADJUST_URL = reverse('recipe:recipe-bulk-adjust')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+WORDS = [
+    'chicken', 'soup', 'garlic', 'roast', 'lemon', 'pasta', 'tomato', 'basil',
+]
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def revisions_url(recipe_id):
+    return reverse('recipe:recipe-revisions', args=[recipe_id])
+
+
+def revision_url(recipe_id, number):
+    return reverse('recipe:recipe-revision', args=[recipe_id, number])
+
+
+def long_description(lines=200):
+    return '\n'.join(
+        f'Step {i}: add the {WORDS[i % len(WORDS)]} and stir well.'
+        for i in range(lines)
+    )
+
+
+class RevisionTests(TestCase):
+    """Test revisions are recorded and versions rebuilt."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, **params):
+        payload = {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': '5.00',
+            'description': 'Boil water.\nAdd salt.',
+        }
+        payload.update(params)
+        res = self.client.post(RECIPES_URL, payload)
+        return Recipe.objects.get(id=res.data['id'])
+
+    def test_create_records_snapshot(self):
+        """Test a new recipe starts with a snapshot of every field."""
+        recipe = self.create_recipe()
+
+        res = self.client.get(revisions_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        [revision] = res.data
+        self.assertEqual(revision['number'], 1)
+        self.assertTrue(revision['is_snapshot'])
+        self.assertEqual(revision['changed'], revisions.TRACKED_FIELDS)
+
+    def test_update_records_delta(self):
+        """Test an edit adds a delta naming the fields changed."""
+        recipe = self.create_recipe()
+
+        self.client.patch(
+            detail_url(recipe.id),
+            {'description': 'Boil water.\nAdd pepper.', 'price': '6.50'},
+        )
+
+        res = self.client.get(revisions_url(recipe.id))
+        self.assertEqual(
+            [(r['number'], r['is_snapshot']) for r in res.data],
+            [(2, False), (1, True)],
+        )
+        self.assertEqual(res.data[0]['changed'], ['price', 'description'])
+        res = self.client.get(revision_url(recipe.id, 1))
+        self.assertEqual(res.data['description'], 'Boil water.\nAdd salt.')
+        self.assertEqual(res.data['price'], '5.00')
+        res = self.client.get(revision_url(recipe.id, 2))
+        self.assertEqual(res.data['description'], 'Boil water.\nAdd pepper.')
+        self.assertEqual(res.data['price'], '6.50')
+
+    def test_unchanged_save_skipped(self):
+        """Test saves leaving tracked fields alone add no revision."""
+        recipe = self.create_recipe()
+
+        recipe.save()
+        recipe.thumbnails = {'200': 'recipes/thumb.jpg'}
+        recipe.save(update_fields=['thumbnails'])
+
+        self.assertEqual(recipe.revisions.count(), 1)
+
+    @override_settings(RECIPE_REVISION_SNAPSHOT_INTERVAL=3)
+    def test_snapshot_interval(self):
+        """Test snapshots recur and any version is rebuilt in one query."""
+        recipe = self.create_recipe()
+        for minutes in range(11, 17):
+            self.client.patch(detail_url(recipe.id), {'time_minutes': minutes})
+
+        self.assertEqual(
+            list(recipe.revisions.order_by('number').values_list(
+                'is_snapshot', flat=True,
+            )),
+            [True, False, False, True, False, False, True],
+        )
+        for number in range(1, 8):
+            with self.assertNumQueries(1, using=shard_db()):
+                revision, state = revisions.get_version(recipe, number)
+            self.assertEqual(revision.number, number)
+            self.assertEqual(state['time_minutes'], 9 + number)
+
+    def test_deltas_compact(self):
+        """Test edits of a long description store a fraction of it."""
+        description = long_description()
+        recipe = self.create_recipe(description=description)
+        lines = description.splitlines(keepends=True)
+        for i in range(10):
+            lines[i * 7] = f'Step {i * 7}: taste and season.\n'
+            self.client.patch(
+                detail_url(recipe.id),
+                {'description': ''.join(lines)},
+            )
+
+        deltas = recipe.revisions.filter(is_snapshot=False)
+        self.assertEqual(deltas.count(), 10)
+        # Ten full copies would take ten times the description.
+        stored = sum(len(revision.data) for revision in deltas)
+        self.assertLess(stored, len(description) / 4)
+        _, state = revisions.get_version(recipe, 11)
+        self.assertEqual(state['description'], ''.join(lines))
+        _, state = revisions.get_version(recipe, 1)
+        self.assertEqual(state['description'], description)
+
+    @override_settings(RECIPE_SINGLE_STATEMENT_WRITES=True)
+    def test_single_statement_writes(self):
+        """Test single-statement updates record revisions, deletes drop them.
+        """
+        recipe = self.create_recipe()
+
+        self.client.patch(detail_url(recipe.id), {'price': '7.25'})
+        res = self.client.get(revision_url(recipe.id, 2))
+        self.assertEqual(res.data['price'], '7.25')
+
+        self.client.delete(detail_url(recipe.id))
+        self.assertFalse(RecipeRevision.objects.exists())
+
+    def test_bulk_adjust_records_revisions(self):
+        """Test bulk adjustments add a revision per recipe changed."""
+        recipe = self.create_recipe()
+
+        self.client.post(
+            BULK_ADJUST_URL,
+            {'field': 'price', 'scale': '2', 'offset': '0'},
+            format='json',
+        )
+
+        _, state = revisions.get_version(recipe, 2)
+        self.assertEqual(state['price'], '10.00')
+
+    def test_missing_revision(self):
+        """Test unknown revisions and other users' recipes are not found."""
+        recipe = self.create_recipe()
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        client = APIClient()
+        client.force_authenticate(other)
+
+        res = self.client.get(revision_url(recipe.id, 2))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        res = client.get(revisions_url(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        res = client.get(revision_url(recipe.id, 1))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_untracked_recipe(self):
+        """Test a recipe without history starts with a snapshot on edit."""
+        Recipe.objects.bulk_create([
+            Recipe(
+                user=self.user,
+                title='Stew',
+                time_minutes=60,
+                price=Decimal('9.00'),
+            ),
+        ])
+        recipe = Recipe.objects.get(title='Stew')
+
+        self.client.patch(detail_url(recipe.id), {'time_minutes': 90})
+
+        [revision] = recipe.revisions.all()
+        self.assertTrue(revision.is_snapshot)
+        _, state = revisions.get_version(recipe, 1)
+        self.assertEqual(state['time_minutes'], 90)
@@ -0,0 +1,170 @@
+"""
+Tests for the similar-recipe index.
+"""
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import Job, Recipe
+from recipe import similarity
+
+
+def similar_url(recipe_id):
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+def create_recipe(user, title, description=''):
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        description=description,
+        time_minutes=10,
+        price=Decimal('5.00'),
+    )
+
+
+class SimilarRecipesTests(TestCase):
+    """Test finding similar recipes from the index."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'similarity.idx')
+        settings = override_settings(SIMILARITY_INDEX_PATH=self.path)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.soup = create_recipe(
+            self.user,
+            'Tomato soup',
+            'Roast tomatoes and garlic, then blend with stock.',
+        )
+        self.bisque = create_recipe(
+            self.user,
+            'Tomato bisque',
+            'Blend roasted tomatoes with cream and stock.',
+        )
+        self.bread = create_recipe(
+            self.user,
+            'Sourdough bread',
+            'Knead flour, water and starter, then bake.',
+        )
+
+    def build(self):
+        call_command('build_similarity_index', stdout=StringIO())
+
+    def test_missing_index(self):
+        """Test a 503 is returned before the index is built."""
+        res = self.client.get(similar_url(self.soup.id))
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_similar_recipes(self):
+        """Test the most similar recipes come first, unrelated ones never."""
+        self.build()
+
+        res = self.client.get(similar_url(self.soup.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [self.bisque.id])
+        self.assertGreater(res.data[0]['score'], 0)
+
+    def test_other_users_recipes_excluded(self):
+        """Test only the owner's recipes are considered."""
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        create_recipe(other, 'Tomato soup', 'Roast tomatoes and garlic.')
+        self.build()
+
+        res = self.client.get(similar_url(self.soup.id))
+
+        self.assertEqual([r['id'] for r in res.data], [self.bisque.id])
+
+    def test_writes_after_build(self):
+        """Test created, edited and deleted recipes are seen before rebuild."""
+        self.build()
+        gazpacho = create_recipe(
+            self.user,
+            'Tomato gazpacho',
+            'Blend raw tomatoes with garlic and cucumber.',
+        )
+        self.bisque.title = 'Brioche'
+        self.bisque.description = 'Knead flour, butter and eggs, then bake.'
+        self.bisque.save()
+
+        res = self.client.get(similar_url(self.soup.id))
+        self.assertEqual([r['id'] for r in res.data], [gazpacho.id])
+
+        res = self.client.get(similar_url(self.bread.id))
+        self.assertEqual([r['id'] for r in res.data], [self.bisque.id])
+
+        self.client.delete(
+            reverse('recipe:recipe-detail', args=[gazpacho.id]),
+        )
+        res = self.client.get(similar_url(self.soup.id))
+        self.assertEqual(res.data, [])
+
+    def test_rebuild_replaces_mapped_index(self):
+        """Test workers pick up a rebuilt index file."""
+        self.build()
+        first = similarity.load_index()
+
+        self.build()
+
+        self.assertIsNot(similarity.load_index(), first)
+        self.assertEqual(len(similarity.load_index().recipe_ids), 3)
+
+    def test_limit(self):
+        """Test the number of results can be limited."""
+        create_recipe(self.user, 'Tomato salad', 'Slice tomatoes.')
+        self.build()
+
+        res = self.client.get(similar_url(self.soup.id), {'limit': 1})
+
+        self.assertEqual(len(res.data), 1)
+
+    @override_settings(SIMILARITY_REBUILD_CHANGES=1, SIMILARITY_MAX_CHANGES=2)
+    def test_many_writes_after_build(self):
+        """Test many changes queue one rebuild, then refuse until it is done.
+        """
+        self.build()
+        create_recipe(self.user, 'Tomato salad', 'Slice tomatoes.')
+
+        res = self.client.get(similar_url(self.soup.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(Job.objects.exists())
+
+        create_recipe(self.user, 'Tomato tart', 'Bake tomatoes in pastry.')
+        res = self.client.get(similar_url(self.soup.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        create_recipe(self.user, 'Tomato pasta', 'Toss tomatoes with pasta.')
+        res = self.client.get(similar_url(self.soup.id))
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        [job] = Job.objects.all()
+        self.assertEqual(job.name, 'build_similarity_index')
+
+        jobs.run_job(jobs.claim_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.result, {'indexed': 6})
+        res = self.client.get(similar_url(self.soup.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 4)
@@ -0,0 +1,213 @@
+"""
+Tests for single-statement recipe updates and deletes.
+"""
+import re
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Change, Recipe, RecipeIngredient, RecipeStats
+from core.sharding import shard_db
+from core.stats import rebuild_stats
+from recipe.ingredients import set_recipe_ingredients
+
+RECIPE_TABLE = re.compile(r'"core_recipe"')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def recipe_statements(queries):
+    """Return the statements that touched the recipe table."""
+    return [
+        query['sql'] for query in queries.captured_queries
+        if RECIPE_TABLE.search(query['sql'])
+    ]
+
+
+@override_settings(RECIPE_SINGLE_STATEMENT_WRITES=True)
+class SingleStatementWriteTests(TestCase):
+    """Test recipe writes made in one statement."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=10,
+            price=Decimal('5.00'),
+            link='https://example.com/recipe',
+        )
+
+    def test_partial_update_is_one_statement(self):
+        """Test a patch writes only the given column in one UPDATE."""
+        # The transaction, the UPDATE, the change feed and webhook outbox,
+        # the revision, dropping the stats and loading the ingredients.
+        with self.assertNumQueries(10, using=shard_db()), \
+                CaptureQueriesContext(connections[shard_db()]) as queries:
+            res = self.client.patch(
+                detail_url(self.recipe.id),
+                {'time_minutes': 25},
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['time_minutes'], 25)
+        self.assertEqual(res.data['title'], 'Sample recipe')
+        self.assertEqual(res.data['price'], '5.00')
+        statements = recipe_statements(queries)
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('UPDATE'))
+        self.assertNotIn('"title"', statements[0].split('WHERE')[0])
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.time_minutes, 25)
+
+    def test_update_records_change_and_refreshes_stats(self):
+        """Test the write reaches the change feed and the stats."""
+        rebuild_stats(self.user.id)
+
+        self.client.patch(
+            detail_url(self.recipe.id),
+            {'price': '7.50'},
+            format='json',
+        )
+
+        self.assertTrue(Change.objects.filter(
+            model='recipe',
+            object_id=self.recipe.id,
+        ).exists())
+        self.assertFalse(RecipeStats.objects.filter(user=self.user).exists())
+        res = self.client.get(reverse('recipe:recipe-stats'))
+        self.assertEqual(res.data['average_price'], '7.50')
+
+    def test_full_update_sets_content_hash(self):
+        """Test a put recomputes the content hash."""
+        payload = {
+            'title': 'New title',
+            'time_minutes': 15,
+            'price': '4.00',
+            'link': '',
+            'description': 'Better',
+        }
+
+        res = self.client.put(
+            detail_url(self.recipe.id),
+            payload,
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            self.recipe.content_hash,
+            self.recipe.compute_content_hash(),
+        )
+
+    def test_update_duplicate(self):
+        """Test content matching another recipe is rejected as before."""
+        other = Recipe.objects.create(
+            user=self.user,
+            title='Other',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+
+        res = self.client.patch(
+            detail_url(self.recipe.id),
+            {'title': 'Other', 'link': '', 'description': ''},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data['non_field_errors'],
+            [f'Duplicate of recipe {other.id}.'],
+        )
+
+    def test_partial_content_update_uses_regular_path(self):
+        """Test a patch of the title alone still updates the hash."""
+        res = self.client.patch(
+            detail_url(self.recipe.id),
+            {'title': 'Renamed'},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            self.recipe.content_hash,
+            self.recipe.compute_content_hash(),
+        )
+
+    def test_update_other_users_recipe(self):
+        """Test another user's recipe is not found and left unchanged."""
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.patch(
+            detail_url(self.recipe.id),
+            {'time_minutes': 99},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.time_minutes, 10)
+
+    def test_delete_is_one_statement(self):
+        """Test a delete checks ownership and deletes in one statement."""
+        set_recipe_ingredients(self.recipe, [
+            {'name': 'Rice', 'quantity': Decimal('100'), 'unit': 'g'},
+        ])
+        rebuild_stats(self.user.id)
+
+        # The transaction, the DELETE and its related rows, the change feed
+        # and webhook outbox, and the stats read and written under a lock.
+        with self.assertNumQueries(10, using=shard_db()), \
+                CaptureQueriesContext(connections[shard_db()]) as queries:
+            res = self.client.delete(detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        statements = recipe_statements(queries)
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('DELETE'))
+        self.assertFalse(Recipe.objects.filter(id=self.recipe.id).exists())
+        self.assertFalse(RecipeIngredient.objects.exists())
+        self.assertTrue(Change.objects.filter(
+            model='recipe',
+            object_id=self.recipe.id,
+            deleted=True,
+        ).exists())
+        self.assertEqual(
+            RecipeStats.objects.get(user=self.user).recipe_count,
+            0,
+        )
+
+    def test_delete_other_users_recipe(self):
+        """Test deleting another user's recipe is not found."""
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.delete(detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Recipe.objects.filter(id=self.recipe.id).exists())
+        self.assertFalse(Change.objects.filter(deleted=True).exists())
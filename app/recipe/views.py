@@ -1,32 +1,466 @@
 """Views for the recipe APIs."""
+from datetime import timedelta
 
 # from rest_framework import authentication, permissions
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
-from core.models import Recipe
-from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from django.conf import settings
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from django.db import IntegrityError
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import Http404
+from django.utils import timezone
 
+from core.authentication import ExpiringTokenAuthentication
+from core.changes import record_changes
+from core.models import Change, Recipe, RecipeIngredient, Tag
+from core.revisions import get_version, list_revisions, record_revisions
+from core.sharding import (
+    UserShardMixin,
+    cursor_shard,
+    shard_atomic,
+    shard_db,
+    shard_index,
+)
+from core.stats import (
+    get_stats,
+    invalidate_stats,
+    summarize,
+    update_stats,
+)
+from recipe.autocomplete import suggest
+from recipe.bulk import apply_adjustment, preview_adjustment
+from recipe.filters import RecipeOrderingFilter, RecipeRangeFilter
+from recipe.images import HashingUploadHandler, set_image, store_image
+from recipe.ingredients import sum_ingredients
+from recipe.pagination import RecipeCursorPagination
+from recipe.similarity import (
+    IndexNotBuilt,
+    IndexOutOfDate,
+    similar_recipes,
+)
+from recipe.writes import (
+    STATS_FIELDS,
+    can_update,
+    delete_recipe,
+    find_duplicate,
+    update_recipe,
+)
+from recipe.serializers import (
+    AutocompleteParamsSerializer,
+    BulkAdjustSerializer,
+    RecipeSerializer,
+    RecipeDetailSerializer,
+    RecipeRevisionSerializer,
+    RecipeVersionSerializer,
+    RecipeImageSerializer,
+    RecipeStatsSerializer,
+    ShoppingListItemSerializer,
+    ShoppingListParamsSerializer,
+    SimilarParamsSerializer,
+    SimilarRecipeSerializer,
+    StatsParamsSerializer,
+    SuggestionSerializer,
+    SyncParamsSerializer,
+    TagSerializer,
+)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+# Actions rendering recipes with RecipeDetailSerializer.
+DETAIL_ACTIONS = {'retrieve', 'update', 'partial_update', 'upload_image'}
+
+
+def ingredient_lines():
+    """Return the prefetch of the lines RecipeDetailSerializer renders."""
+    return Prefetch(
+        'recipe_ingredients',
+        queryset=RecipeIngredient.objects.select_related(
+            'ingredient',
+        ).order_by('id'),
+    )
+
+
+def with_ingredients(queryset):
+    return queryset.prefetch_related(ingredient_lines())
+
+
+class RecipeViewSet(UserShardMixin, viewsets.ModelViewSet):
     """Manage views for recipe APIs."""
 
     queryset = Recipe.objects.all()
     serializer_class = RecipeDetailSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [ExpiringTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    filter_backends = [RecipeRangeFilter, RecipeOrderingFilter]
+    ordering_fields = ['id', 'time_minutes', 'price']
+    ordering = ['-id']
+    pagination_class = RecipeCursorPagination
 
     def get_queryset(self):
-        return self.queryset.filter(user=self.request.user).order_by('-id')
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action in DETAIL_ACTIONS:
+            queryset = with_ingredients(queryset)
+
+        return queryset.order_by('-id')
 
     def get_serializer_class(self):
         """Return the serializer for requests."""
         if self.action == 'list':
             return RecipeSerializer
+        if self.action == 'sync':
+            return SyncParamsSerializer
+        if self.action == 'stats':
+            return StatsParamsSerializer
+        if self.action == 'bulk_adjust':
+            return BulkAdjustSerializer
+        if self.action == 'similar':
+            return SimilarParamsSerializer
+        if self.action == 'upload_image':
+            return RecipeImageSerializer
+        if self.action == 'shopping_list':
+            return ShoppingListParamsSerializer
+        if self.action == 'autocomplete':
+            return AutocompleteParamsSerializer
 
         return self.serializer_class
 
     def perform_create(self, serializer):
         """Create a new recipe"""
-        serializer.save(user=self.request.user)
+        try:
+            with shard_atomic():
+                recipe = serializer.save(user=self.request.user)
+                update_stats(
+                    recipe.user_id,
+                    added=(recipe.price, recipe.time_minutes),
+                )
+        except IntegrityError:
+            # Validation passed, but an identical recipe was created since.
+            values = serializer.validated_data
+            self.check_duplicate(None, {
+                name: values.get(name, '') for name in Recipe.HASHED_FIELDS
+            })
+            raise
+
+    def perform_update(self, serializer):
+        """Update a recipe and its owner's stats."""
+        recipe = serializer.instance
+        try:
+            with shard_atomic():
+                before = (recipe.price, recipe.time_minutes)
+                recipe = serializer.save()
+                after = (recipe.price, recipe.time_minutes)
+                if after != before:
+                    update_stats(recipe.user_id, removed=before, added=after)
+        except IntegrityError:
+            self.check_duplicate(recipe.id, {
+                name: getattr(recipe, name) for name in Recipe.HASHED_FIELDS
+            })
+            raise
+
+    def check_duplicate(self, recipe_id, values):
+        """Reject content another of the user's recipes already has.
+
+        Called after an IntegrityError, once the transaction is rolled
+        back, to tell a duplicate from other constraint failures.
+        """
+        duplicate_id = find_duplicate(self.request.user.id, recipe_id, values)
+        if duplicate_id is not None:
+            raise ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    f'Duplicate of recipe {duplicate_id}.',
+                ],
+            }, code='duplicate')
+
+    def update(self, request, *args, **kwargs):
+        """Update a recipe, in one statement when configured to."""
+        if not settings.RECIPE_SINGLE_STATEMENT_WRITES:
+            return super().update(request, *args, **kwargs)
+
+        serializer = self.get_serializer(
+            data=request.data,
+            partial=kwargs.get('partial', False),
+            context={
+                **self.get_serializer_context(),
+                'check_duplicates': False,
+            },
+        )
+        serializer.is_valid(raise_exception=True)
+        values = serializer.validated_data
+        if not can_update(values):
+            return super().update(request, *args, **kwargs)
+
+        recipe_id = self.recipe_id()
+        try:
+            with shard_atomic():
+                recipe = update_recipe(request.user.id, recipe_id, values)
+                if recipe is None:
+                    raise Http404('No Recipe matches the given query.')
+                record_changes(Recipe, recipe.user_id, [recipe.id])
+                record_revisions([recipe])
+                if any(name in values for name in STATS_FIELDS):
+                    invalidate_stats(recipe.user_id)
+        except IntegrityError:
+            self.check_duplicate(recipe_id, values)
+            raise
+
+        prefetch_related_objects([recipe], ingredient_lines())
+        return Response(self.get_serializer(recipe).data)
+
+    def destroy(self, request, *args, **kwargs):
+        """Delete a recipe, in one statement when configured to."""
+        if not settings.RECIPE_SINGLE_STATEMENT_WRITES:
+            return super().destroy(request, *args, **kwargs)
+
+        recipe_id = self.recipe_id()
+        with shard_atomic():
+            removed = delete_recipe(request.user.id, recipe_id)
+            if removed is None:
+                raise Http404('No Recipe matches the given query.')
+            record_changes(
+                Recipe, request.user.id, [recipe_id], deleted=True,
+            )
+            update_stats(request.user.id, removed=removed)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def recipe_id(self):
+        """Return the recipe id in the URL, which must be an integer."""
+        try:
+            return int(self.kwargs[self.lookup_field])
+        except ValueError:
+            raise Http404('No Recipe matches the given query.')
+
+    def perform_destroy(self, instance):
+        """Delete a recipe and leave a tombstone in the change feed."""
+        with shard_atomic():
+            record_changes(
+                Recipe, instance.user_id, [instance.id], deleted=True,
+            )
+            instance.delete()
+            update_stats(
+                instance.user_id,
+                removed=(instance.price, instance.time_minutes),
+            )
+
+    @action(detail=False)
+    def sync(self, request):
+        """Return recipes and tags changed after the client's cursor."""
+        params = self.get_serializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        limit = params.validated_data['limit']
+        cursor = params.validated_data['cursor']
+        # A cursor issued by another shard predates a move: start over.
+        if cursor_shard(cursor) != shard_index(shard_db()):
+            cursor = 0
+
+        changes = list(Change.objects.filter(
+            user=request.user,
+            id__gt=cursor,
+        ).order_by('id')[:limit + 1])
+        # Stop before the first change too recent for every change below it
+        # to have committed, and serve it on a later call.
+        settled = timezone.now() - timedelta(
+            seconds=settings.SYNC_COMMIT_LAG_SECONDS,
+        )
+        for i, change in enumerate(changes):
+            if change.created_at > settled:
+                changes = changes[:i]
+                break
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        changed = {Change.RECIPE: [], Change.TAG: []}
+        deleted = {Change.RECIPE: [], Change.TAG: []}
+        for change in changes:
+            ids = deleted if change.deleted else changed
+            ids[change.model].append(change.object_id)
+
+        recipes = with_ingredients(Recipe.objects.filter(
+            user=request.user,
+            id__in=changed[Change.RECIPE],
+        )).order_by('id')
+        tags = Tag.objects.filter(
+            user=request.user,
+            id__in=changed[Change.TAG],
+        ).order_by('id')
+
+        return Response({
+            'cursor': changes[-1].id if changes else cursor,
+            'has_more': has_more,
+            'recipes': RecipeDetailSerializer(recipes, many=True).data,
+            'tags': TagSerializer(tags, many=True).data,
+            'deleted': deleted,
+        })
+
+    @action(detail=False)
+    def stats(self, request):
+        """Return the user's recipe statistics from their summary row."""
+        params = self.get_serializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        summary = summarize(
+            get_stats(request.user.id),
+            params.validated_data['bucket_width'],
+        )
+
+        return Response(RecipeStatsSerializer(summary).data)
+
+    @action(detail=False)
+    def autocomplete(self, request):
+        """Return tag names or recipe titles matching the typed text."""
+        params = self.get_serializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        suggestions = suggest(
+            request.user.id,
+            params.validated_data['kind'],
+            params.validated_data['q'],
+            params.validated_data['limit'],
+        )
+
+        return Response(SuggestionSerializer(suggestions, many=True).data)
+
+    @action(detail=True)
+    def similar(self, request, pk=None):
+        """Return the user's recipes most similar to this one."""
+        params = self.get_serializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        recipe = self.get_object()
+
+        try:
+            scores = similar_recipes(recipe, params.validated_data['limit'])
+        except IndexNotBuilt:
+            return Response(
+                {'detail': 'The similarity index has not been built.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        except IndexOutOfDate:
+            return Response(
+                {'detail': 'The similarity index is being rebuilt.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        recipes = self.get_queryset().in_bulk([
+            recipe_id for recipe_id, _ in scores
+        ])
+        similar = []
+        for recipe_id, score in scores:
+            if recipe_id in recipes:
+                recipes[recipe_id].score = score
+                similar.append(recipes[recipe_id])
+
+        return Response(SimilarRecipeSerializer(similar, many=True).data)
+
+    @action(detail=True)
+    def revisions(self, request, pk=None):
+        """Return the recipe's revisions, newest first."""
+        revisions = list_revisions(self.get_object())
+
+        return Response(RecipeRevisionSerializer(revisions, many=True).data)
+
+    @extend_schema(
+        operation_id='recipe_recipes_revision_retrieve',
+        parameters=[OpenApiParameter('number', int, OpenApiParameter.PATH)],
+    )
+    @action(detail=True, url_path=r'revisions/(?P<number>[0-9]+)')
+    def revision(self, request, pk=None, number=None):
+        """Return the recipe as it was at one of its revisions."""
+        version = get_version(self.get_object(), int(number))
+        if version is None:
+            raise Http404('No revision matches the given query.')
+        revision, state = version
+
+        return Response(RecipeVersionSerializer({
+            'number': revision.number,
+            'created_at': revision.created_at,
+            **state,
+        }).data)
+
+    @action(
+        detail=True,
+        methods=['post'],
+        url_path='upload-image',
+        parser_classes=[MultiPartParser],
+    )
+    def upload_image(self, request, pk=None):
+        """Upload an image to a recipe; thumbnails follow in the background."""
+        recipe = self.get_object()
+        handler = HashingUploadHandler(request)
+        request.upload_handlers = [handler]
+
+        serializer = self.get_serializer(data=request.data)
+        if handler.too_large:
+            return Response(
+                {'image': ['The image is too large.']},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        serializer.is_valid(raise_exception=True)
+        image = serializer.validated_data['image']
+
+        set_image(
+            recipe,
+            store_image(image, image.image.format),
+            user=request.user,
+        )
+
+        return Response(
+            RecipeDetailSerializer(
+                recipe,
+                context=self.get_serializer_context(),
+            ).data,
+        )
+
+    @action(detail=False, methods=['post'], url_path='shopping-list')
+    def shopping_list(self, request):
+        """Return the summed ingredients of the given recipes."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        items = sum_ingredients(
+            request.user,
+            serializer.validated_data['recipes'],
+        )
+
+        return Response(ShoppingListItemSerializer(items, many=True).data)
+
+    @action(detail=False, methods=['post'], url_path='bulk-adjust')
+    def bulk_adjust(self, request):
+        """Scale and offset the price or time of many recipes at once.
+
+        Applies to the recipes matching the list filters, narrowed to
+        ``ids`` when given. Recipes whose result would not fit the column
+        are reported and left unchanged.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if 'ids' in data:
+            queryset = queryset.filter(id__in=data['ids'])
+        args = (queryset, data['field'], data['scale'], data['offset'])
+
+        if data['dry_run']:
+            changes, out_of_range = preview_adjustment(*args)
+            return Response({
+                'updated': len(changes),
+                'out_of_range': out_of_range,
+                'changes': [
+                    {
+                        'id': change['id'],
+                        'old': str(change['old']),
+                        'new': str(change['new']),
+                    }
+                    for change in changes
+                ],
+            })
+
+        updated, out_of_range = apply_adjustment(*args)
+
+        return Response({'updated': updated, 'out_of_range': out_of_range})
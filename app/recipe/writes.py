@@ -0,0 +1,149 @@
+"""
+Single-statement recipe updates and deletes.
+
+With settings.RECIPE_SINGLE_STATEMENT_WRITES on, the recipe API writes a
+recipe without loading it first: one UPDATE or DELETE filtered on both the
+id and the owner checks ownership and writes at once, and RETURNING hands
+back the row. Updates write only the columns in the request.
+
+The content hash covers title, link and description together, so updates
+naming only some of them, or replacing ingredients, need the stored recipe
+and take the regular path. The change feed and revision history are still
+written; an update of the price or time drops the owner's stats row instead
+of reading the old values, and the next stats request rebuilds it.
+"""
+from django.db import connections
+
+from core.fingerprints import content_hash
+from core.models import Recipe, RecipeIngredient, RecipeRevision
+from core.sharding import shard_db
+
+HASHED_FIELDS = {'title', 'link', 'description'}
+
+STATS_FIELDS = ['price', 'time_minutes']
+
+
+def can_update(values):
+    """Return whether validated values can be written in one statement."""
+    hashed = HASHED_FIELDS & values.keys()
+    return 'recipe_ingredients' not in values and hashed in (
+        set(), HASHED_FIELDS,
+    )
+
+
+def convert_row(connection, fields, row):
+    """Convert raw column values the way the ORM does when reading."""
+    values = []
+    for field, value in zip(fields, row):
+        column = field.get_col(Recipe._meta.db_table)
+        converters = (
+            connection.ops.get_db_converters(column)
+            + field.get_db_converters(connection)
+        )
+        for converter in converters:
+            value = converter(value, column, connection)
+        values.append(value)
+
+    return values
+
+
+def write_returning(sql, params, fields):
+    """Run a guarded write on the current shard and return its row."""
+    using = shard_db()
+    connection = connections[using]
+    columns = ', '.join(
+        connection.ops.quote_name(field.column) for field in fields
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'{sql} RETURNING {columns}', params)
+        row = cursor.fetchone()
+    if row is None:
+        return None
+
+    return convert_row(connection, fields, row)
+
+
+def guarded_where(connection):
+    quote = connection.ops.quote_name
+    return (
+        f'WHERE {quote(Recipe._meta.pk.column)} = %s '
+        f'AND {quote(Recipe._meta.get_field("user").column)} = %s'
+    )
+
+
+def hash_values(values):
+    return content_hash(
+        *(values[name] for name in ('title', 'link', 'description')),
+    )
+
+
+def update_recipe(user_id, recipe_id, values):
+    """Write values to one of the user's recipes and return it.
+
+    Returns None when the user has no such recipe. Content duplicating
+    another recipe raises IntegrityError; find_duplicate names that recipe
+    once the transaction is rolled back.
+    """
+    values = dict(values)
+    if HASHED_FIELDS <= values.keys():
+        values['content_hash'] = hash_values(values)
+
+    connection = connections[shard_db()]
+    quote = connection.ops.quote_name
+    assignments = []
+    params = []
+    for name, value in values.items():
+        field = Recipe._meta.get_field(name)
+        assignments.append(f'{quote(field.column)} = %s')
+        params.append(field.get_db_prep_save(value, connection))
+    if not assignments:
+        # Still a write, so it is recorded like an empty save.
+        pk_column = quote(Recipe._meta.pk.column)
+        assignments.append(f'{pk_column} = {pk_column}')
+
+    fields = Recipe._meta.concrete_fields
+    sql = (
+        f'UPDATE {quote(Recipe._meta.db_table)} '
+        f'SET {", ".join(assignments)} {guarded_where(connection)}'
+    )
+    row = write_returning(sql, [*params, recipe_id, user_id], fields)
+    if row is None:
+        return None
+
+    return Recipe.from_db(
+        shard_db(),
+        [field.attname for field in fields],
+        row,
+    )
+
+
+def find_duplicate(user_id, recipe_id, values):
+    """Return the id of another recipe of the user with the values' hash."""
+    return Recipe.objects.filter(
+        user_id=user_id,
+        content_hash=hash_values(values),
+    ).exclude(id=recipe_id).values_list('id', flat=True).first()
+
+
+def delete_recipe(user_id, recipe_id):
+    """Delete one of the user's recipes, its ingredient lines and revisions.
+
+    Returns the deleted recipe's (price, time_minutes), or None when the
+    user has no such recipe. The related rows have no foreign key
+    constraint, so they can go after the recipe, once it is known to be the
+    user's.
+    """
+    connection = connections[shard_db()]
+    fields = [Recipe._meta.get_field(name) for name in STATS_FIELDS]
+    sql = (
+        f'DELETE FROM {connection.ops.quote_name(Recipe._meta.db_table)} '
+        f'{guarded_where(connection)}'
+    )
+    row = write_returning(sql, [recipe_id, user_id], fields)
+    if row is None:
+        return None
+
+    RecipeIngredient.objects.filter(recipe_id=recipe_id).delete()
+    RecipeRevision.objects.filter(recipe_id=recipe_id).delete()
+
+    return tuple(row)
@@ -0,0 +1,92 @@
+"""
+Bulk user provisioning.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+
+from core import emails
+
+
+def hash_passwords(passwords, workers=1):
+    """Hash raw passwords, spreading the work over worker processes."""
+    if workers <= 1:
+        return [make_password(password) for password in passwords]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(make_password, passwords, chunksize=64))
+
+
+def provision_users(rows, workers=1, batch_size=1000):
+    """Create users from dicts of email, name and password or password_hash.
+
+    Every email is validated once and existing accounts are looked up a batch
+    at a time. Returns the number of users created and a list of errors for
+    the rows that were skipped.
+    """
+    User = get_user_model()
+    errors = []
+    users = []
+    raw_passwords = []
+    seen = set()
+
+    for index, row in enumerate(rows):
+        try:
+            email = emails.normalize_email(row.get('email'))
+        except ValueError as error:
+            errors.append({'row': index, 'error': str(error)})
+            continue
+
+        if email in seen:
+            errors.append({'row': index, 'error': 'Duplicate email.'})
+            continue
+        seen.add(email)
+
+        password = row.get('password') or None
+        password_hash = row.get('password_hash') or None
+        if password and password_hash:
+            errors.append({
+                'row': index,
+                'error': 'Provide either password or password_hash.',
+            })
+            continue
+        if password_hash:
+            try:
+                identify_hasher(password_hash)
+            except ValueError:
+                errors.append({'row': index, 'error': 'Unknown hasher.'})
+                continue
+
+        users.append((index, {
+            'email': email,
+            'name': row.get('name') or '',
+            'password': password_hash,
+        }))
+        raw_passwords.append(password)
+
+    existing = set()
+    for start in range(0, len(users), batch_size):
+        batch = users[start:start + batch_size]
+        existing.update(User.objects.filter(
+            email__in=[fields['email'] for _, fields in batch],
+        ).values_list('email', flat=True))
+
+    new_users = []
+    to_hash = []
+    for (index, fields), password in zip(users, raw_passwords):
+        if fields['email'] in existing:
+            errors.append({'row': index, 'error': 'Email already registered.'})
+            continue
+        new_users.append(fields)
+        if fields['password'] is None:
+            to_hash.append((fields, password))
+
+    hashes = hash_passwords([password for _, password in to_hash], workers)
+    for (fields, _), encoded in zip(to_hash, hashes):
+        fields['password'] = encoded
+
+    User.objects.bulk_create_users(new_users, batch_size=batch_size)
+    errors.sort(key=lambda error: error['row'])
+
+    return len(new_users), errors
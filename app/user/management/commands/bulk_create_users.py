@@ -0,0 +1,45 @@
+"""
+Django command to create users in bulk from a CSV file.
+"""
+
+import csv
+
+from django.core.management.base import BaseCommand
+
+from user.bulk import provision_users
+
+
+class Command(BaseCommand):
+    """Django command to provision users from a CSV file.
+
+    The file needs an ``email`` column and may have ``name`` and either
+    ``password`` or an already encoded ``password_hash``.
+    """
+
+    help = 'Create users in bulk from a CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row.')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processes used to hash raw passwords.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        """Entry point for the command."""
+        with open(options['path'], newline='') as csv_file:
+            rows = list(csv.DictReader(csv_file))
+
+        created, errors = provision_users(
+            rows,
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+        )
+
+        for error in errors:
+            # Row 1 is the header, so data rows start at line 2.
+            self.stderr.write(f"Line {error['row'] + 2}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(f'Created {created} users.'))
@@ -6,8 +6,14 @@ from django.contrib.auth import (
 )
 from django.utils.translation import gettext_lazy as _
 
+from core import emails
+from core.models import AccountDeletion
+
 
 class UserSerializer(serializers.ModelSerializer):
+    # Validated once in validate_email rather than by EmailField as well.
+    email = serializers.CharField(max_length=255)
+
     class Meta:
         model = get_user_model()
         fields = [
@@ -22,8 +28,24 @@ class UserSerializer(serializers.ModelSerializer):
             }
         }
 
+    def validate_email(self, value):
+        try:
+            email = emails.normalize_email(value)
+        except ValueError as error:
+            raise serializers.ValidationError(str(error))
+
+        users = get_user_model().objects.filter(email=email)
+        if self.instance is not None:
+            users = users.exclude(pk=self.instance.pk)
+        if users.exists():
+            msg = _('user with this email already exists.')
+            raise serializers.ValidationError(msg, code='unique')
+
+        return email
+
     def create(self, validated_data):
-        return get_user_model().objects.create_user(**validated_data)
+        # The email was already normalized and validated by validate_email.
+        return get_user_model().objects._create_user(**validated_data)
 
     def update(self, instance, validated_data):
         password = validated_data.pop('password', None)
@@ -37,6 +59,35 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
+class BulkUserSerializer(serializers.Serializer):
+    email = serializers.CharField(max_length=255)
+    name = serializers.CharField(max_length=255, required=False)
+    password = serializers.CharField(
+        min_length=5,
+        required=False,
+        write_only=True,
+    )
+    password_hash = serializers.CharField(
+        max_length=128,
+        required=False,
+        write_only=True,
+    )
+
+
+class AccountDeletionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AccountDeletion
+        fields = [
+            'id',
+            'status',
+            'recipes_deleted',
+            'tags_deleted',
+            'created_at',
+            'updated_at',
+        ]
+        read_only_fields = fields
+
+
 class AuthTokenSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(
@@ -0,0 +1,37 @@
+"""
+Test user management commands.
+"""
+
+import csv
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class BulkCreateUsersCommandTests(TestCase):
+    """Test the bulk_create_users command."""
+
+    def test_bulk_create_users_from_csv(self):
+        """Test users are created from a CSV file and bad rows reported."""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(['email', 'name', 'password', 'password_hash'])
+            writer.writerow(['one@example.com', 'One', 'pass12345', ''])
+            writer.writerow(
+                ['two@example.com', 'Two', '', make_password('pass67890')]
+            )
+            writer.writerow(['bad', 'Bad', 'pass12345', ''])
+            csv_file.flush()
+            out, err = StringIO(), StringIO()
+
+            call_command('bulk_create_users', csv_file.name,
+                         stdout=out, stderr=err)
+
+        self.assertIn('Created 2 users.', out.getvalue())
+        self.assertIn('Line 4:', err.getvalue())
+        user = get_user_model().objects.get(email='two@example.com')
+        self.assertTrue(user.check_password('pass67890'))
@@ -2,15 +2,21 @@
 
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.models import AccountDeletion, Job
+from core.throttling import reset_buckets
+
 
 CREATE_USER_URL = reverse('user:create')
+BULK_CREATE_URL = reverse('user:bulk-create')
 TOKEN_URL = reverse('user:token')
 ME_URL = reverse('user:me')
+ME_DELETION_URL = reverse('user:me-deletion')
 
 
 def create_user(payload):
@@ -22,6 +28,7 @@ class PublicUserAPITests(TestCase):
 
     def setUp(self):
         """Create api client."""
+        reset_buckets()
         self.client = APIClient()
 
     def test_create_user_success(self):
@@ -73,6 +80,51 @@ class PublicUserAPITests(TestCase):
         res = self.client.post(CREATE_USER_URL, payload)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_user_normalizes_email(self):
+        """Test the email domain is normalized on signup."""
+        payload = {
+            'email': 'Test@EXAMPLE.com',
+            'password': 'testpass123',
+            'name': 'Test Name',
+        }
+
+        res = self.client.post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['email'], 'Test@example.com')
+
+    def test_create_user_normalized_email_exists_error(self):
+        """Test an existing email differing only in domain case is rejected."""
+        create_user({'email': 'test@example.com', 'password': 'testpass123'})
+        payload = {
+            'email': 'test@EXAMPLE.com',
+            'password': 'testpass123',
+            'name': 'Test Name',
+        }
+
+        res = self.client.post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_user_invalid_email_error(self):
+        """Test an error is returned for an invalid email."""
+        payload = {
+            'email': 'not-an-email',
+            'password': 'testpass123',
+            'name': 'Test Name',
+        }
+
+        res = self.client.post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', res.data)
+
+    def test_bulk_create_requires_admin(self):
+        """Test bulk creating users requires an admin user."""
+        res = self.client.post(BULK_CREATE_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
     def test_create_token_for_user(self):
         # """Test creating a token for successful login."""
         """Test generating token for valid credentials."""
@@ -140,6 +192,7 @@ class PrivateUserAPITests(TestCase):
     """Test API requests that required authentication."""
 
     def setUp(self):
+        reset_buckets()
         self.user = create_user(
             {
                 'email': 'test@example.com',
@@ -183,3 +236,94 @@ class PrivateUserAPITests(TestCase):
         self.assertTrue(self.user.check_password(payload['password']))
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_delete_account_queues_deletion(self):
+        """Test deleting the account queues a background deletion job."""
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['status'], AccountDeletion.PENDING)
+        deletion = AccountDeletion.objects.get(user_id=self.user.id)
+        job = Job.objects.get(name='delete_account')
+        self.assertEqual(job.payload, {'deletion_id': deletion.id})
+        self.assertEqual(job.user, self.user)
+
+    def test_delete_account_twice_queues_once(self):
+        """Test repeating the delete request does not queue another job."""
+        self.client.delete(ME_URL)
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_retrieve_deletion_progress(self):
+        """Test retrieving the progress of the account deletion."""
+        AccountDeletion.objects.create(
+            user_id=self.user.id,
+            status=AccountDeletion.RUNNING,
+            recipes_deleted=10,
+        )
+
+        res = self.client.get(ME_DELETION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], AccountDeletion.RUNNING)
+        self.assertEqual(res.data['recipes_deleted'], 10)
+
+    def test_retrieve_deletion_not_requested(self):
+        """Test 404 is returned when no deletion was requested."""
+        res = self.client.get(ME_DELETION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AdminUserAPITests(TestCase):
+    """Test API requests restricted to admin users."""
+
+    def setUp(self):
+        reset_buckets()
+        self.admin = get_user_model().objects.create_superuser(
+            'admin@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_bulk_create_users(self):
+        """Test bulk creating users with raw and precomputed passwords."""
+        payload = [
+            {'email': 'one@EXAMPLE.com', 'password': 'pass12345'},
+            {
+                'email': 'two@example.com',
+                'name': 'Two',
+                'password_hash': make_password('pass67890'),
+            },
+            {'email': 'one@example.com', 'password': 'pass12345'},
+            {'email': 'admin@example.com', 'password': 'pass12345'},
+            {'email': 'invalid', 'password': 'pass12345'},
+        ]
+
+        res = self.client.post(BULK_CREATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(
+            [error['row'] for error in res.data['errors']],
+            [2, 3, 4],
+        )
+        one = get_user_model().objects.get(email='one@example.com')
+        self.assertTrue(one.check_password('pass12345'))
+        two = get_user_model().objects.get(email='two@example.com')
+        self.assertTrue(two.check_password('pass67890'))
+        self.assertEqual(two.name, 'Two')
+
+    def test_bulk_create_limit(self):
+        """Test an error is returned above the per-request limit."""
+        payload = [{'email': f'user{i}@example.com'} for i in range(1001)]
+
+        res = self.client.post(BULK_CREATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(
+            get_user_model().objects.filter(email='user0@example.com').exists()
+        )
@@ -2,14 +2,18 @@ from django.urls import path
 
 from user.views import (
     CreateUserView,
+    BulkCreateUserView,
     CreateTokenView,
     ManageUserView,
+    AccountDeletionView,
 )
 
 app_name = 'user'
 
 urlpatterns = [
     path('create/', CreateUserView.as_view(), name='create'),
+    path('bulk-create/', BulkCreateUserView.as_view(), name='bulk-create'),
     path('token/', CreateTokenView.as_view(), name='token'),
     path('me/', ManageUserView.as_view(), name='me'),
+    path('me/deletion/', AccountDeletionView.as_view(), name='me-deletion'),
 ]
@@ -1,26 +1,95 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core.authentication import ExpiringTokenAuthentication, issue_token
+from core.deletion import request_account_deletion, start_account_deletion
+from core.models import AccountDeletion
+from core.throttling import LoginThrottle, SignupThrottle
+from user.bulk import provision_users
 from user.serializers import (
     UserSerializer,
+    BulkUserSerializer,
+    AccountDeletionSerializer,
     AuthTokenSerializer,
 )
 
+MAX_BULK_USERS = 1000
+
 
 class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
+    throttle_classes = [SignupThrottle]
+
+
+class BulkCreateUserView(generics.GenericAPIView):
+    serializer_class = BulkUserSerializer
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        if not isinstance(request.data, list):
+            return Response(
+                {'detail': 'Expected a list of users.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(request.data) > MAX_BULK_USERS:
+            return Response(
+                {'detail': f'At most {MAX_BULK_USERS} users per request.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        created, errors = provision_users(serializer.validated_data)
+
+        return Response(
+            {'created': created, 'errors': errors},
+            status=status.HTTP_201_CREATED,
+        )
 
 
 class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = [LoginThrottle]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = issue_token(serializer.validated_data['user'])
+
+        return Response({'token': token.key})
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [ExpiringTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         return self.request.user
+
+    def destroy(self, request, *args, **kwargs):
+        """Delete the account in the background and report its progress."""
+        deletion, created = request_account_deletion(request.user)
+        if created or deletion.status == AccountDeletion.FAILED:
+            start_account_deletion(deletion, user=request.user)
+
+        return Response(
+            AccountDeletionSerializer(deletion).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class AccountDeletionView(generics.RetrieveAPIView):
+    serializer_class = AccountDeletionSerializer
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_object(self):
+        return generics.get_object_or_404(
+            AccountDeletion.objects.order_by('-id'),
+            user_id=self.request.user.id,
+        )